@@ -0,0 +1,111 @@
+# absentees.py
+# Кто из группы не отметился за день — для /admin/groups/{group}/absent.
+#
+# Страница строится по ключу, а не через OFFSET. Студенты группы идут по
+# индексу ix_students_group_active (group_name, is_active, full_name) в
+# порядке (full_name, id), и следующая страница начинается сразу после
+# последнего показанного студента. Отметку каждого проверяет NOT EXISTS
+# по ux_attendance_student_date. Поэтому страница стоит O(размер страницы
+# + пришедшие студенты между пропустившими), а не O(вся группа). Номер
+# страницы ничего не стоит, и если кто-то отметился, пока куратор листает,
+# соседние страницы не съезжают.
+#
+# Всё здесь только читает. Счётчики group_daily_stats (group_stats.py) сюда
+# не подходят: read_day досоздаёт строки за любой запрошенный день, и в них
+# входят отчисленные.
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, exists, func, select, tuple_
+
+from models import Attendance, Student, StudentStat
+
+
+class BadCursor(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Absentee:
+    id: int
+    full_name: str
+    login: Optional[str]
+    last_seen: Optional[date]  # последний день с отметкой (student_stats)
+
+
+@dataclass(frozen=True)
+class GroupCount:
+    total: int    # активных студентов в группе
+    present: int  # из них отметились за день
+
+
+@dataclass
+class AbsentPage:
+    students: List[Absentee]
+    next_cursor: Optional[str]  # None — это последняя страница
+
+
+def encode_cursor(full_name: str, student_id: int) -> str:
+    raw = json.dumps([full_name, student_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        full_name, student_id = json.loads(raw)
+        return str(full_name), int(student_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise BadCursor(cursor)
+
+
+def _marked(day: date):
+    return exists().where(
+        Attendance.student_id == Student.id,
+        Attendance.date == day,
+        Attendance.status == 1,
+    )
+
+
+def group_count(db, group: str, day: date) -> GroupCount:
+    """Те же студенты, что в списке: O(группа), поэтому только для первой страницы."""
+    total, present = db.execute(
+        select(func.count(Student.id), func.coalesce(func.sum(case((_marked(day), 1), else_=0)), 0))
+        .where(Student.group_name == group, Student.is_active == True)
+    ).one()
+    return GroupCount(total, present)
+
+
+def absent_select(group: str, day: date, after: Optional[Tuple[str, int]], limit: int):
+    marked = _marked(day)
+    stmt = (
+        select(Student.id, Student.full_name, Student.login, StudentStat.last_seen)
+        .outerjoin(StudentStat, StudentStat.student_id == Student.id)
+        .where(
+            Student.group_name == group,
+            Student.is_active == True,
+            ~marked,
+        )
+        .order_by(Student.full_name, Student.id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Student.full_name, Student.id) > tuple_(*after))
+    return stmt
+
+
+def absent_page(db, group: str, day: date, cursor: Optional[str], page_size: int) -> AbsentPage:
+    """Страница отсутствующих после cursor. BadCursor — испорченный cursor."""
+    after = decode_cursor(cursor) if cursor else None
+    # на одну строку больше: так видно, есть ли следующая страница
+    rows = db.execute(absent_select(group, day, after, page_size + 1)).all()
+    students = [Absentee(r.id, r.full_name, r.login, r.last_seen) for r in rows[:page_size]]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = students[-1]
+        next_cursor = encode_cursor(last.full_name, last.id)
+    return AbsentPage(students, next_cursor)
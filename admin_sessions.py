@@ -0,0 +1,174 @@
+# admin_sessions.py
+# Подписанные сессии админки, проверяемые без запроса в БД.
+#
+# Раньше cookie admin_session хранила uuid из admins.session_token, и каждый
+# запрос админки (а дашборд обновляется часто) искал его по неиндексированному
+# столбцу. К тому же одно поле означало одну сессию на админа: вход с
+# ноутбука выкидывал с телефона.
+#
+# Теперь cookie — это JWT (HS256): id и логин админа, срок действия и
+# случайный jti. Подпись и срок проверяются в памяти. Выход из админки
+# записывает jti в admin_revoked_tokens. Каждый воркер держит этот
+# маленький список в памяти и перечитывает его не чаще раза в
+# ADMIN_REVOCATION_RELOAD_S, так что в другом воркере выход срабатывает
+# не позже чем через несколько секунд. Строки списка удаляются, когда
+# истекает срок их токенов.
+#
+# Ключ подписи берётся из ADMIN_SESSION_SECRET. Если он не задан, ключ
+# один раз генерируется в файл ADMIN_SESSION_SECRET_FILE, общий для всех
+# воркеров на машине. Смена ключа выкидывает всех админов.
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+import config
+from models import Admin, RevokedAdminToken
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# принимаем только свой заголовок — никаких alg=none и подмены алгоритма
+_HEADER = _b64(b'{"alg":"HS256","typ":"JWT"}')
+
+
+@dataclass(frozen=True)
+class AdminSession:
+    admin_id: int
+    username: str
+    jti: str
+    expires_at: int  # unix time
+
+
+def load_secret() -> bytes:
+    if config.ADMIN_SESSION_SECRET:
+        return config.ADMIN_SESSION_SECRET.encode()
+    path = config.ADMIN_SESSION_SECRET_FILE
+    if not os.path.exists(path):
+        # пишем во временный файл и ставим на место через link: из нескольких
+        # воркеров, стартующих разом, выигрывает один, остальные читают его ключ
+        tmp = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp)
+    with open(path) as f:
+        return f.read().strip().encode()
+
+
+class AdminSessions:
+    def __init__(self, ttl_s: int, reload_s: float, secret: Optional[bytes] = None):
+        self.ttl_s = ttl_s
+        self.reload_s = reload_s
+        self._secret = secret
+        # jti -> unix time истечения
+        self._revoked: Dict[str, int] = {}
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def secret(self) -> bytes:
+        if self._secret is None:
+            self._secret = load_secret()
+        return self._secret
+
+    def _sign(self, signing_input: str) -> str:
+        return _b64(hmac.new(self.secret, signing_input.encode(), hashlib.sha256).digest())
+
+    def issue(self, admin: Admin) -> str:
+        now = int(time.time())
+        payload = {
+            "sub": admin.id,
+            "name": admin.username,
+            "iat": now,
+            "exp": now + self.ttl_s,
+            "jti": secrets.token_urlsafe(12),
+        }
+        body = _b64(json.dumps(payload, separators=(",", ":")).encode())
+        signing_input = f"{_HEADER}.{body}"
+        return f"{signing_input}.{self._sign(signing_input)}"
+
+    def decode(self, token: str) -> Optional[AdminSession]:
+        """Подпись и срок; отзыв здесь не проверяется."""
+        try:
+            header, body, signature = token.split(".")
+        except ValueError:
+            return None
+        # compare_digest на str с не-ASCII бросает TypeError; настоящий токен — base64url
+        if header != _HEADER or not (body.isascii() and signature.isascii()):
+            return None
+        if not hmac.compare_digest(signature, self._sign(f"{header}.{body}")):
+            return None
+        try:
+            payload = json.loads(_unb64(body))
+            session = AdminSession(
+                int(payload["sub"]), str(payload["name"]), str(payload["jti"]), int(payload["exp"])
+            )
+        except (ValueError, KeyError, TypeError):
+            return None
+        if session.expires_at <= time.time():
+            return None
+        return session
+
+    def _reload(self, db: Session):
+        rows = db.execute(
+            select(RevokedAdminToken.jti, RevokedAdminToken.expires_at)
+            .where(RevokedAdminToken.expires_at > datetime.utcnow())
+        )
+        revoked = {jti: int(_unix(expires_at)) for jti, expires_at in rows}
+        with self._lock:
+            self._revoked = revoked
+            self._loaded_at = time.monotonic()
+
+    def verify(self, token: Optional[str], db: Session) -> Optional[AdminSession]:
+        """
+        Сессия из cookie или None. БД трогается только раз в reload_s —
+        чтобы узнать о выходах в других воркерах.
+        """
+        if not token:
+            return None
+        session = self.decode(token)
+        if session is None:
+            return None
+        if time.monotonic() - self._loaded_at > self.reload_s:
+            self._reload(db)
+        if session.jti in self._revoked:
+            return None
+        return session
+
+    def revoke(self, session: AdminSession, db: Session):
+        expires_at = datetime.utcfromtimestamp(session.expires_at)
+        db.merge(RevokedAdminToken(jti=session.jti, expires_at=expires_at))
+        db.execute(delete(RevokedAdminToken).where(RevokedAdminToken.expires_at <= datetime.utcnow()))
+        db.commit()
+        with self._lock:
+            self._revoked[session.jti] = session.expires_at
+
+
+def _unix(value: datetime) -> float:
+    # expires_at хранится в UTC без зоны
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+admin_sessions = AdminSessions(config.ADMIN_SESSION_TTL_S, config.ADMIN_REVOCATION_RELOAD_S)
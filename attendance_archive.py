@@ -0,0 +1,313 @@
+# attendance_archive.py
+# Перенос закрытых месяцев attendance в сжатые файлы-архивы.
+#
+# attendance растёт на строку на студента в день навсегда. Через пару лет
+# файл SQLite раздувается, а горячие запросы и JOIN дашборда идут по
+# таблице, где 95% строк — прошлые годы.
+#
+# Архивация берёт каждый месяц старше ARCHIVE_KEEP_MONTHS полных месяцев и
+# делает с ним вот что:
+#   1) строки месяца, отсортированные по (student_id, date), пишутся в
+#      ATTENDANCE_ARCHIVE_DIR/attendance-ГГГГ-ММ.csv.gz (сначала во
+#      временный файл, потом fsync и os.replace);
+#   2) только после этого они удаляются из attendance — ровно те id,
+#      которые попали в файл.
+# Если у месяца уже есть архив (например, отметки внесли задним числом),
+# новые строки вливаются в него, и файл пишется заново.
+#
+# Отчёты (reports.py) читают архив и живую таблицу как один набор данных.
+# Рабочие запросы дня видят только текущий семестр. Сводки student_stats
+# смотрят не дальше 31 дня назад и архив не трогают.
+#
+#   python attendance_archive.py               — заархивировать закрытые месяцы
+#   python attendance_archive.py --dry-run     — только показать, что будет
+#   python attendance_archive.py --list        — что уже в архиве
+#   python attendance_archive.py --vacuum      — после переноса ужать файл SQLite
+import csv
+import gzip
+import heapq
+import io
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Engine
+
+import config
+import motivation
+from models import Attendance, Device, unpack_ip
+
+# в архиве IP и устройство — текстом, чтобы файл читался без базы
+COLUMNS = (
+    "student_id", "date", "status", "created_at", "ip_address", "device_uid",
+    "motivation_id", "motivation_lang", "motivation_arg", "lat", "lon",
+)
+# сколько id удаляем одним DELETE ... IN (...)
+DELETE_CHUNK = 500
+
+
+@dataclass
+class MonthResult:
+    month: Tuple[int, int]
+    rows: int
+    archived: int  # строк в файле после слияния
+    bytes: int
+    elapsed_s: float
+
+
+def archive_path(archive_dir: str, year: int, month: int) -> str:
+    return os.path.join(archive_dir, f"attendance-{year:04d}-{month:02d}.csv.gz")
+
+
+def _month_bounds(year: int, month: int) -> Tuple[date, date]:
+    """[первый день месяца, первый день следующего)."""
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def _shift_month(year: int, month: int, delta: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def cutoff_date(today: date, keep_months: int) -> date:
+    """Всё раньше этой даты — закрытые месяцы для архива."""
+    # не меньше одного полного месяца: сводкам student_stats нужен 31 день
+    year, month = _shift_month(today.year, today.month, -max(keep_months, 1))
+    return date(year, month, 1)
+
+
+def closed_months(engine: Engine, cutoff: date) -> List[Tuple[int, int]]:
+    with engine.connect() as conn:
+        oldest = conn.scalar(select(func.min(Attendance.date)).where(Attendance.date < cutoff))
+    if oldest is None:
+        return []
+    months = []
+    year, month = oldest.year, oldest.month
+    while date(year, month, 1) < cutoff:
+        months.append((year, month))
+        year, month = _shift_month(year, month, 1)
+    return months
+
+
+# ---------- чтение архива ----------
+
+def _int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+def _parse(header: List[str], row: List[str]) -> dict:
+    values = dict(zip(header, row))
+    if "motivation_text" in values:
+        # файлы до компактных строк (m008) хранили фразу текстом
+        phrase_id, lang, arg = motivation.parse(values["motivation_text"]) or (None, None, None)
+    else:
+        phrase_id = _int(values["motivation_id"])
+        lang = values["motivation_lang"] or None
+        arg = _int(values["motivation_arg"])
+    return {
+        "student_id": int(values["student_id"]),
+        "date": date.fromisoformat(values["date"]),
+        "status": int(values["status"]),
+        "created_at": datetime.fromisoformat(values["created_at"]) if values["created_at"] else None,
+        "ip_address": values["ip_address"] or None,
+        "device_uid": values["device_uid"] or None,
+        "motivation_id": phrase_id,
+        "motivation_lang": lang,
+        "motivation_arg": arg,
+        "lat": float(values["lat"]) if values["lat"] else None,
+        "lon": float(values["lon"]) if values["lon"] else None,
+    }
+
+
+def read_month(archive_dir: str, year: int, month: int) -> Iterator[dict]:
+    """Строки архива месяца в порядке (student_id, date); нет файла — пусто."""
+    path = archive_path(archive_dir, year, month)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        for row in reader:
+            yield _parse(header, row)
+
+
+def archived_months(archive_dir: str) -> List[Tuple[int, int]]:
+    if not os.path.isdir(archive_dir):
+        return []
+    months = []
+    for name in os.listdir(archive_dir):
+        if name.startswith("attendance-") and name.endswith(".csv.gz"):
+            year, month = name[len("attendance-"):-len(".csv.gz")].split("-")
+            months.append((int(year), int(month)))
+    return sorted(months)
+
+
+def is_archived(archive_dir: str, day: date) -> bool:
+    """Месяц дня уже перенесён в архив — в живой таблице его отметок нет."""
+    return os.path.exists(archive_path(archive_dir, day.year, day.month))
+
+
+def archived_presence(archive_dir: str, date_from: date, date_to: date) -> Dict[int, int]:
+    """
+    Отметки «был» из архива за [date_from, date_to]: student_id -> битовая
+    маска дней (бит i — date_from + i). Память — по числу студентов, а не
+    отметок, и месяцы вне периода даже не открываются.
+    """
+    presence: Dict[int, int] = {}
+    year, month = date_from.year, date_from.month
+    while date(year, month, 1) <= date_to:
+        for row in read_month(archive_dir, year, month):
+            day = row["date"]
+            if row["status"] == 1 and date_from <= day <= date_to:
+                bit = 1 << (day - date_from).days
+                presence[row["student_id"]] = presence.get(row["student_id"], 0) | bit
+        year, month = _shift_month(year, month, 1)
+    return presence
+
+
+# ---------- запись ----------
+
+def _live_rows(conn, start: date, end: date) -> Iterator[Tuple[int, dict]]:
+    stored = [c for c in COLUMNS if c not in ("ip_address", "device_uid")]
+    result = conn.execution_options(stream_results=True, yield_per=config.REPORT_CHUNK_ROWS).execute(
+        select(Attendance.id, Attendance.ip, Device.uid, *(getattr(Attendance, c) for c in stored))
+        .outerjoin(Device, Device.id == Attendance.device_id)
+        .where(Attendance.date >= start, Attendance.date < end)
+        .order_by(Attendance.student_id, Attendance.date)
+    )
+    for row in result:
+        values = {c: getattr(row, c) for c in stored}
+        values["ip_address"] = unpack_ip(row.ip)
+        values["device_uid"] = row.uid
+        yield row.id, values
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def archive_month(
+    engine: Engine, year: int, month: int, archive_dir: str, dry_run: bool = False
+) -> MonthResult:
+    started = time.perf_counter()
+    start, end = _month_bounds(year, month)
+    path = archive_path(archive_dir, year, month)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    moved_ids: List[int] = []
+    archived = 0
+
+    with engine.connect() as conn:
+        live_count = conn.scalar(
+            select(func.count(Attendance.id)).where(Attendance.date >= start, Attendance.date < end)
+        )
+        # пустой месяц (или --dry-run) — архив не переписываем
+        if dry_run or not live_count:
+            return MonthResult((year, month), live_count, 0, 0, time.perf_counter() - started)
+
+        live = ((values["student_id"], values["date"], 0, row_id, values)
+                for row_id, values in _live_rows(conn, start, end))
+        old = ((values["student_id"], values["date"], 1, None, values)
+               for values in read_month(archive_dir, year, month))
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as raw:
+            # mtime=0 — одинаковые данные дают одинаковый файл
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as gz, \
+                    io.TextIOWrapper(gz, encoding="utf-8", newline="") as out:
+                writer = csv.writer(out)
+                writer.writerow(COLUMNS)
+                previous = None
+                # оба потока отсортированы — сливаем без загрузки в память;
+                # при совпадении (student_id, date) живая строка идёт первой и побеждает
+                for student_id, day, _, row_id, values in heapq.merge(live, old, key=lambda i: i[:3]):
+                    if row_id is not None:
+                        moved_ids.append(row_id)
+                    if (student_id, day) == previous:
+                        continue
+                    previous = (student_id, day)
+                    writer.writerow([_cell(values[c]) for c in COLUMNS])
+                    archived += 1
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    os.replace(tmp, path)
+    # удаляем только то, что попало в файл: отметку, внесённую задним
+    # числом уже после чтения, заберёт следующий запуск
+    with engine.begin() as conn:
+        for i in range(0, len(moved_ids), DELETE_CHUNK):
+            conn.execute(delete(Attendance).where(Attendance.id.in_(moved_ids[i:i + DELETE_CHUNK])))
+
+    return MonthResult(
+        (year, month), len(moved_ids), archived, os.path.getsize(path), time.perf_counter() - started
+    )
+
+
+def archive_closed_months(
+    engine: Engine,
+    archive_dir: str = config.ATTENDANCE_ARCHIVE_DIR,
+    keep_months: int = config.ARCHIVE_KEEP_MONTHS,
+    today: Optional[date] = None,
+    dry_run: bool = False,
+) -> List[MonthResult]:
+    cutoff = cutoff_date(today or date.today(), keep_months)
+    return [
+        archive_month(engine, year, month, archive_dir, dry_run=dry_run)
+        for year, month in closed_months(engine, cutoff)
+    ]
+
+
+def main(argv=None):
+    import argparse
+
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Архивация старых месяцев attendance")
+    parser.add_argument("--dir", default=config.ATTENDANCE_ARCHIVE_DIR)
+    parser.add_argument("--keep-months", type=int, default=config.ARCHIVE_KEEP_MONTHS)
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать строки")
+    parser.add_argument("--list", action="store_true", help="показать архив")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM после переноса (SQLite)")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for year, month in archived_months(args.dir):
+            path = archive_path(args.dir, year, month)
+            rows = sum(1 for _ in read_month(args.dir, year, month))
+            print(f"{year:04d}-{month:02d}  {rows:8d} строк  {os.path.getsize(path) / 1024:8.1f} КиБ")
+        return
+
+    cutoff = cutoff_date(date.today(), args.keep_months)
+    print(f"в архив — всё раньше {cutoff}")
+    results = [
+        r for r in archive_closed_months(engine, args.dir, args.keep_months, dry_run=args.dry_run) if r.rows
+    ]
+    for r in results:
+        year, month = r.month
+        if args.dry_run:
+            print(f"{year:04d}-{month:02d}: {r.rows} строк к переносу")
+        else:
+            print(
+                f"{year:04d}-{month:02d}: перенесено {r.rows}, в файле {r.archived}, "
+                f"{r.bytes / 1024:.1f} КиБ за {r.elapsed_s:.2f} с"
+            )
+    if not results:
+        print("закрытых месяцев в attendance нет")
+
+    if args.vacuum and not args.dry_run and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        print("VACUUM выполнен")
+
+
+if __name__ == "__main__":
+    main()
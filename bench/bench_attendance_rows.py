@@ -0,0 +1,175 @@
+# bench/bench_attendance_rows.py
+# Размер attendance и скорость полного прохода до и после компактных строк (m008).
+#
+#   python bench/bench_attendance_rows.py --students 2000 --days 120
+#
+# Во временной SQLite-базе создаётся attendance в старом виде (IP и
+# device_uid текстом, фраза целиком) и заполняется примерно на 80% дней.
+# Меряются размер файла после VACUUM и время двух проходов по таблице:
+# COUNT по неиндексированному столбцу (чтение всех страниц в SQLite) и
+# выборка всех строк в Python. Потом применяются миграции, и то же
+# меряется ещё раз.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="bench-rows-")
+DB_PATH = os.path.join(TMP, "rows.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import text  # noqa: E402
+
+import motivation  # noqa: E402
+from database import Base, engine  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from models import Student  # noqa: E402
+from student_stats import Progress  # noqa: E402
+
+START = date(2024, 9, 1)
+
+# attendance до m008 (после m006)
+LEGACY_DDL = [
+    "CREATE TABLE attendance ("
+    " id INTEGER NOT NULL PRIMARY KEY,"
+    " student_id INTEGER NOT NULL REFERENCES students (id),"
+    " date DATE NOT NULL,"
+    " status INTEGER NOT NULL,"
+    " created_at DATETIME,"
+    " ip_address VARCHAR,"
+    " device_uid VARCHAR,"
+    " motivation_text VARCHAR,"
+    " lat FLOAT,"
+    " lon FLOAT)",
+    "CREATE INDEX ix_attendance_id ON attendance (id)",
+    "CREATE UNIQUE INDEX ux_attendance_student_date ON attendance (student_id, date)",
+    "CREATE INDEX ix_attendance_date ON attendance (date)",
+]
+
+
+def seed(students: int, days: int) -> int:
+    with engine.begin() as conn:
+        for ddl in LEGACY_DDL:
+            conn.execute(text(ddl))
+    Base.metadata.create_all(bind=engine)  # attendance уже есть — не трогается
+
+    rnd = random.Random(1)
+    rows = 0
+    with engine.begin() as conn:
+        conn.execute(Student.__table__.insert(), [
+            {
+                "full_name": f"Студентова Студентка {i}",
+                "login": f"s{i}",
+                "password": "1",
+                "group_name": f"G-{i % 120}",
+                "device_uid": str(uuid.UUID(int=rnd.getrandbits(128))),
+                "is_active": True,
+            }
+            for i in range(students)
+        ])
+        people = conn.execute(text("SELECT id, full_name, device_uid FROM students")).all()
+        for d in range(days):
+            day = START + timedelta(days=d)
+            batch = []
+            for sid, full_name, device_uid in people:
+                if rnd.random() >= 0.8:
+                    continue
+                progress = Progress(
+                    days_absent=rnd.choice((None, 1, 1, 1, 2, 8, 50)),
+                    streak=rnd.randint(0, 8),
+                    present_30d=rnd.randint(0, 25),
+                )
+                phrase_id, arg = motivation.choose(progress)
+                lang = "kk" if sid % 3 == 0 else "ru"
+                batch.append({
+                    "student_id": sid,
+                    "date": day,
+                    "status": 1,
+                    "created_at": datetime(day.year, day.month, day.day, 8, rnd.randint(0, 59)),
+                    "ip_address": f"10.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}",
+                    "device_uid": device_uid,
+                    "motivation_text": motivation.render(phrase_id, lang, arg, full_name),
+                    "lat": 45.01 + rnd.random() / 1000,
+                    "lon": 78.22 + rnd.random() / 1000,
+                })
+            conn.execute(
+                text(
+                    "INSERT INTO attendance (student_id, date, status, created_at, ip_address,"
+                    " device_uid, motivation_text, lat, lon) VALUES (:student_id, :date, :status,"
+                    " :created_at, :ip_address, :device_uid, :motivation_text, :lat, :lon)"
+                ),
+                batch,
+            )
+            rows += len(batch)
+    return rows
+
+
+def best_of(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def measure(label: str):
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+        pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+        table_bytes = conn.exec_driver_sql(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = 'attendance'"
+        ).scalar() if _has_dbstat(conn) else None
+
+        def count():
+            conn.exec_driver_sql("SELECT COUNT(*) FROM attendance WHERE lon IS NOT NULL").scalar()
+
+        def fetch():
+            for _ in conn.exec_driver_sql("SELECT * FROM attendance").yield_per(5000):
+                pass
+
+        count_s = best_of(count)
+        fetch_s = best_of(fetch)
+
+    table = f"  таблица {table_bytes / 2 ** 20:6.1f} МБ" if table_bytes else ""
+    print(
+        f"  {label:<6} файл {pages * page_size / 2 ** 20:6.1f} МБ{table}"
+        f"  COUNT {count_s * 1000:7.1f} мс  все строки {fetch_s:5.2f} с"
+    )
+
+
+def _has_dbstat(conn) -> bool:
+    try:
+        conn.exec_driver_sql("SELECT 1 FROM dbstat LIMIT 1")
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=120)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    rows = seed(args.students, args.days)
+    print(f"студентов={args.students} дней={args.days} отметок={rows}, заполнено за {time.perf_counter() - t0:.1f} с")
+
+    measure("до")
+    t0 = time.perf_counter()
+    run_migrations(engine)
+    print(f"  миграции за {time.perf_counter() - t0:.1f} с")
+    measure("после")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# bench/bench_checkin_commit.py
+# Сравнение: коммит на каждую отметку (как было) против группового коммита.
+#
+#   python bench/bench_checkin_commit.py --students 1500 --threads 32 --window-ms 5
+#
+# Каждый режим пишет в свою свежую SQLite-базу во временной папке.
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base  # noqa: E402
+from checkin_writer import CheckinWriter  # noqa: E402
+from models import Attendance, Student, pack_ip  # noqa: E402
+
+
+def make_db(path: str, students: int):
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": 60},
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = factory()
+    db.add_all(
+        Student(
+            full_name=f"Студент {i}",
+            login=f"s{i}",
+            password="1",
+            group_name=f"G-{i % 40}",
+            device_uid=f"dev-{i}",
+        )
+        for i in range(students)
+    )
+    db.commit()
+    ids = [s.id for s in db.query(Student.id)]
+    db.close()
+    return engine, factory, ids
+
+
+def checkin_values(student_id: int, today: date) -> dict:
+    return {
+        "student_id": student_id,
+        "date": today,
+        "status": 1,
+        "ip": pack_ip("10.0.0.1"),
+        "device_uid": f"dev-{student_id}",
+        "motivation_id": 6,
+        "motivation_lang": "ru",
+    }
+
+
+def direct_checkin(factory, student_id: int, today: date):
+    """Старый путь mark_attendance: SELECT, add, commit в каждом запросе."""
+    db = factory()
+    try:
+        exists = (
+            db.query(Attendance)
+            .filter(Attendance.student_id == student_id, Attendance.date == today)
+            .first()
+        )
+        if not exists:
+            values = checkin_values(student_id, today)
+            values.pop("device_uid")  # ссылку на devices проставляет только CheckinWriter
+            db.add(Attendance(**values))
+            db.commit()
+    finally:
+        db.close()
+
+
+def run(mode: str, students: int, threads: int, window_ms: float):
+    tmp = tempfile.mkdtemp(prefix=f"bench-{mode}-")
+    engine, factory, ids = make_db(os.path.join(tmp, "attendance.db"), students)
+    today = date.today()
+
+    writer = CheckinWriter(factory, window_ms=window_ms) if mode == "batch" else None
+
+    def one(student_id: int) -> float:
+        t0 = time.perf_counter()
+        if writer is not None:
+            writer.write(checkin_values(student_id, today))
+        else:
+            direct_checkin(factory, student_id, today)
+        return time.perf_counter() - t0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(one, ids))
+    elapsed = time.perf_counter() - started
+
+    if writer is not None:
+        writer.stop()
+
+    with factory() as db:
+        written = db.query(Attendance).count()
+    engine.dispose()
+
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100)
+    print(
+        f"{mode:>7}: {len(ids) / elapsed:8.0f} отметок/с  "
+        f"p50={q[49] * 1000:7.1f} мс  p95={q[94] * 1000:7.1f} мс  "
+        f"p99={q[98] * 1000:7.1f} мс  записано={written}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=1500)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--window-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"студентов={args.students} потоков={args.threads} окно={args.window_ms} мс")
+    run("direct", args.students, args.threads, args.window_ms)
+    run("batch", args.students, args.threads, args.window_ms)
+
+
+if __name__ == "__main__":
+    main()
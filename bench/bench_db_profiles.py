@@ -0,0 +1,116 @@
+# bench/bench_db_profiles.py
+# Пропускная способность отметок на разных профилях движка.
+#
+#   python bench/bench_db_profiles.py --students 3000 --threads 64
+#   python bench/bench_db_profiles.py --pg-url postgresql://bench@localhost/bench_scratch
+#
+# Каждый "студент" делает то же, что POST /student/mark: ищет себя по
+# device_uid и пишет отметку через CheckinWriter. SQLite-профили работают на
+# свежих файлах во временной папке. Для PostgreSQL нужна ПУСТАЯ тестовая
+# база — таблицы в ней пересоздаются.
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="bench-profiles-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP, 'import.db')}"
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import config  # noqa: E402
+from database import Base, make_engine  # noqa: E402
+from checkin_writer import CheckinWriter  # noqa: E402
+from models import Student, pack_ip  # noqa: E402
+
+
+def prepare(url: str, profile: str, students: int):
+    engine = make_engine(url, profile)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with factory() as db:
+        db.add_all(
+            Student(
+                full_name=f"Студент {i}",
+                login=f"s{i}",
+                password="1",
+                group_name=f"G-{i % 40}",
+                device_uid=f"dev-{i}",
+            )
+            for i in range(students)
+        )
+        db.commit()
+    return engine, factory
+
+
+def run(name: str, url: str, profile: str, students: int, threads: int, window_ms: float):
+    engine, factory = prepare(url, profile, students)
+    writer = CheckinWriter(factory, window_ms=window_ms, max_batch=config.CHECKIN_BATCH_MAX_SIZE)
+    today = date.today()
+
+    def one(i: int) -> float:
+        t0 = time.perf_counter()
+        with factory() as db:
+            student = (
+                db.query(Student)
+                .filter(Student.device_uid == f"dev-{i}", Student.is_active == True)
+                .first()
+            )
+            student_id = student.id
+        writer.write({
+            "student_id": student_id,
+            "date": today,
+            "status": 1,
+            "ip": pack_ip("10.0.0.1"),
+            "device_uid": f"dev-{i}",
+            "motivation_id": 6,
+            "motivation_lang": "ru",
+        })
+        return time.perf_counter() - t0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(one, range(students)))
+    elapsed = time.perf_counter() - started
+
+    writer.stop()
+    engine.dispose()
+
+    q = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:>13}: {students / elapsed:8.0f} отметок/с  "
+        f"p50={q[49] * 1000:7.1f} мс  p95={q[94] * 1000:7.1f} мс  p99={q[98] * 1000:7.1f} мс"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=3000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--window-ms", type=float, default=config.CHECKIN_BATCH_WINDOW_MS)
+    parser.add_argument("--pg-url", default=os.getenv("BENCH_PG_URL"))
+    args = parser.parse_args()
+
+    print(f"студентов={args.students} потоков={args.threads} окно={args.window_ms} мс")
+    cases = [
+        ("sqlite-plain", f"sqlite:///{os.path.join(TMP, 'plain.db')}", "plain"),
+        ("sqlite-tuned", f"sqlite:///{os.path.join(TMP, 'tuned.db')}", "tuned"),
+    ]
+    if args.pg_url:
+        cases.append(("postgresql", args.pg_url, "tuned"))
+
+    for name, url, profile in cases:
+        run(name, url, profile, args.students, args.threads, args.window_ms)
+
+
+if __name__ == "__main__":
+    main()
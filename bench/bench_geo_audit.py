@@ -0,0 +1,106 @@
+# bench/bench_geo_audit.py
+# Повторная проверка отметок: построчный цикл против NumPy (geo_audit.py).
+#
+#   python bench/bench_geo_audit.py --rows 1000000
+#
+# Во временной SQLite-базе --rows отметок с координатами вокруг зоны по
+# умолчанию (часть — далеко за её пределами). Отдельно меряется сама
+# проверка (координаты уже в памяти) и весь проход geo_audit с чтением из БД.
+import argparse
+import io
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="bench-geo-audit-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP, 'audit.db')}"
+
+import numpy as np  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from bootstrap import bootstrap  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from geo_audit import audit, inside_any  # noqa: E402
+from geofence import load_zones  # noqa: E402
+from models import Attendance  # noqa: E402
+
+
+def seed(rows: int):
+    bootstrap(engine)
+    rnd = random.Random(1)
+    start = date(2024, 9, 1)
+    table = Attendance.__table__
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            far = rnd.random() < 0.02
+            spread = 0.5 if far else 0.003
+            batch.append({
+                "student_id": i % 5000 + 1,
+                "date": start + timedelta(days=i // 5000),
+                "status": 1,
+                "lat": 45.01 + rnd.uniform(-spread, spread),
+                "lon": 78.22 + rnd.uniform(-spread, spread),
+            })
+            if len(batch) == 50_000:
+                conn.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+
+
+def load_coords(db):
+    rows = db.execute(select(Attendance.lat, Attendance.lon).where(Attendance.lat.is_not(None))).all()
+    data = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.float64, count=2 * len(rows))
+    return data.reshape(-1, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    seed(args.rows)
+    print(f"строк={args.rows}, заполнено за {time.perf_counter() - t0:.1f} с")
+
+    db = SessionLocal()
+    zones = load_zones(db)
+
+    t0 = time.perf_counter()
+    coords = load_coords(db)
+    read_s = time.perf_counter() - t0
+    lat, lon = coords[:, 0], coords[:, 1]
+    points = coords.tolist()
+
+    t0 = time.perf_counter()
+    loop_flagged = sum(
+        1 for p_lat, p_lon in points if not any(zone.contains(p_lat, p_lon) for zone in zones)
+    )
+    loop_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    numpy_flagged = int((~inside_any(zones, lat, lon)).sum())
+    numpy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    stats = audit(db, io.StringIO(), zones=zones, archive_dir=None)
+    audit_s = time.perf_counter() - t0
+    db.close()
+
+    assert loop_flagged == numpy_flagged == stats["flagged"], (loop_flagged, numpy_flagged, stats)
+    print(f"чтение координат из БД: {read_s:6.2f} с")
+    print(f"проверка построчно:     {loop_s:6.2f} с  ({args.rows / loop_s:11.0f} строк/с)")
+    print(f"проверка NumPy:         {numpy_s:6.2f} с  ({args.rows / numpy_s:11.0f} строк/с)")
+    print(f"geo_audit целиком:      {audit_s:6.2f} с  ({args.rows / audit_s:11.0f} строк/с), вне зон {loop_flagged}")
+
+
+if __name__ == "__main__":
+    main()
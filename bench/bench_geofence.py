@@ -0,0 +1,87 @@
+# bench/bench_geofence.py
+# Проверка точки: перебор всех зон против индекса по сетке (geofence.py).
+#
+#   python bench/bench_geofence.py --campuses 50 --zones 20 --points 200000
+#
+# Корпуса разбросаны по области ~1°x1°, у каждого круги и многоугольники
+# рядом с центром. Точки — половина внутри корпусов, половина случайные.
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+from geofence import GeofenceIndex, circle_zone, polygon_zone  # noqa: E402
+
+
+def make_zones(campuses: int, per_campus: int, rnd: random.Random) -> list:
+    zones = []
+    centers = []
+    for c in range(campuses):
+        lat0, lon0 = 45 + rnd.random(), 78 + rnd.random()
+        centers.append((lat0, lon0))
+        for z in range(per_campus):
+            lat = lat0 + rnd.uniform(-0.005, 0.005)
+            lon = lon0 + rnd.uniform(-0.005, 0.005)
+            zid = len(zones) + 1
+            if z % 2:
+                zones.append(circle_zone(zid, f"C{c}", f"Z{z}", lat, lon, rnd.uniform(50, 300)))
+            else:
+                d = rnd.uniform(0.0005, 0.002)
+                zones.append(polygon_zone(zid, f"C{c}", f"Z{z}", [
+                    (lat - d, lon - d), (lat - d, lon + d), (lat + d, lon + d), (lat + d, lon - d),
+                ]))
+    return zones, centers
+
+
+def linear_locate(zones: list, lat: float, lon: float):
+    for zone in zones:
+        if zone.contains(lat, lon):
+            return zone
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campuses", type=int, default=50)
+    parser.add_argument("--zones", type=int, default=20, help="зон на корпус")
+    parser.add_argument("--points", type=int, default=200_000)
+    parser.add_argument("--cell-deg", type=float, default=config.GEOFENCE_GRID_DEG)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    zones, centers = make_zones(args.campuses, args.zones, rnd)
+    points = []
+    for i in range(args.points):
+        if i % 2:
+            lat0, lon0 = rnd.choice(centers)
+            points.append((lat0 + rnd.uniform(-0.004, 0.004), lon0 + rnd.uniform(-0.004, 0.004)))
+        else:
+            points.append((45 + rnd.random(), 78 + rnd.random()))
+
+    t0 = time.perf_counter()
+    index = GeofenceIndex(zones, args.cell_deg)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    expected = [linear_locate(zones, lat, lon) for lat, lon in points]
+    linear = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    got = [index.locate(lat, lon) for lat, lon in points]
+    grid = time.perf_counter() - t0
+
+    # зоны пересекаются, так что сравниваем "внутри / вне", а не конкретную зону
+    assert [z is None for z in expected] == [z is None for z in got]
+
+    print(f"зон={len(zones)} точек={len(points)} ячейка={args.cell_deg}°  индекс за {build * 1000:.1f} мс")
+    print(f"перебор: {len(points) / linear:10.0f} проверок/с")
+    print(f"сетка:   {len(points) / grid:10.0f} проверок/с  (x{linear / grid:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# bench/bench_pages.py
+# Страницы, зависящие только от языка: рендер Jinja на каждый запрос
+# против кэша page_cache.py и ответа 304.
+#
+#   python bench/bench_pages.py --requests 20000
+#
+# Меряется стоимость сборки ответа на сервере (без сети и без HTTP-клиента,
+# чтобы его накладные расходы не прятали разницу) и размер тела.
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # шаблоны ищутся относительно корня
+
+from fastapi import Request  # noqa: E402
+from fastapi.templating import Jinja2Templates  # noqa: E402
+
+import config  # noqa: E402
+from page_cache import PageCache  # noqa: E402
+from static_assets import StaticAssets  # noqa: E402
+
+TEMPLATES = ("only_mobile.html", "login.html", "admin_login.html")
+
+
+def make_request(headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        "query_string": b"",
+    })
+
+
+def run(label: str, n: int, build) -> None:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        response = build()
+    elapsed = time.perf_counter() - t0
+    print(f"  {label:<22} {elapsed / n * 1e6:7.1f} мкс/ответ  тело {len(response.body):5d} байт")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    templates = Jinja2Templates(directory="templates")
+    # как в main.py: шаблоны берут адреса статики через static_url
+    templates.env.globals["static_url"] = StaticAssets("static", config.STATIC_BUILD_DIR).url
+    pages = PageCache(templates)
+    request = make_request({"cookie": "lang=ru"})
+
+    for template in TEMPLATES:
+        print(template)
+        run("рендер на запрос:", args.requests, lambda: templates.TemplateResponse(
+            template, {"request": request, "lang": "ru"}
+        ))
+        run("200 из кэша:", args.requests, lambda: pages.response(request, template, "ru"))
+
+        etag = pages.response(request, template, "ru").headers["etag"]
+        revalidate = make_request({"cookie": "lang=ru", "if-none-match": etag})
+        run("304 по If-None-Match:", args.requests, lambda: pages.response(revalidate, template, "ru"))
+
+    print(f"рендеров кэшем: {pages.renders}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# bench/bench_report.py
+# Выгрузка CSV "студент x день": память и скорость на годе всего колледжа.
+#
+#   python bench/bench_report.py --students 3000 --days 365
+#
+# Во временной SQLite-базе --students студентов и отметки примерно за 80%
+# дней. Для месяца и для всего периода меряется пик памяти Python
+# (tracemalloc) при потоковой выгрузке reports.py и, для сравнения, при
+# чтении того же запроса целиком через .all().
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="bench-report-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP, 'report.db')}"
+
+from bootstrap import bootstrap  # noqa: E402
+from database import engine  # noqa: E402
+from models import Attendance, Student  # noqa: E402
+from reports import _matrix_select, attendance_matrix_csv  # noqa: E402
+
+START = date(2024, 1, 1)
+
+
+def seed(students: int, days: int):
+    bootstrap(engine)
+    rnd = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(Student.__table__.insert(), [
+            {
+                "full_name": f"Студент {i}",
+                "login": f"s{i}",
+                "password": "1",
+                "group_name": f"G-{i % 120}",
+                "is_active": True,
+            }
+            for i in range(students)
+        ])
+        ids = [r[0] for r in conn.execute(Student.__table__.select().with_only_columns(Student.id))]
+        for d in range(days):
+            day = START + timedelta(days=d)
+            conn.execute(Attendance.__table__.insert(), [
+                {"student_id": sid, "date": day, "status": 1}
+                for sid in ids
+                if rnd.random() < 0.8
+            ])
+
+
+def measure(label: str, func):
+    # время без tracemalloc (он сильно замедляет выделения), пик — отдельным прогоном
+    t0 = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<10} {elapsed:6.2f} с  пик {peak / 2 ** 20:7.1f} МБ  ({size})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    seed(args.students, args.days)
+    print(f"студентов={args.students} дней={args.days}, заполнено за {time.perf_counter() - t0:.1f} с")
+
+    for days in (30, args.days):
+        date_to = START + timedelta(days=days - 1)
+        print(f"период {days} дней:")
+
+        def streamed():
+            return f"{sum(len(part) for part in attendance_matrix_csv(engine, START, date_to)) / 2 ** 20:.1f} МБ CSV"
+
+        def loaded():
+            with engine.connect() as conn:
+                return f"{len(conn.execute(_matrix_select(START, date_to, None)).all())} строк"
+
+        measure("поток", streamed)
+        measure(".all()", loaded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench/bench_roster_import.py
+# Загрузка списка студентов: по одному через ORM против roster_import.py.
+#
+#   python bench/bench_roster_import.py --students 5000
+#
+# Оба способа пишут в свою свежую SQLite-базу (профиль tuned) один и тот
+# же CSV; в файле есть немного повторов и пустых строк, как в настоящих
+# выгрузках деканата. Пароли оба хэшируют одинаково — в этом же процессе
+# и с минимальным числом раундов, — так что разница в цифрах — это запись.
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="bench-roster-")
+# меряем запись в БД, а не bcrypt: минимальная стоимость хэша, без пула
+os.environ.setdefault("PASSWORD_BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP, 'import.db')}"
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from bootstrap import bootstrap  # noqa: E402
+from database import make_engine  # noqa: E402
+from models import Student, normalize_login  # noqa: E402
+from passwords import hash_password  # noqa: E402
+from roster_import import import_roster  # noqa: E402
+
+
+def make_csv(students: int) -> str:
+    lines = ["ФИО;Логин;Пароль;Группа"]
+    for i in range(students):
+        lines.append(f"Студент {i} Тестович;s{i};pass{i};G-{i % 120}")
+        if i % 500 == 0:
+            lines.append(f"Повтор {i};S{i};x;G-1")
+            lines.append(";;;")
+    return "\n".join(lines) + "\n"
+
+
+def one_by_one(engine, data: str) -> int:
+    """Как раньше создавали студентов: ORM, проверка логина и коммит на каждого."""
+    factory = sessionmaker(bind=engine)
+    added = 0
+    for line in data.splitlines()[1:]:
+        full_name, login, password, group = line.split(";")
+        if not full_name:
+            continue
+        with factory() as db:
+            if db.query(Student.id).filter(Student.login_norm == normalize_login(login)).first():
+                continue
+            db.add(Student(full_name=full_name, login=login, password=hash_password(password), group_name=group))
+            db.commit()
+            added += 1
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=5000)
+    args = parser.parse_args()
+    data = make_csv(args.students)
+
+    engine = make_engine(f"sqlite:///{os.path.join(TMP, 'orm.db')}")
+    bootstrap(engine)
+    t0 = time.perf_counter()
+    added = one_by_one(engine, data)
+    orm_s = time.perf_counter() - t0
+    engine.dispose()
+
+    engine = make_engine(f"sqlite:///{os.path.join(TMP, 'bulk.db')}")
+    bootstrap(engine)
+    report = import_roster(engine, io.StringIO(data))
+    engine.dispose()
+
+    # demo из сидов — уже в обеих базах, в CSV его нет
+    assert report.inserted == added, (report.inserted, added)
+    print(f"студентов={args.students}, добавлено {added}, проблемных строк {len(report.problems)}")
+    print(f"по одному (ORM): {orm_s:7.2f} с  ({added / orm_s:8.0f} студентов/с)")
+    print(f"roster_import:   {report.elapsed_s:7.2f} с  ({added / report.elapsed_s:8.0f} студентов/с)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# bench/bench_startup.py
+# Холодный старт и лишние запросы к БД на лёгких страницах.
+#
+#   python bench/bench_startup.py --runs 5
+#
+# 1) время `import main` в свежем процессе и проверка, что импорт не создаёт
+#    файл базы;
+# 2) bootstrap на пустой базе и повторно на уже готовой (так стартует
+#    каждый следующий воркер);
+# 3) сколько SQL-запросов уходит на GET / и GET /admin/login.
+# Для п. 3 нужен httpx (TestClient).
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="bench-startup-")
+DB_PATH = os.path.join(TMP, "app.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["BOOTSTRAP_ON_STARTUP"] = "0"
+
+IMPORT_CODE = (
+    "import time; t0 = time.perf_counter(); import main; "
+    "print(time.perf_counter() - t0)"
+)
+
+MOBILE_UA = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Mobile/15E148"
+
+
+def measure_import(runs: int):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(TMP, 'import.db')}")
+    times = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_CODE],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    created = os.path.exists(os.path.join(TMP, "import.db"))
+    print(
+        f"import main:         медиана {statistics.median(times) * 1000:7.1f} мс  "
+        f"(из {runs}), файл базы создан: {'да' if created else 'нет'}"
+    )
+
+
+def measure_bootstrap(runs: int):
+    from database import make_engine
+    from bootstrap import bootstrap
+
+    fresh, warm = [], []
+    for i in range(runs):
+        engine = make_engine(f"sqlite:///{os.path.join(TMP, f'boot-{i}.db')}")
+        t0 = time.perf_counter()
+        bootstrap(engine)
+        fresh.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        bootstrap(engine)
+        warm.append(time.perf_counter() - t0)
+        engine.dispose()
+    print(f"bootstrap, пустая:   медиана {statistics.median(fresh) * 1000:7.1f} мс")
+    print(f"bootstrap, готовая:  медиана {statistics.median(warm) * 1000:7.1f} мс")
+
+
+def measure_queries():
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    import main
+    from bootstrap import bootstrap
+    from database import engine
+
+    bootstrap(engine)
+
+    counter = {"n": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter["n"] += 1
+
+    cases = [
+        ("GET / (компьютер)", "/", {}),
+        ("GET / (телефон)", "/", {"user-agent": MOBILE_UA}),
+        ("GET /admin/login", "/admin/login", {}),
+    ]
+    with TestClient(main.app) as client:
+        for name, url, headers in cases:
+            counter["n"] = 0
+            r = client.get(url, headers=headers)
+            r.raise_for_status()
+            print(f"{name:<20} SQL-запросов: {counter['n']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    measure_import(args.runs)
+    measure_bootstrap(args.runs)
+    measure_queries()
+
+
+if __name__ == "__main__":
+    main()
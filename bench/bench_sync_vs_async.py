@@ -0,0 +1,147 @@
+# bench/bench_sync_vs_async.py
+# Синхронные обработчики против асинхронных (DB_ASYNC=0 / DB_ASYNC=1).
+#
+#   python bench/bench_sync_vs_async.py --students 1500 --concurrency 200
+#
+# Для каждого режима поднимается отдельный uvicorn на копии одной и той же
+# заполненной SQLite-базы, и каждый студент делает GET /student и
+# POST /student/mark. Нужен httpx (pip install httpx).
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="bench-async-")
+SEED_DB = os.path.join(TMP, "seed.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{SEED_DB}"
+os.environ["DB_ASYNC"] = "0"
+
+from bootstrap import bootstrap  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import Student  # noqa: E402
+
+UA = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Mobile/15E148"
+# центр геозоны из main.py
+LAT, LON = 45.01, 78.22
+
+
+def seed(students: int):
+    bootstrap(engine)
+    db = SessionLocal()
+    db.add_all(
+        Student(
+            full_name=f"Студент {i}",
+            login=f"s{i}",
+            password="1",
+            group_name=f"G-{i % 40}",
+            device_uid=f"dev-{i}",
+        )
+        for i in range(students)
+    )
+    db.commit()
+    db.close()
+
+
+def start_server(mode: str, port: int) -> subprocess.Popen:
+    db_path = os.path.join(TMP, f"{mode}.db")
+    shutil.copy(SEED_DB, db_path)
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        DB_ASYNC="1" if mode == "async" else "0",
+        # меряем сами обработчики: лимиты rate_limit.py здесь только мешают
+        RATE_IP_PER_S="0",
+        SHED_MAX_CONCURRENT="0",
+    )
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/set-lang/ru", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"сервер {mode} не поднялся")
+
+
+async def run_load(port: int, students: int, concurrency: int) -> dict:
+    latencies = {"GET /student": [], "POST /student/mark": []}
+    limits = httpx.Limits(max_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60
+    ) as client:
+
+        async def one(i: int):
+            async with sem:
+                headers = {"user-agent": UA, "cookie": f"device_uid=dev-{i}"}
+                t0 = time.perf_counter()
+                r = await client.get("/student", headers=headers)
+                t1 = time.perf_counter()
+                r.raise_for_status()
+                r = await client.post(
+                    "/student/mark", data={"lat": LAT, "lon": LON}, headers=headers
+                )
+                t2 = time.perf_counter()
+                assert r.status_code == 302, r.status_code
+                latencies["GET /student"].append(t1 - t0)
+                latencies["POST /student/mark"].append(t2 - t1)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(students)))
+        elapsed = time.perf_counter() - started
+
+    return {"elapsed": elapsed, "latencies": latencies}
+
+
+def report(mode: str, students: int, result: dict):
+    print(f"{mode:>5}: {students * 2 / result['elapsed']:7.0f} запросов/с")
+    for route, values in result["latencies"].items():
+        q = statistics.quantiles(values, n=100)
+        print(
+            f"       {route:<20} p50={q[49] * 1000:7.1f} мс  "
+            f"p95={q[94] * 1000:7.1f} мс  p99={q[98] * 1000:7.1f} мс"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=1500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8791)
+    args = parser.parse_args()
+
+    seed(args.students)
+    print(f"студентов={args.students} одновременно={args.concurrency}")
+    for mode in ("sync", "async"):
+        proc = start_server(mode, args.port)
+        try:
+            result = asyncio.run(run_load(args.port, args.students, args.concurrency))
+        finally:
+            proc.terminate()
+            proc.wait()
+        report(mode, args.students, result)
+
+
+if __name__ == "__main__":
+    main()
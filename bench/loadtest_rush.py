@@ -0,0 +1,318 @@
+# bench/loadtest_rush.py
+# Нагрузочный прогон «утренний наплыв» с порогами регрессии.
+#
+#   python bench/loadtest_rush.py
+#   python bench/loadtest_rush.py --students 3000 --ramp 60 --workers 2 --json rush.json
+#   python bench/loadtest_rush.py --env DB_ASYNC=1 --thresholds ""
+#
+# Поднимает локальный uvicorn (main:app) на одноразовой SQLite-базе, куда
+# заранее засеяны N студентов с привязанными устройствами. Студенты
+# приходят в случайные моменты за --ramp секунд и проходят путь телефона:
+#   GET /  ->  GET /student  ->  POST /api/checkin (координаты внутри зоны)
+# с паузой «на подумать» между шагами. Так отмечается страница с JS
+# (student.js); доля --form-share идёт старой формой POST /student/mark,
+# как браузеры без fetch. Параллельно --pollers админов обновляют
+# /admin/dashboard каждые --poll-interval секунд.
+#
+# В конце — пропускная способность и p50/p95/p99 по каждому роуту, коды
+# ответов и сверка: сколько отметок реально оказалось в attendance.
+# Если результат хуже порогов из --thresholds (по умолчанию
+# bench/loadtest_thresholds.json), скрипт завершается с кодом 1 — его
+# можно ставить в CI или запускать перед релизом.
+#
+# Работает без сети: только 127.0.0.1. Нужен httpx (pip install httpx).
+# Лимит запросов на IP (rate_limit.py) на время прогона выключен — здесь
+# все «телефоны» приходят с одного адреса; лимит на устройство и сброс
+# нагрузки остаются как в проде.
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="loadtest-rush-")
+DB_PATH = os.path.join(TMP, "rush.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import func, select  # noqa: E402
+
+from bootstrap import bootstrap  # noqa: E402
+from database import engine  # noqa: E402
+from models import Attendance, Student, normalize_login  # noqa: E402
+
+DEFAULT_THRESHOLDS = os.path.join(ROOT, "bench", "loadtest_thresholds.json")
+
+USER_AGENTS = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148",
+    "Mozilla/5.0 (Linux; Android 13; SM-A536B) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 12; Redmi Note 11) AppleWebKit/537.36 Chrome/119.0 Mobile Safari/537.36",
+)
+# центр зоны «Главный корпус» из сидов (m005), радиус 400 м
+LAT, LON = 45.01, 78.22
+JITTER_DEG = 0.0015  # ~150 м — с запасом внутри зоны
+
+ROUTES = ("GET /", "GET /student", "POST /api/checkin", "POST /student/mark", "GET /admin/dashboard")
+EXPECTED = {
+    "GET /": 302,
+    "GET /student": 200,
+    "POST /api/checkin": 200,
+    "POST /student/mark": 302,
+    "GET /admin/dashboard": 200,
+}
+# маршруты отметки: подтверждённая отметка — ответ с кодом из EXPECTED
+CHECKIN_ROUTES = ("POST /api/checkin", "POST /student/mark")
+
+
+def seed(students: int):
+    bootstrap(engine)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "full_name": f"Студент {i}",
+            "full_name_norm": normalize_login(f"Студент {i}"),
+            "login": f"s{i}",
+            "login_norm": f"s{i}",
+            "password": "1",
+            "group_name": f"G-{i % 60}",
+            "device_uid": f"dev-{i}",
+            "is_active": True,
+            "created_at": now,
+        }
+        for i in range(students)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Student.__table__.insert(), rows)
+    engine.dispose()
+
+
+def start_server(port: int, workers: int, env_overrides: dict) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{DB_PATH}",
+        RATE_IP_PER_S="0",
+        ADMIN_SESSION_SECRET_FILE=os.path.join(TMP, "session.secret"),
+        **env_overrides,
+    )
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/admin/login", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("uvicorn не поднялся")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.codes = defaultdict(Counter)
+
+    async def call(self, route: str, request):
+        t0 = time.perf_counter()
+        try:
+            response = await request
+            code = response.status_code
+        except httpx.HTTPError as exc:
+            code = type(exc).__name__
+        self.latencies[route].append(time.perf_counter() - t0)
+        self.codes[route][code] += 1
+        return code
+
+
+async def student(
+    client, rec: Recorder, rng: random.Random, i: int, arrive_at: float, think: float, form_share: float
+):
+    await asyncio.sleep(max(0.0, arrive_at - time.perf_counter()))
+    headers = {"user-agent": rng.choice(USER_AGENTS), "cookie": f"device_uid=dev-{i}; lang=ru"}
+    await rec.call("GET /", client.get("/", headers=headers))
+    await asyncio.sleep(rng.uniform(0, think))
+    await rec.call("GET /student", client.get("/student", headers=headers))
+    await asyncio.sleep(rng.uniform(0, think))
+    coords = {
+        "lat": LAT + rng.uniform(-JITTER_DEG, JITTER_DEG),
+        "lon": LON + rng.uniform(-JITTER_DEG, JITTER_DEG),
+    }
+    if rng.random() < form_share:
+        await rec.call("POST /student/mark", client.post("/student/mark", data=coords, headers=headers))
+    else:
+        await rec.call("POST /api/checkin", client.post("/api/checkin", json=coords, headers=headers))
+
+
+async def poller(client, rec: Recorder, interval: float, stop: asyncio.Event):
+    r = await client.post(
+        "/admin/login", data={"username": "admin", "password": "admin123"}
+    )
+    cookie = r.cookies.get("admin_session") or client.cookies.get("admin_session")
+    if not cookie:
+        raise RuntimeError(f"вход в админку не удался: {r.status_code}")
+    headers = {"cookie": f"admin_session={cookie}; lang=ru"}
+    while not stop.is_set():
+        await rec.call("GET /admin/dashboard", client.get("/admin/dashboard", headers=headers))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(args) -> tuple:
+    rec = Recorder()
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=args.timeout
+    ) as client:
+        stop = asyncio.Event()
+        pollers = [
+            asyncio.create_task(poller(client, rec, args.poll_interval, stop))
+            for _ in range(args.pollers)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            student(
+                client, rec, random.Random(rng.random()), i,
+                started + rng.uniform(0, args.ramp), args.think, args.form_share,
+            )
+            for i in range(args.students)
+        ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*pollers)
+    return rec, elapsed
+
+
+def summarize(rec: Recorder, elapsed: float) -> dict:
+    total = sum(len(v) for v in rec.latencies.values())
+    result = {"elapsed_s": round(elapsed, 3), "rps": round(total / elapsed, 1), "routes": {}}
+    for route in ROUTES:
+        values = sorted(rec.latencies.get(route, []))
+        if not values:
+            continue
+        # inclusive: на малых выборках exclusive экстраполирует за max, и p99
+        # выходил больше самого медленного запроса
+        q = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else [values[0]] * 99
+        codes = rec.codes[route]
+        errors = sum(n for code, n in codes.items() if code != EXPECTED[route])
+        result["routes"][route] = {
+            "count": len(values),
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(q[49] * 1000, 1),
+            "p95_ms": round(q[94] * 1000, 1),
+            "p99_ms": round(q[98] * 1000, 1),
+            "max_ms": round(values[-1] * 1000, 1),
+            "error_rate": round(errors / len(values), 4),
+            "codes": {str(code): n for code, n in sorted(codes.items(), key=str)},
+        }
+    return result
+
+
+def print_report(result: dict, stored: int, expected_marks: int):
+    print(f"за {result['elapsed_s']:.1f} с: {result['rps']:.0f} запросов/с всего")
+    print(f"  {'роут':<22} {'n':>6} {'зап/с':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  коды")
+    for route, r in result["routes"].items():
+        codes = " ".join(f"{code}×{n}" for code, n in r["codes"].items())
+        print(
+            f"  {route:<22} {r['count']:>6} {r['rps']:>7.0f} {r['p50_ms']:>6.0f}мс "
+            f"{r['p95_ms']:>6.0f}мс {r['p99_ms']:>6.0f}мс {r['max_ms']:>6.0f}мс  {codes}"
+        )
+    print(f"отметок в attendance: {stored} из {expected_marks} подтверждённых")
+
+
+def check_thresholds(result: dict, thresholds: dict, stored: int, confirmed: int) -> list:
+    """Список нарушений; пустой — всё в норме."""
+    failures = []
+    if result["rps"] < thresholds.get("min_rps", 0):
+        failures.append(f"пропускная способность {result['rps']} < {thresholds['min_rps']} запросов/с")
+    if stored != confirmed:
+        failures.append(f"подтверждено {confirmed} отметок, а в attendance {stored}")
+    for route, limits in thresholds.get("routes", {}).items():
+        r = result["routes"].get(route)
+        if r is None:
+            continue
+        for key, limit in limits.items():
+            if r.get(key, 0) > limit:
+                failures.append(f"{route}: {key}={r[key]} > {limit}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон утреннего наплыва")
+    parser.add_argument("--students", type=int, default=600)
+    parser.add_argument("--ramp", type=float, default=30, help="за сколько секунд приходят все студенты")
+    parser.add_argument("--think", type=float, default=1.0, help="пауза между шагами, до N секунд")
+    parser.add_argument("--form-share", type=float, default=0.2,
+                        help="доля отметок формой /student/mark, остальные — /api/checkin")
+    parser.add_argument("--pollers", type=int, default=3, help="админов с открытым дашбордом")
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=1, help="воркеров uvicorn")
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8795)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="настройка config.py для сервера, например --env DB_ASYNC=1")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="JSON с порогами; '' — без проверки")
+    parser.add_argument("--json", help="сохранить результат в файл")
+    args = parser.parse_args()
+
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+    seed(args.students)
+    print(
+        f"студентов={args.students} за {args.ramp:g} с, админов={args.pollers}, "
+        f"воркеров={args.workers} {' '.join(args.env)}"
+    )
+
+    proc = start_server(args.port, args.workers, env_overrides)
+    try:
+        rec, elapsed = asyncio.run(run_load(args))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    result = summarize(rec, elapsed)
+    confirmed = sum(rec.codes[route][EXPECTED[route]] for route in CHECKIN_ROUTES)
+    with engine.connect() as conn:
+        stored = conn.scalar(select(func.count()).select_from(Attendance))
+    print_report(result, stored, confirmed)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({**result, "attendance_rows": stored, "args": vars(args)}, f, ensure_ascii=False, indent=2)
+
+    if not args.thresholds:
+        return
+    with open(args.thresholds, encoding="utf-8") as f:
+        thresholds = json.load(f)
+    failures = check_thresholds(result, thresholds, stored, confirmed)
+    if failures:
+        print("ПОРОГИ НАРУШЕНЫ:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"пороги из {os.path.relpath(args.thresholds, ROOT)} соблюдены")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# bootstrap.py
+# Разовая подготовка базы: таблицы, миграции, учётки по умолчанию.
+#
+# Раньше всё это делалось при импорте модулей (database.py сеял демо-данные,
+# main.py звал create_all и миграции), а ensure_admin лез в БД на каждом
+# GET / и /admin/login. Теперь импорт ничего не пишет, а подготовка идёт
+# один раз — в lifespan приложения или отдельным шагом деплоя:
+#
+#   python bootstrap.py
+#
+# При нескольких воркерах uvicorn каждый запускает lifespan сам, поэтому
+# подготовка идёт под межпроцессной блокировкой: первый делает работу,
+# остальные ждут и видят, что всё уже применено. Для SQLite это блокировка
+# ОС на lock-файле (flock / msvcrt.locking): её снимает сама ОС, если
+# процесс упал, поэтому «брошенных» блокировок по возрасту файла нет, а
+# долгие миграции (m008 переписывает всю attendance) никто не перебьёт.
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+import models  # noqa: F401  — регистрирует таблицы в Base.metadata
+from database import Base, backend_name
+from migrations import run_migrations
+
+# произвольный ключ pg_advisory_lock, общий для всех воркеров
+PG_LOCK_KEY = 802_431_009
+
+# как часто повторять попытку msvcrt.locking (flock просто ждёт)
+LOCK_POLL_S = 0.1
+
+
+def _sqlite_lock_path(engine: Engine) -> Optional[str]:
+    database = engine.url.database
+    if not database or database == ":memory:":
+        return None
+    return os.path.abspath(database) + ".bootstrap.lock"
+
+
+def _lock_fd(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    # LK_LOCK сдаётся через 10 с — ждём сами, сколько понадобится
+    while True:
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            time.sleep(LOCK_POLL_S)
+
+
+def _unlock_fd(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def _file_lock(path: str):
+    # файл не удаляем: иначе следующий мог бы заблокировать уже новый файл,
+    # пока ждущий держит дескриптор старого
+    fd = os.open(path, os.O_CREAT | os.O_RDWR)
+    try:
+        _lock_fd(fd)
+        try:
+            yield
+        finally:
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def bootstrap_lock(engine: Engine):
+    """Межпроцессная блокировка на время подготовки базы."""
+    backend = backend_name(str(engine.url))
+    if backend == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": PG_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PG_LOCK_KEY})
+        return
+
+    path = _sqlite_lock_path(engine) if backend == "sqlite" else None
+    if path is None:
+        yield
+        return
+    with _file_lock(path):
+        yield
+
+
+def bootstrap(engine: Engine) -> list:
+    """
+    Создать недостающие таблицы и применить новые миграции.
+    Возвращает номера применённых сейчас миграций (пусто — база уже готова).
+    """
+    with bootstrap_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        return run_migrations(engine)
+
+
+def main():
+    from database import engine
+
+    applied = bootstrap(engine)
+    if applied:
+        print("Применены миграции:", ", ".join(f"{v:03d}" for v in applied))
+    else:
+        print("База уже готова")
+
+
+if __name__ == "__main__":
+    main()
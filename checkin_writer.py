@@ -0,0 +1,216 @@
+# checkin_writer.py
+# Групповой коммит отметок посещаемости.
+#
+# В утренний час пик сотни студентов жмут "Отметиться" одновременно, и каждый
+# запрос упирается в блокировку записи SQLite. Вместо коммита на каждый запрос
+# отметки складываются в очередь, фоновый поток собирает их за короткое окно
+# и пишет одной транзакцией. Запрос получает ответ только после коммита,
+# так что подтверждение остаётся надёжным.
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+from models import Attendance, Device
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _resolve(future: Future, result=None, exc: Optional[BaseException] = None):
+    # асинхронный обработчик мог уже отменить ожидание — это не ошибка записи
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+def insert_ignore_attendance(dialect_name: str):
+    """INSERT ... ON CONFLICT (student_id, date) DO NOTHING для нужного диалекта."""
+    table = Attendance.__table__
+    return dialect_insert(dialect_name, table).on_conflict_do_nothing(
+        index_elements=[table.c.student_id, table.c.date]
+    )
+
+
+def intern_devices(db: Session, uids: Iterable[str]) -> Dict[str, int]:
+    """uid устройства -> devices.id; неизвестные устройства добавляются."""
+    uids = sorted(set(uids))
+    if not uids:
+        return {}
+    table = Device.__table__
+    db.execute(
+        dialect_insert(db.get_bind().dialect.name, table).on_conflict_do_nothing(index_elements=[table.c.uid]),
+        [{"uid": uid} for uid in uids],
+    )
+    return dict(db.execute(select(table.c.uid, table.c.id).where(table.c.uid.in_(uids))).all())
+
+
+class CheckinWriter:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        window_ms: float,
+        max_batch: int = 500,
+        on_inserted: Optional[Callable[..., object]] = None,
+        on_committed: Optional[Callable[[object], None]] = None,
+        prepare: Optional[Callable[[Session, list], object]] = None,
+    ):
+        self.session_factory = session_factory
+        # вызывается в транзакции до вставки со всеми отметками пачки и может
+        # дописать в них поля; его результат on_inserted получает третьим аргументом
+        self.prepare = prepare
+        # вызывается в той же транзакции со списком реально добавленных отметок
+        self.on_inserted = on_inserted
+        # получает результат on_inserted уже после коммита (живой дашборд)
+        self.on_committed = on_committed
+        self.window_s = max(window_ms, 0) / 1000.0
+        self.max_batch = max(max_batch, 1)
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # ---------- публичный API ----------
+
+    @property
+    def batching(self) -> bool:
+        return self.window_s > 0
+
+    @property
+    def pending(self) -> int:
+        """Сколько отметок ждут коммита (для /metrics)."""
+        return self._queue.qsize()
+
+    def write(self, values: dict, timeout: Optional[float] = None) -> bool:
+        """
+        Записать отметку и дождаться коммита.
+        Возвращает True, если запись добавлена, и False, если у студента
+        уже есть отметка за этот день. TimeoutError — коммит не успел.
+        """
+        if not self.batching:
+            return self._flush([(values, None)])[0]
+        try:
+            return self.submit(values).result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError("отметка не подтверждена за отведённое время")
+
+    def submit(self, values: dict) -> Future:
+        """Поставить отметку в очередь. Future завершается после коммита."""
+        self.start()
+        future: Future = Future()
+        self._queue.put((values, future))
+        return future
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                thread = threading.Thread(
+                    target=self._run, name="checkin-writer", daemon=True
+                )
+                thread.start()
+                self._thread = thread
+
+    def stop(self, timeout: Optional[float] = None):
+        """Дописать всё, что уже в очереди, и остановить поток."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    # ---------- фоновый поток ----------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        try:
+            results = self._flush(batch)
+        except Exception:
+            # одна битая запись не должна ронять всю пачку:
+            # повторяем по одной, каждая со своим коммитом
+            for values, future in batch:
+                try:
+                    result = self._flush([(values, None)])[0]
+                except Exception as exc:
+                    _resolve(future, exc=exc)
+                else:
+                    _resolve(future, result)
+            return
+
+        for (_, future), result in zip(batch, results):
+            _resolve(future, result)
+
+    def _flush(self, batch) -> list:
+        """Одна транзакция на всю пачку. Возвращает флаги "запись добавлена"."""
+        db = self.session_factory()
+        try:
+            # уникальный индекс (student_id, date) сам отсекает повторы,
+            # rowcount == 0 означает, что отметка за день уже была
+            stmt = insert_ignore_attendance(db.get_bind().dialect.name)
+            # device_uid в строке не храним — только ссылку на devices,
+            # одна выборка id на всю пачку
+            device_ids = intern_devices(db, (v["device_uid"] for v, _ in batch if v.get("device_uid")))
+            prepared = None
+            if self.prepare is not None:
+                prepared = self.prepare(db, [values for values, _ in batch])
+            results = []
+            for values, _ in batch:
+                row = dict(values)
+                row["device_id"] = device_ids.get(row.pop("device_uid", None))
+                results.append(db.execute(stmt, row).rowcount > 0)
+
+            inserted = [values for (values, _), ok in zip(batch, results) if ok]
+            hook_result = None
+            if inserted and self.on_inserted is not None:
+                args = (db, inserted) if self.prepare is None else (db, inserted, prepared)
+                hook_result = self.on_inserted(*args)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        if inserted and self.on_committed is not None:
+            # запись уже надёжна, ошибка уведомления не должна её "отменять"
+            try:
+                self.on_committed(hook_result)
+            except Exception:
+                logger.exception("on_committed завершился с ошибкой")
+        return results
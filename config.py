@@ -0,0 +1,184 @@
+# config.py
+# Настройки приложения. Всё можно переопределить переменными окружения.
+import os
+
+
+# -------------------------------------------------
+# БАЗА ДАННЫХ
+# -------------------------------------------------
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./attendance.db")
+
+# 1 — логин, страницы студента и дашборд работают через асинхронную сессию
+# (aiosqlite для SQLite, asyncpg для PostgreSQL); 0 — обычный синхронный путь
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+# пусто — выводится из DATABASE_URL (sqlite+aiosqlite / postgresql+asyncpg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+# Профиль движка (см. database.engine_options):
+#   tuned — SQLite в WAL с PRAGMA ниже и пулом DB_POOL_*  (по умолчанию)
+#   plain — настройки SQLAlchemy/SQLite по умолчанию, как было раньше
+# Для postgresql://... (нужен psycopg2 / asyncpg) всегда действует пул DB_POOL_*.
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+
+# SQLite, профиль tuned. synchronous=FULL оставляет отметки надёжными даже
+# при потере питания; групповой коммит и так делает fsync редким.
+# NORMAL в WAL быстрее, но может потерять последние коммиты при сбое ОС.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "FULL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+
+# пул соединений
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+
+# 1 — таблицы и миграции готовятся при старте приложения (bootstrap.py);
+# 0 — это отдельный шаг деплоя `python bootstrap.py`, старт без записи в БД
+BOOTSTRAP_ON_STARTUP = os.getenv("BOOTSTRAP_ON_STARTUP", "1") == "1"
+
+
+# -------------------------------------------------
+# ОТМЕТКИ (ГРУППОВОЙ КОММИТ)
+# -------------------------------------------------
+
+# окно, в течение которого копим отметки перед одним общим коммитом (мс);
+# 0 — писать каждую отметку своим коммитом, как раньше
+CHECKIN_BATCH_WINDOW_MS = float(os.getenv("CHECKIN_BATCH_WINDOW_MS", "5"))
+
+# максимум отметок в одной транзакции
+CHECKIN_BATCH_MAX_SIZE = int(os.getenv("CHECKIN_BATCH_MAX_SIZE", "500"))
+
+# сколько запрос ждёт подтверждения записи, прежде чем сдаться (сек)
+CHECKIN_ACK_TIMEOUT_S = float(os.getenv("CHECKIN_ACK_TIMEOUT_S", "10"))
+
+
+# -------------------------------------------------
+# КЭШ УСТРОЙСТВ СТУДЕНТОВ
+# -------------------------------------------------
+
+# сколько device_uid держим в памяти одного воркера
+DEVICE_CACHE_SIZE = int(os.getenv("DEVICE_CACHE_SIZE", "5000"))
+
+# время жизни записи (сек); ограничивает устаревание между воркерами
+DEVICE_CACHE_TTL_S = float(os.getenv("DEVICE_CACHE_TTL_S", "60"))
+
+
+# -------------------------------------------------
+# ГЕОЗОНЫ (geofence.py)
+# -------------------------------------------------
+
+# шаг сетки индекса в градусах (0.01° ≈ 1.1 км по широте)
+GEOFENCE_GRID_DEG = float(os.getenv("GEOFENCE_GRID_DEG", "0.01"))
+
+# как часто воркер сверяется с БД, не поменялись ли зоны (сек)
+GEOFENCE_RELOAD_S = float(os.getenv("GEOFENCE_RELOAD_S", "30"))
+
+
+# -------------------------------------------------
+# ОТЧЁТЫ (reports.py)
+# -------------------------------------------------
+
+# самый длинный период одного отчёта (дней) — по колонке на день
+REPORT_MAX_DAYS = int(os.getenv("REPORT_MAX_DAYS", "400"))
+
+# сколько строк БД читаем за раз при выгрузке
+REPORT_CHUNK_ROWS = int(os.getenv("REPORT_CHUNK_ROWS", "2000"))
+
+# отсутствующих на странице /admin/groups/{group}/absent (absentees.py);
+# ?limit= больше ABSENT_MAX_PAGE_SIZE не принимается
+ABSENT_PAGE_SIZE = int(os.getenv("ABSENT_PAGE_SIZE", "50"))
+ABSENT_MAX_PAGE_SIZE = int(os.getenv("ABSENT_MAX_PAGE_SIZE", "500"))
+
+
+# -------------------------------------------------
+# СТАТИКА (static_assets.py)
+# -------------------------------------------------
+
+# куда `python static_assets.py` пишет файлы с хэшем и manifest.json
+STATIC_BUILD_DIR = os.getenv("STATIC_BUILD_DIR", "build/static")
+
+
+# -------------------------------------------------
+# ПАРОЛИ (passwords.py)
+# -------------------------------------------------
+
+# процессов для bcrypt на воркер uvicorn (0 — считать в потоке запроса)
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+
+# сколько проверок может ждать сверх PASSWORD_WORKERS, дальше — отказ
+PASSWORD_QUEUE = int(os.getenv("PASSWORD_QUEUE", "32"))
+
+# сколько ждём проверку, включая очередь (сек)
+PASSWORD_TIMEOUT_S = float(os.getenv("PASSWORD_TIMEOUT_S", "5"))
+
+# стоимость bcrypt; каждая единица удваивает время проверки
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+
+
+# -------------------------------------------------
+# ЛИМИТЫ ЗАПРОСОВ (rate_limit.py)
+# -------------------------------------------------
+
+# POST /login и /student/mark с одного устройства: токенов в секунду и запас
+# (0 — без лимита)
+RATE_DEVICE_PER_S = float(os.getenv("RATE_DEVICE_PER_S", "0.5"))
+RATE_DEVICE_BURST = float(os.getenv("RATE_DEVICE_BURST", "5"))
+
+# то же с одного IP; весь колледж может сидеть за одним NAT
+RATE_IP_PER_S = float(os.getenv("RATE_IP_PER_S", "30"))
+RATE_IP_BURST = float(os.getenv("RATE_IP_BURST", "300"))
+
+# сколько ключей помнит воркер и через сколько секунд тишины ключ забывается
+RATE_MAX_KEYS = int(os.getenv("RATE_MAX_KEYS", "50000"))
+RATE_IDLE_S = float(os.getenv("RATE_IDLE_S", "600"))
+
+# брать IP из X-Forwarded-For (только за своим reverse proxy)
+RATE_TRUST_FORWARDED = os.getenv("RATE_TRUST_FORWARDED", "0") == "1"
+
+# одновременных студенческих запросов на воркер (0 — без ограничения)
+SHED_MAX_CONCURRENT = int(os.getenv("SHED_MAX_CONCURRENT", "64"))
+
+# дольше этого запрос в очереди не ждёт — сразу 503 (сек)
+SHED_QUEUE_WAIT_S = float(os.getenv("SHED_QUEUE_WAIT_S", "0.5"))
+
+
+# -------------------------------------------------
+# СЕССИИ АДМИНКИ (admin_sessions.py)
+# -------------------------------------------------
+
+# ключ подписи cookie; один на все воркеры и машины
+ADMIN_SESSION_SECRET = os.getenv("ADMIN_SESSION_SECRET", "")
+
+# если ключ не задан — генерируется один раз в этот файл
+ADMIN_SESSION_SECRET_FILE = os.getenv("ADMIN_SESSION_SECRET_FILE", ".admin_session_secret")
+
+# срок жизни сессии (сек)
+ADMIN_SESSION_TTL_S = int(os.getenv("ADMIN_SESSION_TTL_S", str(60 * 60 * 8)))
+
+# как часто воркер перечитывает список отозванных при выходе сессий (сек)
+ADMIN_REVOCATION_RELOAD_S = float(os.getenv("ADMIN_REVOCATION_RELOAD_S", "5"))
+
+
+# -------------------------------------------------
+# МЕТРИКИ (metrics.py)
+# -------------------------------------------------
+
+# токен для сборщика Prometheus: Authorization: Bearer <токен>;
+# пусто — /metrics доступен только из сессии админа
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+# -------------------------------------------------
+# АРХИВ ПОСЕЩАЕМОСТИ (attendance_archive.py)
+# -------------------------------------------------
+
+# куда складываются месяцы attendance-ГГГГ-ММ.csv.gz
+ATTENDANCE_ARCHIVE_DIR = os.getenv("ATTENDANCE_ARCHIVE_DIR", "archive")
+
+# сколько полных месяцев (кроме текущего) остаются в живой таблице; не меньше 1
+ARCHIVE_KEEP_MONTHS = int(os.getenv("ARCHIVE_KEEP_MONTHS", "6"))
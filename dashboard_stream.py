@@ -0,0 +1,106 @@
+# dashboard_stream.py
+# Живой дашборд: Server-Sent Events с приращениями по группам.
+#
+# CheckinWriter после коммита отдаёт сюда приращения, которые group_stats
+# уже посчитал внутри транзакции. Событие сериализуется один раз и
+# раскладывается по очередям открытых вкладок — на каждую отметку ноль
+# дополнительных запросов к БД, сколько бы админов ни смотрело.
+#
+# Рассылка живёт внутри воркера: вкладка видит отметки, записанные тем же
+# процессом. При нескольких воркерах страница всё равно остаётся верной
+# после перезагрузки — счётчики в БД общие.
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+
+# сколько событий может накопиться у медленной вкладки, прежде чем
+# мы перестанем копить и попросим её перезагрузиться
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# комментарий-пинг, чтобы прокси не рвали тихое соединение (сек)
+KEEPALIVE_S = 15
+
+_RELOAD = json.dumps({"type": "reload"})
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, data: str):
+        # выполняется в цикле событий подписчика
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RELOAD)
+
+
+class Broadcaster:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> _Subscriber:
+        sub = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: dict):
+        """Можно вызывать из любого потока."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        data = json.dumps(event, ensure_ascii=False)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, data)
+            except RuntimeError:
+                # цикл уже закрыт — вкладка ушла вместе с ним
+                self.unsubscribe(sub)
+
+
+dashboard_events = Broadcaster()
+
+
+def publish_checkins(deltas: Optional[dict]):
+    """Хук on_committed для CheckinWriter: {день: Counter(группа -> +N)}."""
+    for day, groups in (deltas or {}).items():
+        dashboard_events.publish({
+            "type": "delta",
+            "date": day.isoformat(),
+            "groups": [
+                {"group_name": group_name, "present": n}
+                for group_name, n in sorted(groups.items())
+            ],
+        })
+
+
+async def event_stream(request: Request) -> AsyncIterator[str]:
+    sub = dashboard_events.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                data = await asyncio.wait_for(sub.queue.get(), timeout=KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"data: {data}\n\n"
+    finally:
+        dashboard_events.unsubscribe(sub)
@@ -1,15 +1,80 @@
 # database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-# ВРЕМЕННАЯ база для теста (файл attendance.db в этой же папке)
-# Потом сможешь заменить на SQL Server / PostgreSQL и т.д.
-SQLALCHEMY_DATABASE_URL = "sqlite:///./attendance.db"
+import config
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # нужно для SQLite + FastAPI
-)
+# по умолчанию — файл attendance.db в этой же папке (см. config.DATABASE_URL)
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+
+# ---------- ПРОФИЛИ ДВИЖКА ----------
+
+def backend_name(url: str) -> str:
+    return url.split("://", 1)[0].split("+", 1)[0]
+
+
+def engine_options(url: str, profile: str = config.DB_PROFILE, is_async: bool = False) -> dict:
+    """Аргументы create_engine для бэкенда из url и профиля из config.DB_PROFILE."""
+    backend = backend_name(url)
+
+    if backend == "postgresql":
+        return {
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "pool_timeout": config.DB_POOL_TIMEOUT_S,
+            "pool_recycle": config.DB_POOL_RECYCLE_S,
+            "pool_pre_ping": True,
+        }
+
+    options = {}
+    if backend == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}  # нужно для SQLite + FastAPI
+        if profile == "tuned" and ":memory:" not in url:
+            # соединения SQLite дешёвые, а пул по умолчанию (5 + 10)
+            # меньше пула потоков Starlette
+            options["pool_size"] = config.DB_POOL_SIZE
+            options["max_overflow"] = config.DB_MAX_OVERFLOW
+            options["pool_timeout"] = config.DB_POOL_TIMEOUT_S
+    return options
+
+
+def sqlite_pragmas() -> list:
+    return [
+        f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}",
+        # отрицательное значение — размер в КиБ, а не в страницах
+        f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE_MB * 1024 * 1024}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def apply_profile(engine, profile: str = config.DB_PROFILE):
+    """Профиль tuned для SQLite: PRAGMA на каждое новое соединение пула."""
+    if engine.dialect.name != "sqlite" or profile != "tuned":
+        return engine
+
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = config.DB_PROFILE):
+    return apply_profile(create_engine(url, **engine_options(url, profile)), profile)
+
+
+engine = make_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -24,43 +89,47 @@ def get_db():
         db.close()
 
 
-# ---------- ВРЕМЕННЫЕ ДАННЫЕ ДЛЯ ТЕСТА ----------
+# ---------- АСИНХРОННЫЙ ДВИЖОК (DB_ASYNC=1) ----------
 
-def init_demo_data():
-    """
-    Создаём таблицы и добавляем:
-    - админа (admin / admin123)
-    - студента (demo / 1234)
-    """
-    from models import Student, Admin  # импорт здесь, чтобы не было круговой зависимости
+def async_url(url: str) -> str:
+    """sqlite:///... -> sqlite+aiosqlite:///..., postgresql://... -> postgresql+asyncpg://..."""
+    scheme, rest = url.split("://", 1)
+    base = scheme.split("+", 1)[0]
+    driver = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}.get(base)
+    if driver is None:
+        raise ValueError(f"нет асинхронного драйвера для {scheme}")
+    return f"{base}+{driver}://{rest}"
 
-    # создаём таблицы, если их ещё нет
-    Base.metadata.create_all(bind=engine)
 
-    db = SessionLocal()
-    try:
-        # Админ по умолчанию
-        admin = db.query(Admin).filter_by(username="admin").first()
-        if not admin:
-            admin = Admin(username="admin", password="admin123")
-            db.add(admin)
-
-        # Тестовый студент demo / 1234
-        student = db.query(Student).filter_by(login="demo").first()
-        if not student:
-            student = Student(
-                full_name="Тестовый Студент",
-                login="demo",
-                password="1234",
-                group_name="SW-999",
-                is_active=True,
-            )
-            db.add(student)
-
-        db.commit()
-    finally:
-        db.close()
+async_engine = None
+AsyncSessionLocal = None
+
+if config.DB_ASYNC:
+    # драйверы (aiosqlite / asyncpg) нужны только в этом режиме
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _async_database_url = config.ASYNC_DATABASE_URL or async_url(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(
+        _async_database_url,
+        **engine_options(_async_database_url, is_async=True),
+    )
+    # PRAGMA вешаются на синхронный движок-обёртку, как и для обычного
+    apply_profile(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 
+def dialect_insert(dialect_name: str, table):
+    """insert() с поддержкой ON CONFLICT (SQLite и PostgreSQL)."""
+    if dialect_name == "postgresql":
+        return postgresql.insert(table)
+    if dialect_name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT не поддержан для {dialect_name}")
 
-# вызывем инициализацию один раз при старте приложения
-init_demo_data()
@@ -0,0 +1,134 @@
+# device_cache.py
+# Кэш "device_uid -> студент" для get_student_by_device.
+#
+# Почти каждый запрос студента (GET /student, POST /student/mark) начинается
+# с поиска по cookie device_uid, а телефоны каждое утро одни и те же.
+# Держим в памяти воркера ограниченный LRU с TTL и лёгкими снимками студента
+# (не ORM-объектами, чтобы они не зависели от закрытой сессии).
+#
+# Кэш живёт в каждом воркере свой. /login сбрасывает запись явно, а любое
+# изменение device_uid / is_active (и удаление) Student сессия запоминает при
+# flush и сбрасывает после коммита: до коммита параллельный промах прочитал
+# бы старую строку и снова положил её в кэш на весь TTL. В других воркерах
+# устаревшая запись проживёт не дольше TTL.
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+import config
+from models import Student
+
+
+@dataclass(frozen=True)
+class StudentSnapshot:
+    id: int
+    full_name: str
+    login: Optional[str]
+    group_name: Optional[str]
+    device_uid: str
+
+    @classmethod
+    def from_student(cls, student: Student) -> "StudentSnapshot":
+        return cls(
+            id=student.id,
+            full_name=student.full_name,
+            login=student.login,
+            group_name=student.group_name,
+            device_uid=student.device_uid,
+        )
+
+
+class DeviceSessionCache:
+    def __init__(self, max_size: int, ttl_s: float):
+        self.max_size = max(max_size, 0)
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, device_uid: str) -> Optional[StudentSnapshot]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(device_uid)
+            if item is not None:
+                snapshot, expires_at = item
+                if expires_at > now:
+                    self._items.move_to_end(device_uid)
+                    self.hits += 1
+                    return snapshot
+                del self._items[device_uid]
+            self.misses += 1
+            return None
+
+    def put(self, snapshot: StudentSnapshot):
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._items[snapshot.device_uid] = (snapshot, time.monotonic() + self.ttl_s)
+            self._items.move_to_end(snapshot.device_uid)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, *device_uids: Optional[str]):
+        with self._lock:
+            for device_uid in device_uids:
+                if device_uid:
+                    self._items.pop(device_uid, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+device_cache = DeviceSessionCache(config.DEVICE_CACHE_SIZE, config.DEVICE_CACHE_TTL_S)
+
+# uid, которые сбросить после коммита (Session.info)
+_STALE_UIDS = "device_cache_stale"
+
+
+def _changed_uids(target: Student) -> set:
+    """Сменили устройство или деактивировали студента — старый и новый uid."""
+    state = inspect(target)
+    uids = set()
+    for attr in ("device_uid", "is_active"):
+        history = state.attrs[attr].history
+        if history.has_changes():
+            uids.add(target.device_uid)
+            if attr == "device_uid":
+                uids.update(history.deleted)
+    return uids
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_students(session: Session, flush_context):
+    uids = set()
+    for target in session.dirty:
+        if isinstance(target, Student):
+            uids |= _changed_uids(target)
+    for target in session.deleted:
+        if isinstance(target, Student):
+            uids.add(target.device_uid)
+    uids.discard(None)
+    if uids:
+        session.info.setdefault(_STALE_UIDS, set()).update(uids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    device_cache.invalidate(*session.info.pop(_STALE_UIDS, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    session.info.pop(_STALE_UIDS, None)
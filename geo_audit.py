@@ -0,0 +1,240 @@
+# geo_audit.py
+# Повторная проверка сохранённых отметок по текущим геозонам.
+#
+# Когда зону корпуса передвинули или нашли "ферму" поддельных координат,
+# нужно перепроверить месяцы отметок. Построчный haversine в Python на
+# миллионах строк — минуты; здесь строки читаются потоком кусками по
+# --chunk, а попадание в зоны и расстояния считаются NumPy сразу по
+# всему куску.
+#
+#   python geo_audit.py                                  — все отметки с координатами
+#   python geo_audit.py --since 2024-09-01 --until 2024-12-31 --out flagged.csv
+#
+# В CSV попадают отметки вне всех активных зон: id, студент, дата,
+# координаты и расстояние до центра ближайшей зоны. Закрытые месяцы читаются
+# из архива (attendance_archive.py), как в отчётах; у таких строк id нет —
+# в базе их уже нет, колонка attendance_id пустая.
+import argparse
+import csv
+import itertools
+import sys
+import time
+from datetime import date, datetime
+from typing import Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+import config
+from attendance_archive import archived_months, read_month
+from geofence import EARTH_RADIUS_M, Zone, load_zones
+from models import Attendance
+
+DEFAULT_CHUNK = 200_000
+
+
+class NoZones(ValueError):
+    """Нет активных геозон — проверять не с чем."""
+
+
+# -------------------------------------------------
+# ВЕКТОРНАЯ ГЕОМЕТРИЯ
+# -------------------------------------------------
+
+def haversine_m(lat: np.ndarray, lon: np.ndarray, lat0: float, lon0: float) -> np.ndarray:
+    """Расстояния (м) от массива точек до одной точки — та же формула, что в geofence.py."""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lat0)
+    dphi = np.radians(lat0 - lat)
+    dlambda = np.radians(lon0 - lon)
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _in_polygon(zone: Zone, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    inside = np.zeros(lat.shape, dtype=bool)
+    points = zone.points
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for (lat_i, lon_i), (lat_j, lon_j) in zip(points, points[-1:] + points[:-1]):
+            crosses = (lat_i > lat) != (lat_j > lat)
+            cross_lon = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            inside ^= crosses & (lon < cross_lon)
+    return inside
+
+
+def inside_any(zones: List[Zone], lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Маска точек, попавших хотя бы в одну зону (как Zone.contains, но по массиву)."""
+    inside = np.zeros(lat.shape, dtype=bool)
+    for zone in zones:
+        min_lat, min_lon, max_lat, max_lon = zone.bbox
+        # точную проверку делаем только для ещё не попавших точек внутри bbox
+        idx = np.flatnonzero(
+            ~inside & (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        )
+        if not idx.size:
+            continue
+        if zone.kind == "circle":
+            hit = haversine_m(lat[idx], lon[idx], zone.center_lat, zone.center_lon) <= zone.radius_m
+        else:
+            hit = _in_polygon(zone, lat[idx], lon[idx])
+        inside[idx[hit]] = True
+    return inside
+
+
+def _zone_center(zone: Zone):
+    if zone.kind == "circle":
+        return zone.center_lat, zone.center_lon
+    return (
+        sum(p[0] for p in zone.points) / len(zone.points),
+        sum(p[1] for p in zone.points) / len(zone.points),
+    )
+
+
+def nearest_center_m(zones: List[Zone], lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    nearest = np.full(lat.shape, np.inf)
+    for zone in zones:
+        np.minimum(nearest, haversine_m(lat, lon, *_zone_center(zone)), out=nearest)
+    return nearest
+
+
+# -------------------------------------------------
+# ПРОХОД ПО ОТМЕТКАМ
+# -------------------------------------------------
+
+def audit(
+    db,
+    out,
+    zones: Optional[List[Zone]] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    chunk: int = DEFAULT_CHUNK,
+    archive_dir: Optional[str] = config.ATTENDANCE_ARCHIVE_DIR,
+) -> dict:
+    """
+    Проверить отметки с координатами (живые и из архива archive_dir;
+    None — только живые), подозрительные записать в out (csv-файл).
+    Возвращает {"checked": N, "flagged": M, "archived": сколько из N — из архива}.
+    NoZones — нет активных геозон.
+    """
+    zones = load_zones(db) if zones is None else zones
+    if not zones:
+        raise NoZones("нет активных геозон — проверять не с чем")
+
+    # потоком читаем только (id, lat, lon): на миллионах строк время уходит
+    # в основном на чтение, детали дочитываем лишь для подозрительных
+    stmt = (
+        select(Attendance.id, Attendance.lat, Attendance.lon)
+        .where(Attendance.lat.is_not(None), Attendance.lon.is_not(None))
+        .order_by(Attendance.id)
+    )
+    if since:
+        stmt = stmt.where(Attendance.date >= since)
+    if until:
+        stmt = stmt.where(Attendance.date <= until)
+
+    writer = csv.writer(out)
+    writer.writerow(["attendance_id", "student_id", "date", "lat", "lon", "nearest_zone_m"])
+
+    checked = flagged = 0
+    conn = db.connection()
+    result = conn.execution_options(stream_results=True, yield_per=chunk).execute(stmt)
+    for rows in result.partitions():
+        data = np.fromiter(
+            itertools.chain.from_iterable(rows), dtype=np.float64, count=3 * len(rows)
+        ).reshape(-1, 3)
+        lat, lon = data[:, 1], data[:, 2]
+        outside = np.flatnonzero(~inside_any(zones, lat, lon))
+        checked += len(rows)
+        if not outside.size:
+            continue
+        flagged += int(outside.size)
+        _write_flagged(
+            db, writer,
+            ids=data[outside, 0].astype(np.int64).tolist(),
+            distances=nearest_center_m(zones, lat[outside], lon[outside]).tolist(),
+        )
+
+    archived = 0
+    if archive_dir:
+        for rows in _chunks(_archived_rows(archive_dir, since, until), chunk):
+            lat = np.fromiter((r["lat"] for r in rows), dtype=np.float64, count=len(rows))
+            lon = np.fromiter((r["lon"] for r in rows), dtype=np.float64, count=len(rows))
+            outside = np.flatnonzero(~inside_any(zones, lat, lon))
+            archived += len(rows)
+            flagged += int(outside.size)
+            distances = nearest_center_m(zones, lat[outside], lon[outside]).tolist()
+            for i, distance in zip(outside.tolist(), distances):
+                r = rows[i]
+                writer.writerow(["", r["student_id"], r["date"].isoformat(), r["lat"], r["lon"], round(distance)])
+    return {"checked": checked + archived, "flagged": flagged, "archived": archived}
+
+
+def _archived_rows(archive_dir: str, since: Optional[date], until: Optional[date]) -> Iterable[dict]:
+    """Строки архива с координатами за [since, until]; месяцы вне периода не открываются."""
+    for year, month in archived_months(archive_dir):
+        if since and (year, month) < (since.year, since.month):
+            continue
+        if until and (year, month) > (until.year, until.month):
+            continue
+        for row in read_month(archive_dir, year, month):
+            if row["lat"] is None or row["lon"] is None:
+                continue
+            if (since and row["date"] < since) or (until and row["date"] > until):
+                continue
+            yield row
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterable[List[dict]]:
+    rows = iter(rows)
+    while True:
+        part = list(itertools.islice(rows, size))
+        if not part:
+            return
+        yield part
+
+
+def _write_flagged(db, writer, ids: List[int], distances: List[float], batch: int = 500):
+    for start in range(0, len(ids), batch):
+        part = ids[start:start + batch]
+        details = {
+            r.id: r
+            for r in db.execute(
+                select(Attendance.id, Attendance.student_id, Attendance.date, Attendance.lat, Attendance.lon)
+                .where(Attendance.id.in_(part))
+            )
+        }
+        for attendance_id, distance in zip(part, distances[start:start + batch]):
+            r = details[attendance_id]
+            writer.writerow([r.id, r.student_id, r.date.isoformat(), r.lat, r.lon, round(distance)])
+
+
+def main(argv=None):
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Проверка сохранённых отметок по геозонам")
+    parser.add_argument("--since", type=date.fromisoformat)
+    parser.add_argument("--until", type=date.fromisoformat)
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--out", default=f"geo-audit-{datetime.now():%Y%m%d-%H%M%S}.csv")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with open(args.out, "w", newline="", encoding="utf-8") as out:
+            stats = audit(db, out, since=args.since, until=args.until, chunk=args.chunk)
+    except NoZones as exc:
+        sys.exit(str(exc))
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"проверено {stats['checked']} (из архива {stats['archived']}), вне зон {stats['flagged']} "
+        f"за {elapsed:.1f} с -> {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# geofence.py
+# Геозоны для отметок: несколько корпусов, у каждого круги и многоугольники.
+#
+# Раньше была одна точка с радиусом прямо в main.py (и ещё одна копия
+# haversine в services.py). Теперь зоны лежат в БД (campuses / geo_zones),
+# воркер держит их в памяти в виде индекса по сетке: каждая зона записана
+# в ячейки, которые задевает её ограничивающий прямоугольник, и отметка
+# проверяет только зоны своей ячейки.
+#
+# Изменения подхватываются без рестарта: раз в GEOFENCE_RELOAD_S воркер
+# сверяет отпечаток таблиц (количество, последний updated_at) и при
+# расхождении перечитывает зоны; правки через ORM в этом же воркере
+# сбрасывают индекс сразу.
+#
+#   python geofence.py list
+#   python geofence.py check 45.01 78.22
+#   python geofence.py add-circle "Главный корпус" "Двор" 45.01 78.22 400
+#   python geofence.py add-polygon "Корпус Б" "Здание" "45.0,78.1 45.0,78.2 45.1,78.2"
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, func, select
+
+import config
+from models import Campus, GeoZone
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000
+# метров в градусе широты (и долготы на экваторе) — на той же сфере, что haversine
+M_PER_DEG = EARTH_RADIUS_M * math.pi / 180
+# запас bbox круга: на сфере крайняя долгота круга чуть дальше, чем по cos центра
+BBOX_PAD = 1.01
+
+
+def haversine_distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_M * c
+
+
+def _point_in_polygon(lat: float, lon: float, points: Sequence[Tuple[float, float]]) -> bool:
+    # луч вдоль широты; для зон размером с корпус плоское приближение точное
+    inside = False
+    j = len(points) - 1
+    for i in range(len(points)):
+        lat_i, lon_i = points[i]
+        lat_j, lon_j = points[j]
+        if (lat_i > lat) != (lat_j > lat):
+            cross_lon = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if lon < cross_lon:
+                inside = not inside
+        j = i
+    return inside
+
+
+# -------------------------------------------------
+# ЗОНЫ И ИНДЕКС
+# -------------------------------------------------
+
+@dataclass(frozen=True)
+class Zone:
+    id: int
+    campus: str
+    name: str
+    kind: str
+    bbox: Tuple[float, float, float, float]  # min_lat, min_lon, max_lat, max_lon
+    center_lat: Optional[float] = None
+    center_lon: Optional[float] = None
+    radius_m: Optional[float] = None
+    points: Tuple[Tuple[float, float], ...] = ()
+
+    def contains(self, lat: float, lon: float) -> bool:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        if self.kind == "circle":
+            return haversine_distance_m(lat, lon, self.center_lat, self.center_lon) <= self.radius_m
+        return _point_in_polygon(lat, lon, self.points)
+
+
+def circle_zone(id: int, campus: str, name: str, lat: float, lon: float, radius_m: float) -> Zone:
+    reach = radius_m * BBOX_PAD
+    dlat = reach / M_PER_DEG
+    dlon = reach / (M_PER_DEG * max(math.cos(math.radians(lat)), 1e-6))
+    return Zone(
+        id=id, campus=campus, name=name, kind="circle",
+        bbox=(lat - dlat, lon - dlon, lat + dlat, lon + dlon),
+        center_lat=lat, center_lon=lon, radius_m=radius_m,
+    )
+
+
+def polygon_zone(id: int, campus: str, name: str, points: Sequence[Sequence[float]]) -> Zone:
+    points = tuple((float(lat), float(lon)) for lat, lon in points)
+    if len(points) < 3:
+        raise ValueError("у многоугольника меньше трёх вершин")
+    lats = [p[0] for p in points]
+    lons = [p[1] for p in points]
+    return Zone(
+        id=id, campus=campus, name=name, kind="polygon",
+        bbox=(min(lats), min(lons), max(lats), max(lons)),
+        points=points,
+    )
+
+
+def zone_from_row(row: GeoZone, campus: str) -> Zone:
+    if row.kind == "circle":
+        return circle_zone(row.id, campus, row.name, row.center_lat, row.center_lon, row.radius_m)
+    if row.kind == "polygon":
+        return polygon_zone(row.id, campus, row.name, json.loads(row.points or "[]"))
+    raise ValueError(f"неизвестный вид зоны: {row.kind}")
+
+
+class GeofenceIndex:
+    """Неизменяемый индекс: зоны разложены по ячейкам сетки cell_deg x cell_deg."""
+
+    def __init__(self, zones: List[Zone], cell_deg: float):
+        self.zones = zones
+        self.cell_deg = cell_deg
+        cells: Dict[Tuple[int, int], List[Zone]] = defaultdict(list)
+        for zone in zones:
+            min_lat, min_lon, max_lat, max_lon = zone.bbox
+            lat0, lon0 = self._cell(min_lat, min_lon)
+            lat1, lon1 = self._cell(max_lat, max_lon)
+            for i in range(lat0, lat1 + 1):
+                for j in range(lon0, lon1 + 1):
+                    cells[(i, j)].append(zone)
+        self._cells = dict(cells)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def candidates(self, lat: float, lon: float) -> List[Zone]:
+        return self._cells.get(self._cell(lat, lon), [])
+
+    def locate(self, lat: float, lon: float) -> Optional[Zone]:
+        """Первая зона, в которую попала точка, или None."""
+        for zone in self.candidates(lat, lon):
+            if zone.contains(lat, lon):
+                return zone
+        return None
+
+
+# -------------------------------------------------
+# ЗАГРУЗКА ИЗ БД
+# -------------------------------------------------
+
+def load_zones(db) -> List[Zone]:
+    rows = db.execute(
+        select(GeoZone, Campus.name)
+        .join(Campus, GeoZone.campus_id == Campus.id)
+        .where(GeoZone.is_active == True, Campus.is_active == True)
+        .order_by(GeoZone.id)
+    ).all()
+    zones = []
+    for row, campus in rows:
+        try:
+            zones.append(zone_from_row(row, campus))
+        except (TypeError, ValueError) as exc:
+            # одна кривая зона не должна закрыть отметки во всех корпусах
+            logger.warning("geo_zones id=%s пропущена: %s", row.id, exc)
+    return zones
+
+
+def _fingerprint(db) -> tuple:
+    return tuple(db.execute(
+        select(
+            select(func.count(GeoZone.id)).scalar_subquery(),
+            select(func.max(GeoZone.updated_at)).scalar_subquery(),
+            select(func.count(Campus.id)).where(Campus.is_active == True).scalar_subquery(),
+        )
+    ).one())
+
+
+class Geofence:
+    """Индекс зон воркера с перечитыванием при изменениях в БД."""
+
+    def __init__(self, cell_deg: float, reload_s: float):
+        self.cell_deg = cell_deg
+        self.reload_s = reload_s
+        self._index: Optional[GeofenceIndex] = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _fresh(self) -> bool:
+        return self._index is not None and time.monotonic() - self._checked_at < self.reload_s
+
+    def index(self, db) -> GeofenceIndex:
+        if self._fresh():
+            return self._index
+        # Ждать блокировку нельзя: при DB_ASYNC запрос к БД идёт в greenlet
+        # AsyncSession.run_sync и отдаёт управление циклу событий, а вторая
+        # отметка в том же потоке повисла бы на threading.Lock вместе с циклом.
+        # Перечитывает один, остальные пока берут старый индекс.
+        if not self._lock.acquire(blocking=False):
+            if self._index is not None:
+                return self._index
+            return self._reload(db)  # самый первый запуск — читаем каждый сам
+        try:
+            if self._fresh():
+                return self._index
+            return self._reload(db)
+        finally:
+            self._lock.release()
+
+    def _reload(self, db) -> GeofenceIndex:
+        generation = self._generation
+        fingerprint = _fingerprint(db)
+        index = self._index
+        if index is None or fingerprint != self._fingerprint:
+            index = GeofenceIndex(load_zones(db), self.cell_deg)
+        # invalidate() во время чтения — индекс отдаём, но не запоминаем
+        if generation == self._generation:
+            self._index, self._fingerprint = index, fingerprint
+            self._checked_at = time.monotonic()
+        return index
+
+    def locate(self, db, lat: float, lon: float) -> Optional[Zone]:
+        return self.index(db).locate(lat, lon)
+
+    def invalidate(self):
+        # без блокировки по той же причине, что в index()
+        self._generation += 1
+        self._index = None
+
+
+geofence = Geofence(config.GEOFENCE_GRID_DEG, config.GEOFENCE_RELOAD_S)
+
+
+def _invalidate(mapper, connection, target):
+    geofence.invalidate()
+
+
+for _model in (Campus, GeoZone):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _invalidate)
+
+
+def main(argv=None):
+    import argparse
+
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Геозоны корпусов")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="показать активные зоны")
+    p = sub.add_parser("check", help="в какую зону попадает точка")
+    p.add_argument("lat", type=float)
+    p.add_argument("lon", type=float)
+    p = sub.add_parser("add-circle", help="добавить круг")
+    p.add_argument("campus")
+    p.add_argument("name")
+    p.add_argument("lat", type=float)
+    p.add_argument("lon", type=float)
+    p.add_argument("radius_m", type=float)
+    p = sub.add_parser("add-polygon", help='добавить многоугольник: "lat,lon lat,lon ..."')
+    p.add_argument("campus")
+    p.add_argument("name")
+    p.add_argument("points")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "list":
+            for zone in load_zones(db):
+                print(f"{zone.id:>4}  {zone.campus} / {zone.name}  {zone.kind}  bbox={zone.bbox}")
+            return
+
+        if args.command == "check":
+            zone = GeofenceIndex(load_zones(db), config.GEOFENCE_GRID_DEG).locate(args.lat, args.lon)
+            print(f"{zone.campus} / {zone.name}" if zone else "вне всех зон")
+            return
+
+        campus = db.query(Campus).filter(Campus.name == args.campus).first()
+        if campus is None:
+            campus = Campus(name=args.campus)
+            db.add(campus)
+            db.flush()
+
+        if args.command == "add-circle":
+            if args.radius_m <= 0:
+                parser.error("радиус должен быть больше нуля")
+            row = GeoZone(
+                campus_id=campus.id, name=args.name, kind="circle",
+                center_lat=args.lat, center_lon=args.lon, radius_m=args.radius_m,
+            )
+        else:
+            points = [[float(v) for v in pair.split(",")] for pair in args.points.split()]
+            polygon_zone(0, campus.name, args.name, points)  # проверка до записи
+            row = GeoZone(campus_id=campus.id, name=args.name, kind="polygon", points=json.dumps(points))
+        db.add(row)
+        db.commit()
+        print(f"зона {row.id} добавлена в {campus.name}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# group_stats.py
+# Инкрементальные счётчики посещаемости по группам для /admin/dashboard.
+#
+# Раньше дашборд на каждое обновление делал students OUTER JOIN attendance
+# GROUP BY group_name. Теперь в group_daily_stats лежит готовая строка на
+# (день, группа): отметки увеличивают present в той же транзакции, где
+# пишется Attendance, а изменения состава групп через ORM правят total.
+# Считаются только активные студенты — как в списке отсутствующих
+# (absentees.py), чтобы размер группы везде был один.
+# Дашборд читает O(групп) строк.
+#
+# Строки дня заводит первая отметка дня — полным пересчётом в транзакции
+# CheckinWriter, так что счётчики всегда стартуют с правды. Пересчёт
+# вставляется с ON CONFLICT DO NOTHING: если строки успел завести другой
+# процесс, вставка просто ничего не делает, и отметка прибавляется к ним.
+# Дашборд ничего не пишет: пока строк дня нет, он видит тот же пересчёт
+# обычным SELECT. Если что-то меняли мимо ORM (ручной SQL, старые скрипты),
+# расхождение чинит сверка:
+#
+#   python group_stats.py                    — пересчитать сегодня
+#   python group_stats.py --date 2024-09-02  — пересчитать конкретный день
+from collections import Counter, defaultdict
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import case, delete, event, func, inspect, literal, select
+from sqlalchemy.types import Date
+
+from database import dialect_insert
+from models import Attendance, GroupDailyStat, Student
+
+_table = GroupDailyStat.__table__
+
+
+def _group_key(group_name: Optional[str]) -> str:
+    return group_name or ""
+
+
+def _recount_select(day: date):
+    """Тот же агрегат, что раньше считал дашборд, но сразу в форме строк счётчика."""
+    group_key = func.coalesce(Student.group_name, "")
+    return (
+        select(
+            literal(day, Date).label("date"),
+            group_key.label("group_name"),
+            func.count(Student.id).label("total"),
+            func.coalesce(
+                func.sum(case((Attendance.status == 1, 1), else_=0)),
+                0,
+            ).label("present"),
+        )
+        .select_from(Student)
+        .outerjoin(
+            Attendance,
+            (Attendance.student_id == Student.id) & (Attendance.date == day),
+        )
+        .where(Student.is_active == True)
+        .group_by(group_key)
+    )
+
+
+def _insert_recount(conn, day: date):
+    # строки дня могли завести параллельно (другой процесс, сверка) — тогда ничего
+    return conn.execute(
+        dialect_insert(_dialect_name(conn), _table)
+        .from_select(["date", "group_name", "total", "present"], _recount_select(day))
+        .on_conflict_do_nothing(index_elements=[_table.c.date, _table.c.group_name])
+    )
+
+
+def _day_initialized(conn, day: date) -> bool:
+    return conn.execute(
+        select(_table.c.date).where(_table.c.date == day).limit(1)
+    ).first() is not None
+
+
+def _dialect_name(conn) -> str:
+    # Connection (события маппера) или Session (хук CheckinWriter, сверка)
+    dialect = getattr(conn, "dialect", None) or conn.get_bind().dialect
+    return dialect.name
+
+
+def _bump(conn, day: date, group_name: str, total: int = 0, present: int = 0):
+    stmt = dialect_insert(_dialect_name(conn), _table).values(
+        date=day, group_name=group_name, total=total, present=present
+    )
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[_table.c.date, _table.c.group_name],
+            set_={
+                "total": _table.c.total + total,
+                "present": _table.c.present + present,
+            },
+        )
+    )
+
+
+def _attended(conn, student_id: int, day: date) -> int:
+    return int(conn.execute(
+        select(Attendance.id).where(
+            Attendance.student_id == student_id,
+            Attendance.date == day,
+            Attendance.status == 1,
+        )
+    ).first() is not None)
+
+
+# -------------------------------------------------
+# ЧТЕНИЕ И СВЕРКА
+# -------------------------------------------------
+
+def ensure_day(conn, day: date) -> bool:
+    """
+    Завести строки счётчика на день полным пересчётом, если их ещё нет.
+    True — строки созданы сейчас (и уже учитывают все отметки в транзакции).
+    Только в пишущей транзакции (CheckinWriter, сверка).
+    """
+    if _day_initialized(conn, day):
+        return False
+    return _insert_recount(conn, day).rowcount > 0
+
+
+def read_day(db, day: date) -> List[GroupDailyStat]:
+    """
+    Счётчики за день по группам, отсортированные по названию группы.
+    Только чтение: если строк дня ещё нет, тот же пересчёт без записи.
+    """
+    rows = (
+        db.query(GroupDailyStat)
+        .filter(GroupDailyStat.date == day)
+        .order_by(GroupDailyStat.group_name)
+        .all()
+    )
+    if rows:
+        return rows
+    recount = _recount_select(day).order_by("group_name")
+    return [GroupDailyStat(**row._mapping) for row in db.execute(recount)]
+
+
+def reconcile(db, day: date) -> dict:
+    """
+    Полный пересчёт счётчиков за день.
+    Возвращает расхождения {группа: ((total, present) было, (total, present) стало)}.
+    """
+    before = {
+        r.group_name: (r.total, r.present)
+        for r in db.query(GroupDailyStat).filter(GroupDailyStat.date == day)
+    }
+    db.execute(delete(_table).where(_table.c.date == day))
+    _insert_recount(db, day)
+    db.commit()
+
+    after = {
+        r.group_name: (r.total, r.present)
+        for r in db.query(GroupDailyStat).filter(GroupDailyStat.date == day)
+    }
+    return {
+        group: (before.get(group), after.get(group))
+        for group in before.keys() | after.keys()
+        if before.get(group) != after.get(group)
+    }
+
+
+# -------------------------------------------------
+# ОБНОВЛЕНИЕ
+# -------------------------------------------------
+
+def record_checkins(db, rows: list) -> dict:
+    """
+    Хук CheckinWriter: +present для групп только что добавленных отметок.
+    Возвращает приращения {день: Counter(группа -> сколько пришло)}.
+    """
+    ids_by_day = defaultdict(list)
+    for row in rows:
+        if row.get("status", 1) == 1:
+            ids_by_day[row["date"]].append(row["student_id"])
+
+    deltas = {}
+    for day, ids in ids_by_day.items():
+        groups = Counter(
+            _group_key(g)
+            for g in db.scalars(
+                select(Student.group_name).where(Student.id.in_(ids), Student.is_active == True)
+            )
+        )
+        deltas[day] = groups
+        # свежий пересчёт уже видит эти отметки — прибавлять не нужно
+        if ensure_day(db, day):
+            continue
+        for group_name, n in groups.items():
+            _bump(db, day, group_name, present=n)
+    return deltas
+
+
+def students_added(conn, groups: Counter):
+    """Студенты добавлены мимо ORM (массовый импорт): +total группам сегодня."""
+    day = date.today()
+    if not _day_initialized(conn, day):
+        return
+    for group_name, n in groups.items():
+        _bump(conn, day, _group_key(group_name), total=n)
+
+
+# Изменения состава групп через ORM. Трогаем только сегодняшний день
+# и только если он уже заведён — иначе его посчитает ensure_day.
+# Неактивные студенты в счётчиках не участвуют.
+
+# active_history: прежнее значение подгружается при присваивании, даже если
+# атрибут истёк после коммита, — иначе в history.deleted пусто
+@event.listens_for(Student.group_name, "set", active_history=True)
+@event.listens_for(Student.is_active, "set", active_history=True)
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+def _before(history, current):
+    """Значение до изменения (history атрибута из inspect)."""
+    if not history.has_changes():
+        return current
+    return history.deleted[0] if history.deleted else None
+
+
+@event.listens_for(Student, "after_insert")
+def _student_added(mapper, connection, target: Student):
+    day = date.today()
+    if target.is_active and _day_initialized(connection, day):
+        _bump(connection, day, _group_key(target.group_name), total=1)
+
+
+@event.listens_for(Student, "after_delete")
+def _student_removed(mapper, connection, target: Student):
+    day = date.today()
+    if target.is_active and _day_initialized(connection, day):
+        _bump(
+            connection, day, _group_key(target.group_name),
+            total=-1, present=-_attended(connection, target.id, day),
+        )
+
+
+@event.listens_for(Student, "after_update")
+def _student_moved(mapper, connection, target: Student):
+    attrs = inspect(target).attrs
+    group_history, active_history = attrs.group_name.history, attrs.is_active.history
+    if not (group_history.has_changes() or active_history.has_changes()):
+        return
+    day = date.today()
+    if not _day_initialized(connection, day):
+        return
+
+    old = (_group_key(_before(group_history, target.group_name)), bool(_before(active_history, target.is_active)))
+    new = (_group_key(target.group_name), bool(target.is_active))
+    if old == new or not (old[1] or new[1]):
+        return
+    present = _attended(connection, target.id, day)
+    if old[1]:
+        _bump(connection, day, old[0], total=-1, present=-present)
+    if new[1]:
+        _bump(connection, day, new[0], total=1, present=present)
+
+
+def main(argv=None):
+    import argparse
+
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Сверка счётчиков дашборда")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        drift = reconcile(db, args.date)
+    finally:
+        db.close()
+
+    if not drift:
+        print(f"{args.date}: расхождений нет")
+        return
+    print(f"{args.date}: исправлено групп — {len(drift)}")
+    for group, (was, now) in sorted(drift.items()):
+        print(f"  {group or '—'}: было {was}, стало {now}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,121 @@
 # main.py
-from sqlalchemy import func
 from models import Student, Attendance, Admin
+import asyncio
+import hmac
+from contextlib import asynccontextmanager
 from datetime import date
-from math import radians, sin, cos, sqrt, atan2
-import random
+import os
+import shutil
+import tempfile
 import uuid
-from typing import Optional
+from typing import List, Optional, Tuple
+from urllib.parse import quote
 
-from fastapi import FastAPI, Request, Depends, Form, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import APIRouter, FastAPI, Request, Depends, File, Form, UploadFile, status
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from fastapi.templating import Jinja2Templates
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
-
-from database import Base, engine, get_db
-from models import Student, Attendance, Admin
+from sqlalchemy import or_
+
+import config
+from absentees import BadCursor, absent_page, group_count
+from admin_sessions import AdminSession, admin_sessions
+from attendance_archive import is_archived
+from bootstrap import bootstrap
+from checkin_writer import CheckinWriter
+from database import engine, get_db, SessionLocal, async_engine, get_async_db
+from dashboard_stream import event_stream, publish_checkins
+from device_cache import StudentSnapshot, device_cache
+from geofence import geofence
+from metrics import MetricsMiddleware, checkin, instrument_engine, metrics
+import motivation
+from page_cache import PageCache
+from passwords import PasswordBusy, hash_password, password_pool
+from rate_limit import RateLimitMiddleware, device_limiter, ip_limiter, shedder
+from static_assets import StaticAssets
+from group_stats import read_day, record_checkins
+from reports import attendance_matrix_csv
+from roster_import import RosterImports
+from schemas import CheckinRequest, CheckinResponse
+from student_stats import load_states, progress
+from student_stats import record_checkins as record_student_checkins
+from models import Student, Attendance, Admin, normalize_login, pack_ip
 
 # -------------------------------------------------
 # ИНИЦИАЛИЗАЦИЯ ПРИЛОЖЕНИЯ
 # -------------------------------------------------
 
-app = FastAPI()
-
-Base.metadata.create_all(bind=engine)
-
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# импорт main ничего не пишет в БД: таблицы, миграции и учётки по умолчанию
+# готовит bootstrap — один раз при старте (см. lifespan) или шагом деплоя
+# `python bootstrap.py` с BOOTSTRAP_ON_STARTUP=0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.BOOTSTRAP_ON_STARTUP:
+        await asyncio.to_thread(bootstrap, engine)
+    yield
+    checkin_writer.stop()
+    roster_imports.shutdown()
+    password_pool.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+# время ответа и SQL по роутам (см. metrics.py); внутри лимитов,
+# чтобы отказы 429 / 503 не размывали гистограммы
+app.add_middleware(MetricsMiddleware, router=app.router)
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+# 429 / 503 до роутинга и до БД (см. rate_limit.py)
+app.add_middleware(
+    RateLimitMiddleware, device_limiter=device_limiter, ip_limiter=ip_limiter, shedder=shedder
+)
+
+# /static: собранные файлы с хэшем — из STATIC_BUILD_DIR, сжатые и на год;
+# без сборки всё как раньше (см. static_assets.py)
+assets = StaticAssets("static", config.STATIC_BUILD_DIR)
+app.mount("/static", assets.files(), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = assets.url
+# страницы, зависящие только от языка, — из кэша с ETag (см. page_cache.py)
+pages = PageCache(templates)
 
+def on_checkins_prepare(db: Session, rows: list) -> dict:
+    """
+    В транзакции отметок, до вставки: фраза по сводке студента (motivation.py).
+    Те же сводки потом обновляет on_checkins_inserted — второй раз их не читаем.
+    """
+    states = load_states(db, (r["student_id"] for r in rows))
+    for row in rows:
+        row["motivation_id"], row["motivation_arg"] = motivation.choose(
+            progress(states.get(row["student_id"]), row["date"])
+        )
+    return states
 
-# -------------------------------------------------
-# ГЕОЗОНА КОЛЛЕДЖА
-# -------------------------------------------------
 
-COLLEGE_LAT = 45.01  # потом поставишь свои
-COLLEGE_LON = 78.22
-ALLOWED_RADIUS_METERS = 400  # метров
+def on_checkins_inserted(db: Session, rows: list, states: dict) -> dict:
+    """В транзакции отметок: сводки студентов и счётчики групп (их приращения — дашборду)."""
+    record_student_checkins(db, rows, states)
+    return record_checkins(db, rows)
 
 
-def haversine_distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    R = 6371000
-    phi1 = radians(lat1)
-    phi2 = radians(lat2)
-    dphi = radians(lat2 - lat1)
-    dlambda = radians(lon2 - lon1)
+# все отметки идут через групповой коммит (см. checkin_writer.py)
+checkin_writer = CheckinWriter(
+    SessionLocal,
+    window_ms=config.CHECKIN_BATCH_WINDOW_MS,
+    max_batch=config.CHECKIN_BATCH_MAX_SIZE,
+    on_inserted=on_checkins_inserted,
+    on_committed=publish_checkins,
+    prepare=on_checkins_prepare,
+)
 
-    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
+# загрузка списка студентов из админки — в фоне (см. roster_import.py)
+roster_imports = RosterImports()
 
 
 # -------------------------------------------------
@@ -87,53 +154,82 @@ def is_mobile_request(request: Request) -> bool:
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # -------------------------------------------------
 
-def ensure_admin(db: Session):
-    """Создаём дефолтного админа, если нет."""
-    admin = db.query(Admin).filter(Admin.username == "admin").first()
-    if not admin:
-        admin = Admin(username="admin", password="admin123")
-        db.add(admin)
-        db.commit()
-
-
 def generate_device_uid() -> str:
     return str(uuid.uuid4())
 
 
-def generate_motivation_text(student: Student, lang: str) -> str:
-    if lang == "kk":
-        phrases = [
-            f"{student.full_name}, тамаша бастама! Бүгінгі күніңіз сәтті өтсін!",
-            "Жарайсың! Әр күн — жаңа мүмкіндік.",
-            "Келгенің өте жақсы! Білімге жасаған қадамың зая кетпейді.",
-            "Өзіңе сен! Қазірден бастап болашағыңды құрып жатырсың.",
-        ]
-    else:
-        phrases = [
-            f"{student.full_name}, отличный старт! Пусть день пройдёт продуктивно!",
-            "Молодец! Каждый день — новый шанс.",
-            "Здорово, что ты пришёл! Шаг к знаниям никогда не бывает лишним.",
-            "Верь в себя — именно сейчас ты строишь своё будущее.",
-        ]
-    return random.choice(phrases)
-
-
-def get_student_by_device(request: Request, db: Session) -> Optional[Student]:
+def get_student_by_device(request: Request, db: Session) -> Optional[StudentSnapshot]:
     device_uid = request.cookies.get("device_uid")
     if not device_uid:
         return None
-    return (
+
+    snapshot = device_cache.get(device_uid)
+    if snapshot is not None:
+        return snapshot
+
+    student = (
         db.query(Student)
         .filter(Student.device_uid == device_uid, Student.is_active == True)
         .first()
     )
+    if not student:
+        return None
 
+    snapshot = StudentSnapshot.from_student(student)
+    device_cache.put(snapshot)
+    return snapshot
 
-def get_current_admin(request: Request, db: Session) -> Optional[Admin]:
-    token = request.cookies.get("admin_session")
-    if not token:
-        return None
-    return db.query(Admin).filter(Admin.session_token == token).first()
+
+def login_candidates(db: Session, login_value: str) -> Tuple[str, List[Student]]:
+    """
+    Кандидаты для /login одним индексным запросом по login_norm / full_name_norm.
+    Пароли сверяет match_login по результатам password_pool.check.
+    """
+    key = normalize_login(login_value)
+    if not key:
+        return key, []
+
+    candidates = (
+        db.query(Student)
+        .filter(
+            Student.is_active == True,
+            or_(Student.login_norm == key, Student.full_name_norm == key),
+        )
+        .order_by(Student.id)
+        .all()
+    )
+    return key, candidates
+
+
+def match_login(key: str, candidates: List[Student], checked: list):
+    """
+    login не уникален (одинаковые логины в разных группах), поэтому правило такое:
+    1) среди активных студентов с таким логином берём тех, у кого совпал пароль;
+    2) если по логину никто не подошёл — то же самое по ФИО;
+    3) ровно один кандидат — вход, больше одного — неоднозначно, ноль — ошибка.
+    checked — (совпал, новый хэш) по кандидатам в том же порядке; старый открытый
+    пароль у совпавших сразу заменяется хэшем (коммит — за вызывающим).
+    Возвращает (student или None, ambiguous).
+    """
+    passed = []
+    for s, (ok, new_hash) in zip(candidates, checked):
+        if ok:
+            passed.append(s)
+            if new_hash:
+                s.password = new_hash
+
+    for field in ("login_norm", "full_name_norm"):
+        matched = [s for s in passed if getattr(s, field) == key]
+        if len(matched) == 1:
+            return matched[0], False
+        if len(matched) > 1:
+            return None, True
+    return None, False
+
+
+def get_current_admin(request: Request, db: Session) -> Optional[AdminSession]:
+    """Сессия админа по подписанной cookie; БД — только за списком отзыва."""
+    return admin_sessions.verify(request.cookies.get("admin_session"), db)
 
 
 # -------------------------------------------------
@@ -143,23 +239,16 @@ def get_current_admin(request: Request, db: Session) -> Optional[Admin]:
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request, db: Session = Depends(get_db)):
     lang = get_lang(request)
-    ensure_admin(db)
 
     # студенты – только с телефона
     if not is_mobile_request(request):
-        return templates.TemplateResponse(
-            "only_mobile.html",
-            {"request": request, "lang": lang},
-        )
+        return pages.response(request, "only_mobile.html", lang)
 
     student = get_student_by_device(request, db)
     if student:
         return RedirectResponse(url="/student", status_code=status.HTTP_302_FOUND)
 
-    return templates.TemplateResponse(
-        "login.html",
-        {"request": request, "error": None, "lang": lang},
-    )
+    return pages.response(request, "login.html", lang)
 @app.post("/login", response_class=HTMLResponse)
 def login(
     request: Request,
@@ -174,6 +263,24 @@ def login(
        — работает ВСЕГДА, независимо от того, что в базе.
     2) Остальные логины — как обычно (login или ФИО + пароль).
     """
+    prepared = prepare_login(request, login, password, db)
+    if not isinstance(prepared, tuple):
+        return prepared
+    lang, key, candidates = prepared
+
+    # bcrypt считается в пуле процессов, поток запроса только ждёт
+    try:
+        checked = password_pool.check(password.strip(), [s.password for s in candidates])
+    except PasswordBusy:
+        return login_busy(request, lang)
+    return finish_login(request, lang, key, candidates, checked, db)
+
+
+def prepare_login(request: Request, login: str, password: str, db: Session):
+    """
+    Всё, что до проверки пароля: демо-вход и кандидаты из БД.
+    Возвращает либо готовый ответ, либо (lang, key, candidates).
+    """
     lang = get_lang(request)
 
     login_raw = login.strip()
@@ -193,7 +300,7 @@ def login(
             student = Student(
                 full_name="Тестовый Студент",
                 login="demo",
-                password="1234",
+                password=hash_password("1234"),  # один раз за жизнь базы
                 group_name="SW-999",
                 is_active=True,
             )
@@ -205,8 +312,10 @@ def login(
         cookie_device_uid = request.cookies.get("device_uid")
         if not cookie_device_uid:
             cookie_device_uid = generate_device_uid()
+        old_device_uid = student.device_uid
         student.device_uid = cookie_device_uid
         db.commit()
+        device_cache.invalidate(old_device_uid, cookie_device_uid)
 
         # редирект на /student
         response = RedirectResponse(url="/student", status_code=status.HTTP_302_FOUND)
@@ -220,32 +329,52 @@ def login(
         return response
 
     # ---------- 1. Обычный вход (для реальных студентов) ----------
-    login_value = login_raw.lower()
-    password_value = password_raw
+    key, candidates = login_candidates(db, login_raw)
+    return lang, key, candidates
 
-    # сначала ищем по login
-    student = (
-        db.query(Student)
-        .filter(
-            Student.is_active == True,
-            func.lower(Student.login) == login_value,
-        )
-        .first()
+
+def login_busy(request: Request, lang: str):
+    """Очередь проверок паролей полна или проверка не уложилась в таймаут."""
+    error_msg = (
+        "Сервер занят, попробуйте войти через минуту."
+        if lang == "ru"
+        else "Сервер бос емес, бір минуттан кейін кіріп көріңіз."
+    )
+    return templates.TemplateResponse(
+        "login.html",
+        {"request": request, "error": error_msg, "lang": lang},
+        status_code=503,
     )
 
-    # если не нашли — ищем по full_name (ФИО)
-    if not student:
-        student = (
-            db.query(Student)
-            .filter(
-                Student.is_active == True,
-                func.lower(Student.full_name) == login_value,
-            )
-            .first()
+
+def finish_login(
+    request: Request,
+    lang: str,
+    key: str,
+    candidates: List[Student],
+    checked: list,
+    db: Session,
+):
+    """Всё, что после проверки пароля: выбор студента и привязка устройства."""
+    student, ambiguous = match_login(key, candidates, checked)
+    if db.dirty:
+        # пароль был открытым текстом — сохраняем хэш сразу, при любом исходе
+        db.commit()
+
+    if ambiguous:
+        error_msg = (
+            "Под этим логином несколько студентов. Войдите по ФИО или обратитесь к куратору."
+            if lang == "ru"
+            else "Бұл логинмен бірнеше студент тіркелген. ТАӘ арқылы кіріңіз немесе топ жетекшісіне жүгініңіз."
+        )
+        return templates.TemplateResponse(
+            "login.html",
+            {"request": request, "error": error_msg, "lang": lang},
+            status_code=400,
         )
 
     # если не нашли или пароль не совпал — ошибка
-    if not student or (student.password or "").strip() != password_value:
+    if not student:
         error_msg = (
             "Неверный логин или пароль"
             if lang == "ru"
@@ -265,6 +394,7 @@ def login(
             cookie_device_uid = generate_device_uid()
         student.device_uid = cookie_device_uid
         db.commit()
+        device_cache.invalidate(cookie_device_uid)
     else:
         if not cookie_device_uid or cookie_device_uid != student.device_uid:
             error_msg = (
@@ -293,10 +423,7 @@ def student_home(request: Request, db: Session = Depends(get_db)):
     lang = get_lang(request)
 
     if not is_mobile_request(request):
-        return templates.TemplateResponse(
-            "only_mobile.html",
-            {"request": request, "lang": lang},
-        )
+        return pages.response(request, "only_mobile.html", lang)
 
     student = get_student_by_device(request, db)
     if not student:
@@ -316,111 +443,244 @@ def student_home(request: Request, db: Session = Depends(get_db)):
             "student": student,
             "today": today,
             "already_marked": attendance_today is not None,
-            "motivation": attendance_today.motivation_text if attendance_today else None,
+            "motivation": motivation.render(
+                attendance_today.motivation_id,
+                attendance_today.motivation_lang,
+                attendance_today.motivation_arg,
+                student.full_name,
+            ) if attendance_today else None,
             "lang": lang,
             "error": None,
         },
     )
 
 
-@app.post("/student/mark", response_class=HTMLResponse)
-def mark_attendance(
+# тексты исходов отметки по языкам; исходы те же, что в metrics.checkin
+CHECKIN_MESSAGES = {
+    "marked": {
+        "ru": "Сегодня вы уже отметились",
+        "kk": "Бүгін қатысу белгіленді",
+    },
+    "not_mobile": {
+        "ru": "Отметиться можно только с телефона.",
+        "kk": "Қатысуды тек телефоннан белгілеуге болады.",
+    },
+    "unknown_device": {
+        "ru": "Устройство не привязано. Войдите заново.",
+        "kk": "Құрылғы тіркелмеген. Қайта кіріңіз.",
+    },
+    "no_geolocation": {
+        "ru": "Не удалось получить геолокацию. Включите доступ к местоположению и попробуйте снова.",
+        "kk": "Геолокация алынбады. Орналасқан жерге қолжеткізуді қосып, қайта көріңіз.",
+    },
+    "out_of_fence": {
+        "ru": "Вы находитесь вне территории колледжа. Отметиться можно только на территории учебного корпуса.",
+        "kk": "Сіз колледж аумағынан тыссыз. Қатысуды тек оқу корпусы аумағында белгілеуге болады.",
+    },
+    "overloaded": {
+        "ru": "Сервер перегружен, отметка не подтверждена. Попробуйте ещё раз через минуту.",
+        "kk": "Сервер шамадан тыс жүктелген, белгі расталмады. Бір минуттан кейін қайталап көріңіз.",
+    },
+}
+
+# код ответа /api/checkin по исходу
+CHECKIN_HTTP_STATUS = {
+    "not_mobile": 403,
+    "unknown_device": 401,
+    "no_geolocation": 400,
+    "out_of_fence": 400,
+    "overloaded": 503,
+}
+
+
+def marked_today(db: Session, student_id: int, day: date):
+    """(motivation_id, lang, arg) отметки за день или None, если её нет."""
+    return (
+        db.query(Attendance.motivation_id, Attendance.motivation_lang, Attendance.motivation_arg)
+        .filter(Attendance.student_id == student_id, Attendance.date == day)
+        .first()
+    )
+
+
+def check_checkin(
     request: Request,
-    lat: Optional[float] = Form(None),
-    lon: Optional[float] = Form(None),
-    db: Session = Depends(get_db),
+    lat: Optional[float],
+    lon: Optional[float],
+    db: Session,
 ):
+    """
+    Все проверки отметки до записи в БД — общие для формы и /api/checkin.
+    Возвращает (отказ, student, lang, values): отказ None — values можно
+    отдавать CheckinWriter, иначе это исход из CHECKIN_MESSAGES. Для
+    "duplicate" вместо values — текст фразы уже сохранённой отметки.
+    """
     lang = get_lang(request)
 
     if not is_mobile_request(request):
-        return templates.TemplateResponse(
-            "only_mobile.html",
-            {"request": request, "lang": lang},
-        )
+        checkin("not_mobile")
+        return "not_mobile", None, lang, None
 
     student = get_student_by_device(request, db)
     if not student:
-        return RedirectResponse(url="/", status_code=status.HTTP_302_FOUND)
+        checkin("unknown_device")
+        return "unknown_device", None, lang, None
 
+    # уже отмечался сегодня — «отмечено» раньше проверок геолокации:
+    # открыл страницу ещё раз вне колледжа — это не ошибка
     today = date.today()
-    attendance_today = (
-        db.query(Attendance)
-        .filter(Attendance.student_id == student.id, Attendance.date == today)
-        .first()
+    phrase = marked_today(db, student.id, today)
+    if phrase is not None:
+        checkin("duplicate")
+        return "duplicate", student, lang, motivation.render(*phrase, student.full_name)
+
+    if lat is None or lon is None:
+        checkin("no_geolocation")
+        return "no_geolocation", student, lang, None
+
+    # корпуса и их зоны — в БД, см. geofence.py
+    zone = geofence.locate(db, lat, lon)
+
+    if zone is None:
+        checkin("out_of_fence")
+        return "out_of_fence", student, lang, None
+
+    # отметка могла появиться после проверки выше (двойное нажатие):
+    # INSERT ... ON CONFLICT DO NOTHING просто ничего не запишет.
+    # Фраза хранится номером шаблона, текст собирается при показе (motivation.py);
+    # номер и число допишет CheckinWriter по сводке студента (on_checkins_prepare)
+    values = {
+        "student_id": student.id,
+        "date": today,
+        "status": 1,
+        "ip": pack_ip(request.client.host) if request.client else None,
+        "device_uid": student.device_uid,  # CheckinWriter заменит на devices.id
+        "motivation_lang": lang,
+        "lat": lat,
+        "lon": lon,
+    }
+    return None, student, lang, values
+
+
+def student_home_error(
+    request: Request, student: StudentSnapshot, lang: str, refused: str, status_code: int
+):
+    return templates.TemplateResponse(
+        "student_home.html",
+        {
+            "request": request,
+            "student": student,
+            "today": date.today(),
+            "already_marked": False,
+            "motivation": None,
+            "lang": lang,
+            "error": CHECKIN_MESSAGES[refused][lang],
+        },
+        status_code=status_code,
     )
 
-    if attendance_today:
+
+def prepare_checkin(
+    request: Request,
+    lat: Optional[float],
+    lon: Optional[float],
+    db: Session,
+):
+    """
+    check_checkin для формы: либо готовый ответ (редирект / страница
+    с ошибкой), либо (student, lang, values) для CheckinWriter.
+    """
+    refused, student, lang, values = check_checkin(request, lat, lon, db)
+    if refused == "not_mobile":
+        return pages.response(request, "only_mobile.html", lang)
+    if refused == "unknown_device":
+        return RedirectResponse(url="/", status_code=status.HTTP_302_FOUND)
+    if refused == "duplicate":
         return RedirectResponse(url="/student", status_code=status.HTTP_302_FOUND)
+    if refused:
+        return student_home_error(request, student, lang, refused, 400)
+    return student, lang, values
 
-    if lat is None or lon is None:
-        error_msg = (
-            "Не удалось получить геолокацию. Включите доступ к местоположению и попробуйте снова."
-            if lang == "ru"
-            else "Геолокация алынбады. Орналасқан жерге қолжеткізуді қосып, қайта көріңіз."
-        )
-        return templates.TemplateResponse(
-            "student_home.html",
-            {
-                "request": request,
-                "student": student,
-                "today": today,
-                "already_marked": False,
-                "motivation": None,
-                "lang": lang,
-                "error": error_msg,
-            },
-            status_code=400,
-        )
 
-    distance = haversine_distance_m(lat, lon, COLLEGE_LAT, COLLEGE_LON)
+def checkin_overloaded(request: Request, student: StudentSnapshot, lang: str):
+    """Коммит не подтвердился за CHECKIN_ACK_TIMEOUT_S."""
+    checkin("overloaded")
+    return student_home_error(request, student, lang, "overloaded", 503)
 
-    if distance > ALLOWED_RADIUS_METERS:
-        error_msg = (
-            "Вы находитесь вне территории колледжа. Отметиться можно только на территории учебного корпуса."
-            if lang == "ru"
-            else "Сіз колледж аумағынан тыссыз. Қатысуды тек оқу корпусы аумағында белгілеуге болады."
-        )
-        return templates.TemplateResponse(
-            "student_home.html",
-            {
-                "request": request,
-                "student": student,
-                "today": today,
-                "already_marked": False,
-                "motivation": None,
-                "lang": lang,
-                "error": error_msg,
-            },
-            status_code=400,
-        )
 
-    motivation = generate_motivation_text(student, lang)
-    record = Attendance(
-        student_id=student.id,
-        date=today,
-        status=1,
-        ip_address=request.client.host,
-        device_uid=student.device_uid,
-        motivation_text=motivation,
-    )
-    db.add(record)
-    db.commit()
+@app.post("/student/mark", response_class=HTMLResponse)
+def mark_attendance(
+    request: Request,
+    lat: Optional[float] = Form(None),
+    lon: Optional[float] = Form(None),
+    db: Session = Depends(get_db),
+):
+    prepared = prepare_checkin(request, lat, lon, db)
+    if not isinstance(prepared, tuple):
+        return prepared
+    student, lang, values = prepared
+
+    try:
+        inserted = checkin_writer.write(values, timeout=config.CHECKIN_ACK_TIMEOUT_S)
+    except TimeoutError:
+        return checkin_overloaded(request, student, lang)
+    checkin("accepted" if inserted else "duplicate")
 
     return RedirectResponse(url="/student", status_code=status.HTTP_302_FOUND)
 
 
+# -------------------------------------------------
+# JSON-ОТМЕТКА (/api/checkin)
+# -------------------------------------------------
+# Та же отметка за один запрос: вместо POST -> 302 -> GET /student
+# (повторная проверка устройства, запрос отметки и вся страница заново)
+# student.js получает исход и фразу и обновляет страницу на месте.
+# Форма /student/mark остаётся для браузеров без fetch.
+
+def checkin_json(result: str, lang: str, motivation_text: Optional[str] = None) -> JSONResponse:
+    ok = result in ("accepted", "duplicate")
+    body = CheckinResponse(
+        ok=ok,
+        status=result,
+        message=CHECKIN_MESSAGES["marked" if ok else result][lang],
+        motivation=motivation_text,
+    )
+    return JSONResponse(body.model_dump(), status_code=CHECKIN_HTTP_STATUS.get(result, 200))
+
+
+def finish_api_checkin(student: StudentSnapshot, lang: str, values: dict, inserted: bool, db: Session):
+    checkin("accepted" if inserted else "duplicate")
+    if inserted:
+        phrase = (values["motivation_id"], values["motivation_lang"], values["motivation_arg"])
+    else:
+        # отметка уже была — показываем её фразу, как /student
+        phrase = marked_today(db, student.id, values["date"]) or (None, None, None)
+    return checkin_json(
+        "accepted" if inserted else "duplicate", lang, motivation.render(*phrase, student.full_name)
+    )
+
+
+@app.post("/api/checkin", response_model=CheckinResponse)
+def api_checkin(request: Request, body: CheckinRequest, db: Session = Depends(get_db)):
+    refused, student, lang, values = check_checkin(request, body.lat, body.lon, db)
+    if refused:
+        return checkin_json(refused, lang, values)
+
+    try:
+        inserted = checkin_writer.write(values, timeout=config.CHECKIN_ACK_TIMEOUT_S)
+    except TimeoutError:
+        checkin("overloaded")
+        return checkin_json("overloaded", lang)
+    return finish_api_checkin(student, lang, values, inserted, db)
+
+
 # -------------------------------------------------
 # РОУТЫ ДЛЯ АДМИНИСТРАТОРА
 # -------------------------------------------------
 
 @app.get("/admin/login", response_class=HTMLResponse)
-def admin_login_form(request: Request, db: Session = Depends(get_db)):
+def admin_login_form(request: Request):
     lang = get_lang(request)
-    ensure_admin(db)
-    return templates.TemplateResponse(
-        "admin_login.html",
-        {"request": request, "error": None, "lang": lang},
-    )
+    return pages.response(request, "admin_login.html", lang)
 
 
 @app.post("/admin/login", response_class=HTMLResponse)
@@ -433,7 +693,21 @@ def admin_login(
     lang = get_lang(request)
     admin = db.query(Admin).filter(Admin.username == username).first()
 
-    if not admin or admin.password != password:
+    ok = False
+    if admin:
+        try:
+            [(ok, new_hash)] = password_pool.check(password, [admin.password])
+        except PasswordBusy:
+            return templates.TemplateResponse(
+                "admin_login.html",
+                {"request": request, "error": "Сервер занят, попробуйте через минуту", "lang": lang},
+                status_code=503,
+            )
+        if ok and new_hash:
+            admin.password = new_hash
+            db.commit()
+
+    if not ok:
         error_msg = "Неверный логин или пароль"
         return templates.TemplateResponse(
             "admin_login.html",
@@ -441,9 +715,8 @@ def admin_login(
             status_code=400,
         )
 
-    token = str(uuid.uuid4())
-    admin.session_token = token
-    db.commit()
+    # у каждого входа своя сессия — другие устройства админа не выкидывает
+    token = admin_sessions.issue(admin)
 
     resp = RedirectResponse("/admin/dashboard", status_code=302)
     resp.set_cookie(
@@ -451,7 +724,7 @@ def admin_login(
         token,
         httponly=True,
         samesite="lax",
-        max_age=60 * 60 * 8,
+        max_age=config.ADMIN_SESSION_TTL_S,
     )
     return resp
 
@@ -460,8 +733,7 @@ def admin_login(
 def admin_logout(request: Request, db: Session = Depends(get_db)):
     admin = get_current_admin(request, db)
     if admin:
-        admin.session_token = None
-        db.commit()
+        admin_sessions.revoke(admin, db)
     resp = RedirectResponse("/admin/login", status_code=302)
     resp.delete_cookie("admin_session")
     return resp
@@ -476,25 +748,8 @@ def admin_dashboard(request: Request, db: Session = Depends(get_db)):
 
     today = date.today()
 
-    group_stats = (
-        db.query(
-            Student.group_name.label("group_name"),
-            func.count(Student.id).label("total"),
-            func.coalesce(
-                func.sum(
-                    case((Attendance.status == 1, 1), else_=0)
-                ),
-                0,
-            ).label("present"),
-        )
-        .outerjoin(
-            Attendance,
-            (Attendance.student_id == Student.id) & (Attendance.date == today),
-        )
-        .group_by(Student.group_name)
-        .order_by(Student.group_name)
-        .all()
-    )
+    # готовые счётчики из group_daily_stats (см. group_stats.py)
+    group_stats = read_day(db, today)
 
     total_students = sum(g.total for g in group_stats)
     total_present = sum(g.present for g in group_stats)
@@ -512,4 +767,341 @@ def admin_dashboard(request: Request, db: Session = Depends(get_db)):
     )
 
 
+@app.get("/admin/dashboard/stream")
+def admin_dashboard_stream(request: Request, db: Session = Depends(get_db)):
+    """SSE: приращения по группам по мере коммита отметок (см. dashboard_stream.py)."""
+    admin = get_current_admin(request, db)
+    if not admin:
+        return RedirectResponse("/admin/login", status_code=302)
+
+    # соединение с БД стриму больше не нужно — не держим его часами
+    db.close()
+
+    return StreamingResponse(
+        event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def load_absent_page(
+    group: str, day: Optional[date], cursor: Optional[str], limit: Optional[int], db: Session
+):
+    """Общее для HTML и JSON: либо ответ 400, либо (день, страница, счётчики группы)."""
+    today = date.today()
+    day = day or today
+    if day > today:
+        return PlainTextResponse("этот день ещё не наступил", status_code=400)
+    if is_archived(config.ATTENDANCE_ARCHIVE_DIR, day):
+        return PlainTextResponse(
+            f"{day:%Y-%m} уже в архиве — смотрите отчёт посещаемости (CSV)", status_code=400
+        )
+    page_size = min(max(limit or config.ABSENT_PAGE_SIZE, 1), config.ABSENT_MAX_PAGE_SIZE)
+    try:
+        page = absent_page(db, group, day, cursor, page_size)
+    except BadCursor:
+        return PlainTextResponse("испорченный cursor", status_code=400)
+    # счётчики стоят O(группа) — считаем только для первой страницы
+    counts = group_count(db, group, day) if cursor is None else None
+    return day, page, counts
+
+
+@app.get("/admin/groups/{group}/absent", response_class=HTMLResponse)
+def admin_group_absent(
+    request: Request,
+    group: str,
+    day: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Кто из группы не отметился за день, постранично по ключу (см. absentees.py)."""
+    lang = get_lang(request)
+    admin = get_current_admin(request, db)
+    if not admin:
+        return RedirectResponse("/admin/login", status_code=302)
+
+    prepared = load_absent_page(group, day, cursor, limit, db)
+    if not isinstance(prepared, tuple):
+        return prepared
+    day, page, counts = prepared
+
+    return templates.TemplateResponse(
+        "admin_absent.html",
+        {
+            "request": request,
+            "lang": lang,
+            "group": group,
+            "day": day,
+            "counts": counts,
+            "page": page,
+            "limit": limit,
+            "first_page": cursor is None,
+        },
+    )
+
+
+@app.get("/admin/groups/{group}/absent.json")
+def admin_group_absent_json(
+    request: Request,
+    group: str,
+    day: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    admin = get_current_admin(request, db)
+    if not admin:
+        return PlainTextResponse("forbidden", status_code=403)
+
+    prepared = load_absent_page(group, day, cursor, limit, db)
+    if not isinstance(prepared, tuple):
+        return prepared
+    day, page, counts = prepared
+
+    return JSONResponse({
+        "group": group,
+        "date": day.isoformat(),
+        # null на страницах с cursor — счётчики есть в ответе первой
+        "total": counts.total if counts else None,
+        "present": counts.present if counts else None,
+        "students": [
+            {
+                "id": s.id,
+                "full_name": s.full_name,
+                "login": s.login,
+                "last_seen": s.last_seen.isoformat() if s.last_seen else None,
+            }
+            for s in page.students
+        ],
+        "next_cursor": page.next_cursor,
+    })
+
+
+@app.get("/admin/reports/attendance.csv")
+def admin_attendance_report(
+    request: Request,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    group: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Матрица "студент x день" за период, потоком в CSV (см. reports.py)."""
+    admin = get_current_admin(request, db)
+    if not admin:
+        return RedirectResponse("/admin/login", status_code=302)
+
+    # отчёт читает через своё соединение, пока идёт ответ
+    db.close()
+
+    date_to = date_to or date.today()
+    date_from = date_from or date_to.replace(day=1)
+    if date_to < date_from:
+        return PlainTextResponse("date_from позже date_to", status_code=400)
+    if (date_to - date_from).days >= config.REPORT_MAX_DAYS:
+        return PlainTextResponse(
+            f"период длиннее {config.REPORT_MAX_DAYS} дней", status_code=400
+        )
+
+    filename = f"attendance_{group or 'all'}_{date_from}_{date_to}.csv"
+    return StreamingResponse(
+        attendance_matrix_csv(engine, date_from, date_to, group or None),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
+    )
+
+
+@app.get("/admin/students/import", response_class=HTMLResponse)
+def admin_import_form(request: Request, db: Session = Depends(get_db)):
+    lang = get_lang(request)
+    admin = get_current_admin(request, db)
+    if not admin:
+        return RedirectResponse("/admin/login", status_code=302)
+    return templates.TemplateResponse(
+        "admin_import.html",
+        {"request": request, "lang": lang, "job": None, "report": None, "error": None},
+    )
+
+
+@app.post("/admin/students/import", response_class=HTMLResponse)
+def admin_import_roster(
+    request: Request,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    """
+    Массовая загрузка студентов из CSV (см. roster_import.py): файл уходит
+    фоновой задаче, ответ — сразу переход на страницу её статуса.
+    """
+    admin = get_current_admin(request, db)
+    if not admin:
+        return RedirectResponse("/admin/login", status_code=302)
+
+    # временный файл Starlette закроется вместе с запросом — задаче нужна копия
+    fd, path = tempfile.mkstemp(prefix="roster-", suffix=".csv")
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(file.file, out)
+    job = roster_imports.submit(engine, path, file.filename or "roster.csv")
+    return RedirectResponse(f"/admin/students/import/{job.id}", status_code=303)
+
+
+@app.get("/admin/students/import/{job_id}", response_class=HTMLResponse)
+def admin_import_status(request: Request, job_id: str, db: Session = Depends(get_db)):
+    lang = get_lang(request)
+    admin = get_current_admin(request, db)
+    if not admin:
+        return RedirectResponse("/admin/login", status_code=302)
+    job = roster_imports.get(job_id)
+    if job is None:
+        return PlainTextResponse("загрузка не найдена (сервер перезапускался?)", status_code=404)
+    return templates.TemplateResponse(
+        "admin_import.html",
+        {
+            "request": request,
+            "lang": lang,
+            "job": job,
+            "report": job.report if job.finished else None,
+            "error": job.error,
+        },
+    )
+
+
+# -------------------------------------------------
+# МЕТРИКИ
+# -------------------------------------------------
+
+@metrics.collector
+def _module_stats():
+    """Счётчики, которые модули и так ведут сами."""
+    cache = device_cache.stats()
+    return [
+        ("device_cache_size", "gauge", "Устройств в кэше воркера", cache["size"]),
+        ("device_cache_hits_total", "counter", "Попадания кэша устройств", cache["hits"]),
+        ("device_cache_misses_total", "counter", "Промахи кэша устройств", cache["misses"]),
+        ("page_cache_renders_total", "counter", "Рендеры страниц кэшем page_cache", pages.renders),
+        ("checkin_writer_pending", "gauge", "Отметок в очереди группового коммита", checkin_writer.pending),
+        ("rate_limited_device_total", "counter", "429 по лимиту на устройство", device_limiter.limited),
+        ("rate_limited_ip_total", "counter", "429 по лимиту на IP", ip_limiter.limited),
+        ("load_shed_total", "counter", "503 при переполненной очереди запросов", shedder.shed if shedder else 0),
+        ("password_checks_rejected_total", "counter", "Проверки пароля без места в очереди", password_pool.rejected),
+        ("password_checks_timeouts_total", "counter", "Проверки пароля, не уложившиеся в таймаут", password_pool.timeouts),
+    ]
+
+
+@app.get("/metrics")
+def metrics_endpoint(request: Request, db: Session = Depends(get_db)):
+    """
+    Метрики этого воркера для Prometheus. Доступ — сессия админа или
+    заголовок Authorization: Bearer <METRICS_TOKEN> (для сборщика).
+    """
+    authorization = request.headers.get("authorization", "")
+    by_token = bool(config.METRICS_TOKEN) and hmac.compare_digest(
+        authorization.encode(), f"Bearer {config.METRICS_TOKEN}".encode()
+    )
+    if not by_token and not get_current_admin(request, db):
+        return PlainTextResponse("forbidden", status_code=403)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# -------------------------------------------------
+# АСИНХРОННЫЙ РЕЖИМ (DB_ASYNC=1)
+# -------------------------------------------------
+# Те же обработчики, но с AsyncSession: запрос не занимает поток из пула
+# Starlette. Логика остаётся одна — синхронный код выполняется через
+# AsyncSession.run_sync (greenlet, ввод-вывод драйвера асинхронный),
+# а отметка ждёт коммита CheckinWriter в цикле событий.
+
+async_router = APIRouter()
+
+@async_router.get("/", response_class=HTMLResponse)
+async def index_async(request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda s: index(request, s))
+
+
+@async_router.post("/login", response_class=HTMLResponse)
+async def login_async(
+    request: Request,
+    login: str = Form(...),
+    password: str = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    prepared = await db.run_sync(lambda s: prepare_login(request, login, password, s))
+    if not isinstance(prepared, tuple):
+        return prepared
+    lang, key, candidates = prepared
+
+    try:
+        checked = await password_pool.check_async(password.strip(), [s.password for s in candidates])
+    except PasswordBusy:
+        return login_busy(request, lang)
+    return await db.run_sync(lambda s: finish_login(request, lang, key, candidates, checked, s))
+
+
+@async_router.get("/student", response_class=HTMLResponse)
+async def student_home_async(request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda s: student_home(request, s))
+
+
+@async_router.post("/student/mark", response_class=HTMLResponse)
+async def mark_attendance_async(
+    request: Request,
+    lat: Optional[float] = Form(None),
+    lon: Optional[float] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    prepared = await db.run_sync(lambda s: prepare_checkin(request, lat, lon, s))
+    if not isinstance(prepared, tuple):
+        return prepared
+    student, lang, values = prepared
+
+    # shield: по таймауту перестаём ждать, но саму запись не отменяем
+    ack = asyncio.wrap_future(checkin_writer.submit(values))
+    try:
+        inserted = await asyncio.wait_for(asyncio.shield(ack), config.CHECKIN_ACK_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        return checkin_overloaded(request, student, lang)
+    checkin("accepted" if inserted else "duplicate")
+
+    return RedirectResponse(url="/student", status_code=status.HTTP_302_FOUND)
+
+
+@async_router.post("/api/checkin", response_model=CheckinResponse)
+async def api_checkin_async(
+    request: Request, body: CheckinRequest, db: AsyncSession = Depends(get_async_db)
+):
+    refused, student, lang, values = await db.run_sync(
+        lambda s: check_checkin(request, body.lat, body.lon, s)
+    )
+    if refused:
+        return checkin_json(refused, lang, values)
+
+    ack = asyncio.wrap_future(checkin_writer.submit(values))
+    try:
+        inserted = await asyncio.wait_for(asyncio.shield(ack), config.CHECKIN_ACK_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        checkin("overloaded")
+        return checkin_json("overloaded", lang)
+    return await db.run_sync(lambda s: finish_api_checkin(student, lang, values, inserted, s))
+
+
+@async_router.get("/admin/dashboard", response_class=HTMLResponse)
+async def admin_dashboard_async(request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda s: admin_dashboard(request, s))
+
+
+def use_async_routes(app: FastAPI, router: APIRouter):
+    """Снять синхронные версии путей из router и подключить асинхронные."""
+    replaced = {(route.path, method) for route in router.routes for method in route.methods}
+    app.router.routes = [
+        route
+        for route in app.router.routes
+        if not (
+            isinstance(route, APIRoute)
+            and any((route.path, method) in replaced for method in route.methods)
+        )
+    ]
+    app.include_router(router)
+
 
+if config.DB_ASYNC:
+    use_async_routes(app, async_router)
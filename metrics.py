@@ -0,0 +1,248 @@
+# metrics.py
+# Метрики воркера в текстовом формате Prometheus (/metrics).
+#
+# Что собирается:
+#   * время ответа по роутам (гистограмма) и число ответов по кодам;
+#   * SQL: сколько запросов и сколько времени в БД на каждый HTTP-запрос —
+#     через события before/after_cursor_execute движка; запросы вне HTTP
+#     (фоновый CheckinWriter, bootstrap) идут под route="background";
+#   * исходы отметок: принята, уже была, вне зоны, без геолокации, чужое
+#     устройство, не подтверждена (перегрузка);
+#   * счётчики кэшей и лимитов, которые уже есть в других модулях
+#     (регистрируются как collectors в main.py).
+#
+# Без блокировок: каждый поток пишет в свой «шард» (threading.local), а при
+# выдаче /metrics шарды суммируются. Запись в свой шард никто больше не
+# делает, а копия словаря чужого шарда под GIL атомарна. Цифры у каждого
+# воркера uvicorn свои — Prometheus собирает их с каждого воркера.
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+Labels = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+# [число SQL-запросов, секунд в БД] для текущего HTTP-запроса; контекст
+# копируется и в поток пула Starlette, и в greenlet AsyncSession.run_sync
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+
+class _Shard:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # имя -> [счётчики по корзинам..., +Inf, сумма]
+        self.histograms: Dict[Tuple[str, Labels], list] = {}
+
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        # имя -> (тип, описание, корзины)
+        self._meta: Dict[str, Tuple[str, str, tuple]] = {}
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            self._shards.append(shard)  # list.append атомарен
+        return shard
+
+    def counter(self, name: str, help_text: str):
+        self._meta[name] = ("counter", help_text, ())
+
+    def histogram(self, name: str, help_text: str, buckets: tuple):
+        self._meta[name] = ("histogram", help_text, tuple(buckets))
+
+    def collector(self, fn: Callable[[], Iterable[tuple]]):
+        """fn() -> [(имя, тип, описание, значение), ...] — снимается при выдаче."""
+        self._collectors.append(fn)
+        return fn
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: Labels, value: float):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        row = histograms.get(key)
+        if row is None:
+            buckets = self._meta[name][2]
+            row = histograms[key] = [0] * (len(buckets) + 2)
+        row[bisect.bisect_left(self._meta[name][2], value)] += 1
+        row[-1] += value
+
+    # ---------- выдача ----------
+
+    def _merged(self):
+        counters: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], list] = {}
+        for shard in list(self._shards):
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, row in list(shard.histograms.items()):
+                row = list(row)
+                total = histograms.get(key)
+                histograms[key] = row if total is None else [a + b for a, b in zip(total, row)]
+        return counters, histograms
+
+    def render(self) -> str:
+        counters, histograms = self._merged()
+        lines: List[str] = []
+
+        by_name: Dict[str, list] = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for (name, labels), row in histograms.items():
+            by_name.setdefault(name, []).append((labels, row))
+
+        for name in sorted(by_name):
+            kind, help_text, buckets = self._meta.get(name, ("untyped", "", ()))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name]):
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_num(value)}")
+                    continue
+                running = 0
+                for bound, count in zip((*buckets, "+Inf"), value):
+                    running += count
+                    le = bound if bound == "+Inf" else _num(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {running}")
+                lines.append(f"{name}_sum{_labels(labels)} {_num(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {running}")
+
+        for collect in self._collectors:
+            for name, kind, help_text, value in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _num(value) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = (
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+metrics = Registry()
+metrics.histogram(
+    "http_request_duration_seconds", "Время ответа по роутам", LATENCY_BUCKETS
+)
+metrics.counter("http_requests_total", "Ответы по роутам и кодам")
+metrics.histogram(
+    "http_request_db_statements", "SQL-запросов на один HTTP-запрос", STATEMENT_BUCKETS
+)
+metrics.counter("db_statements_total", "SQL-запросов всего, по роутам (background — вне HTTP)")
+metrics.counter("db_seconds_total", "Секунд в БД, по роутам (background — вне HTTP)")
+metrics.counter("checkins_total", "Отметки по исходу")
+
+
+def checkin(result: str):
+    """Исход отметки: accepted, duplicate, out_of_fence, no_geolocation, ..."""
+    metrics.inc("checkins_total", (("result", result),))
+
+
+# ---------- SQL ----------
+
+def instrument_engine(engine):
+    """Считать запросы и время в БД (рецепт из документации SQLAlchemy)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        stats = _request_db.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+        else:
+            labels = (("route", "background"),)
+            metrics.inc("db_statements_total", labels)
+            metrics.inc("db_seconds_total", labels, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("metrics_started") if context.connection else None
+        if started:
+            started.pop()
+
+    return engine
+
+
+# ---------- HTTP ----------
+
+class MetricsMiddleware:
+    """Время ответа, код и SQL на запрос. Метка route — шаблон пути, а не сам путь."""
+
+    def __init__(self, app: ASGIApp, router):
+        self.app = app
+        self.router = router
+        self._routes: Dict[object, str] = {}
+        self._routes_count = -1
+
+    def _route(self, scope: Scope) -> str:
+        # Starlette кладёт в scope только endpoint — путь ищем по нему;
+        # карта пересобирается, если роуты поменялись (use_async_routes)
+        if len(self.router.routes) != self._routes_count:
+            routes = {}
+            for route in self.router.routes:
+                target = route.app if isinstance(route, Mount) else getattr(route, "endpoint", None)
+                if target is not None:
+                    routes[target] = route.path
+            self._routes, self._routes_count = routes, len(self.router.routes)
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        stats = [0, 0.0]
+        token = _request_db.set(stats)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+            route = (("route", self._route(scope)),)
+            method = (("method", scope["method"]),)
+            metrics.observe("http_request_duration_seconds", route + method, elapsed)
+            metrics.inc("http_requests_total", route + method + (("status", str(status)),))
+            metrics.observe("http_request_db_statements", route, stats[0])
+            if stats[0]:
+                metrics.inc("db_statements_total", route, stats[0])
+                metrics.inc("db_seconds_total", route, stats[1])
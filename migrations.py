@@ -0,0 +1,314 @@
+# migrations.py
+# Версионные миграции схемы.
+#
+# Base.metadata.create_all создаёт только недостающие таблицы и не трогает
+# уже существующие, поэтому новые индексы и правки данных в рабочих
+# attendance.db делаем здесь. Каждая миграция выполняется один раз,
+# номер применённой версии записывается в таблицу schema_migrations.
+#
+#   python migrations.py          — применить все новые миграции
+#   python migrations.py --status — показать, что применено
+import sqlite3
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+
+# -------------------------------------------------
+# МИГРАЦИИ
+# -------------------------------------------------
+
+def m001_attendance_unique_day(conn: Connection):
+    # дубли от двойных нажатий: оставляем самую раннюю отметку за день
+    conn.execute(text(
+        "DELETE FROM attendance WHERE id NOT IN ("
+        " SELECT MIN(id) FROM attendance GROUP BY student_id, date"
+        ")"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_student_date "
+        "ON attendance (student_id, date)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_attendance_date ON attendance (date)"
+    ))
+
+
+def m002_students_device_uid_index(conn: Connection):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_students_device_uid ON students (device_uid)"
+    ))
+
+
+def m003_students_normalized_login(conn: Connection):
+    from models import normalize_login
+
+    columns = {c["name"] for c in inspect(conn).get_columns("students")}
+    for column in ("login_norm", "full_name_norm"):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE students ADD COLUMN {column} VARCHAR"))
+
+    # заполняем в Python: нормализация должна совпадать с той, что при записи
+    rows = conn.execute(text("SELECT id, login, full_name FROM students")).all()
+    if rows:
+        conn.execute(
+            text("UPDATE students SET login_norm = :login_norm, full_name_norm = :full_name_norm WHERE id = :id"),
+            [
+                {
+                    "id": row.id,
+                    "login_norm": normalize_login(row.login),
+                    "full_name_norm": normalize_login(row.full_name),
+                }
+                for row in rows
+            ],
+        )
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_students_login_norm ON students (login_norm)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_students_full_name_norm ON students (full_name_norm)"
+    ))
+
+
+def m004_seed_default_accounts(conn: Connection):
+    """
+    Учётки по умолчанию (раньше создавались при каждом импорте database.py
+    и на каждом GET / через ensure_admin):
+    - админ admin / admin123
+    - студент demo / 1234
+    """
+    from models import normalize_login
+
+    if conn.execute(text("SELECT 1 FROM admins WHERE username = 'admin'")).first() is None:
+        conn.execute(text(
+            "INSERT INTO admins (username, password) VALUES ('admin', 'admin123')"
+        ))
+
+    if conn.execute(text("SELECT 1 FROM students WHERE login = 'demo'")).first() is None:
+        full_name = "Тестовый Студент"
+        conn.execute(
+            text(
+                "INSERT INTO students (full_name, login, password, group_name, is_active,"
+                " created_at, login_norm, full_name_norm)"
+                " VALUES (:full_name, 'demo', '1234', 'SW-999', :active, :now,"
+                " 'demo', :full_name_norm)"
+            ),
+            {
+                "full_name": full_name,
+                "active": True,
+                "now": datetime.utcnow(),
+                "full_name_norm": normalize_login(full_name),
+            },
+        )
+
+
+def m005_seed_default_campus(conn: Connection):
+    """Прежняя захардкоженная геозона из main.py — первый корпус в geo_zones."""
+    if conn.execute(text("SELECT 1 FROM geo_zones")).first() is not None:
+        return
+    conn.execute(text("INSERT INTO campuses (name, is_active) VALUES ('Главный корпус', :active)"),
+                 {"active": True})
+    campus_id = conn.execute(text("SELECT id FROM campuses WHERE name = 'Главный корпус'")).scalar()
+    conn.execute(
+        text(
+            "INSERT INTO geo_zones (campus_id, name, kind, center_lat, center_lon, radius_m,"
+            " is_active, updated_at)"
+            " VALUES (:campus_id, 'Территория', 'circle', 45.01, 78.22, 400, :active, :now)"
+        ),
+        {"campus_id": campus_id, "active": True, "now": datetime.utcnow()},
+    )
+
+
+def m006_attendance_coordinates(conn: Connection):
+    columns = {c["name"] for c in inspect(conn).get_columns("attendance")}
+    for column in ("lat", "lon"):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE attendance ADD COLUMN {column} FLOAT"))
+
+
+def m007_student_stats_backfill(conn: Connection):
+    from student_stats import rebuild
+
+    rebuild(conn)
+
+
+def m008_attendance_compact_rows(conn: Connection):
+    """
+    ip_address -> ip (упакованный), device_uid -> device_id (таблица devices),
+    motivation_text -> motivation_id / lang / arg; старые столбцы удаляются.
+    Фразы не из шаблонов (очень старые) теряются: показывается только
+    сегодняшняя, так что студент этого не увидит.
+    """
+    from models import pack_ip
+    from motivation import parse
+
+    blob = "BYTEA" if conn.dialect.name == "postgresql" else "BLOB"
+    columns = {c["name"] for c in inspect(conn).get_columns("attendance")}
+    for column, ddl in (
+        ("ip", blob),
+        ("device_id", "INTEGER REFERENCES devices (id)"),
+        ("motivation_id", "INTEGER"),
+        ("motivation_lang", "VARCHAR(2)"),
+        ("motivation_arg", "INTEGER"),
+    ):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE attendance ADD COLUMN {column} {ddl}"))
+
+    legacy = [c for c in ("ip_address", "device_uid", "motivation_text") if c in columns]
+    if not legacy:  # база создана уже по новой схеме
+        return
+
+    if "device_uid" in columns:
+        conn.execute(text(
+            "INSERT INTO devices (uid, created_at)"
+            " SELECT device_uid, MIN(created_at) FROM attendance"
+            " WHERE device_uid IS NOT NULL AND device_uid NOT IN (SELECT uid FROM devices)"
+            " GROUP BY device_uid"
+        ))
+        conn.execute(text(
+            "UPDATE attendance SET device_id ="
+            " (SELECT id FROM devices WHERE devices.uid = attendance.device_uid)"
+            " WHERE device_uid IS NOT NULL"
+        ))
+
+    # IP и фразы разбираем в Python, пачками по id
+    ip_column = "ip_address" if "ip_address" in columns else "NULL"
+    text_column = "motivation_text" if "motivation_text" in columns else "NULL"
+    parsed = {}
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                f"SELECT id, {ip_column} AS ip_address, {text_column} AS motivation_text"
+                " FROM attendance WHERE id > :last_id ORDER BY id LIMIT 5000"
+            ),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            if row.motivation_text not in parsed:
+                parsed[row.motivation_text] = parse(row.motivation_text) or (None, None, None)
+            phrase_id, lang, arg = parsed[row.motivation_text]
+            updates.append({
+                "id": row.id,
+                "ip": pack_ip(row.ip_address),
+                "motivation_id": phrase_id,
+                "motivation_lang": lang,
+                "motivation_arg": arg,
+            })
+        conn.execute(
+            text(
+                "UPDATE attendance SET ip = :ip, motivation_id = :motivation_id,"
+                " motivation_lang = :motivation_lang, motivation_arg = :motivation_arg"
+                " WHERE id = :id"
+            ),
+            updates,
+        )
+
+    if conn.dialect.name == "sqlite" and sqlite3.sqlite_version_info < (3, 35):
+        # DROP COLUMN появился в SQLite 3.35 — на старых просто обнуляем
+        conn.execute(text("UPDATE attendance SET " + ", ".join(f"{c} = NULL" for c in legacy)))
+        return
+    for column in legacy:
+        conn.execute(text(f"ALTER TABLE attendance DROP COLUMN {column}"))
+
+
+def m009_students_group_active_index(conn: Connection):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_students_group_active"
+        " ON students (group_name, is_active, full_name)"
+    ))
+
+
+def m010_hash_default_accounts(conn: Connection):
+    """Учётки из m004 сеются с открытыми паролями — хэшируем их (и в старых базах, и в новых)."""
+    from passwords import hash_password, pwd_context
+
+    for table, key_column, key in (("admins", "username", "admin"), ("students", "login", "demo")):
+        for row_id, password in conn.execute(
+            text(f"SELECT id, password FROM {table} WHERE {key_column} = :key"), {"key": key}
+        ).all():
+            if password and pwd_context.needs_update(password.strip()):
+                conn.execute(
+                    text(f"UPDATE {table} SET password = :password WHERE id = :id"),
+                    {"password": hash_password(password.strip()), "id": row_id},
+                )
+
+
+# (версия, название, функция) — только добавлять в конец, не менять старые
+MIGRATIONS = [
+    (1, "attendance: unique (student_id, date), index (date)", m001_attendance_unique_day),
+    (2, "students: index (device_uid)", m002_students_device_uid_index),
+    (3, "students: login_norm, full_name_norm + indexes", m003_students_normalized_login),
+    (4, "seed: admin and demo accounts", m004_seed_default_accounts),
+    (5, "seed: default campus geofence", m005_seed_default_campus),
+    (6, "attendance: lat, lon", m006_attendance_coordinates),
+    (7, "student_stats: backfill from attendance", m007_student_stats_backfill),
+    (8, "attendance: packed ip, devices table, motivation phrase id", m008_attendance_compact_rows),
+    (9, "students: index (group_name, is_active, full_name)", m009_students_group_active_index),
+    (10, "seed: hash default account passwords", m010_hash_default_accounts),
+]
+
+
+# -------------------------------------------------
+# ЗАПУСК
+# -------------------------------------------------
+
+def applied_versions(engine: Engine) -> set:
+    _metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return set(conn.scalars(select(schema_migrations.c.version)))
+
+
+def run_migrations(engine: Engine) -> list:
+    """Применить все ещё не применённые миграции. Возвращает их номера."""
+    done = applied_versions(engine)
+    applied = []
+    for version, name, func in MIGRATIONS:
+        if version in done:
+            continue
+        # миграция и запись о ней — в одной транзакции
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name))
+        applied.append(version)
+    return applied
+
+
+def main(argv=None):
+    from bootstrap import bootstrap
+    from database import engine
+
+    argv = sys.argv[1:] if argv is None else argv
+    if "--status" in argv:
+        done = applied_versions(engine)
+        for version, name, _ in MIGRATIONS:
+            mark = "x" if version in done else " "
+            print(f"[{mark}] {version:03d} {name}")
+        return
+
+    applied = bootstrap(engine)
+    if applied:
+        print("Применены миграции:", ", ".join(f"{v:03d}" for v in applied))
+    else:
+        print("Схема актуальна")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,49 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Float, ForeignKey, Index, LargeBinary, Text
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
+import ipaddress
+from typing import Optional
 from database import Base
 
 
+def normalize_login(value: Optional[str]) -> Optional[str]:
+    """
+    Ключ поиска для логина и ФИО: без крайних и двойных пробелов, casefold.
+    Считаем в Python, потому что lower() в SQLite не понимает кириллицу.
+    """
+    if value is None:
+        return None
+    return " ".join(value.split()).casefold()
+
+
+def pack_ip(value: Optional[str]) -> Optional[bytes]:
+    """IP в 4 (IPv4) или 16 (IPv6) байт; не IP (например, "testclient") — None."""
+    try:
+        return ipaddress.ip_address(value).packed
+    except ValueError:
+        return None
+
+
+def unpack_ip(value: Optional[bytes]) -> Optional[str]:
+    return str(ipaddress.ip_address(value)) if value else None
+
+
 class Admin(Base):
     __tablename__ = "admins"
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True)
-    password = Column(String)  # потом можно будет заменить на хэш
-    session_token = Column(String, nullable=True)
+    password = Column(String)  # bcrypt-хэш; старый открытый пароль хэшируется при входе (passwords.py)
+    session_token = Column(String, nullable=True)  # не используется: сессии подписанные (admin_sessions.py)
+
+
+class RevokedAdminToken(Base):
+    """Отозванные при выходе сессии админки; строка живёт до истечения токена."""
+    __tablename__ = "admin_revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
 
 
 class Student(Base):
@@ -20,14 +52,30 @@ class Student(Base):
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String, nullable=False)
     login = Column(String, unique=False, index=True)   # можно одинаковые логины в разных группах
-    password = Column(String, nullable=False)
+    password = Column(String, nullable=False)  # то же, что Admin.password
     group_name = Column(String, nullable=True)
-    device_uid = Column(String, nullable=True)
+    device_uid = Column(String, nullable=True, index=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # нормализованные копии для индексного поиска на /login (см. normalize_login);
+    # заполняются автоматически при записи login / full_name через ORM
+    login_norm = Column(String, nullable=True, index=True)
+    full_name_norm = Column(String, nullable=True, index=True)
+
     attendance = relationship("Attendance", back_populates="student")
 
+    # список отсутствующих по группе (absentees.py): full_name в конце индекса —
+    # страницы идут в порядке индекса, без сортировки; для старых баз — migrations.py
+    __table_args__ = (
+        Index("ix_students_group_active", "group_name", "is_active", "full_name"),
+    )
+
+    @validates("login", "full_name")
+    def _sync_normalized(self, key, value):
+        setattr(self, f"{key}_norm", normalize_login(value))
+        return value
+
 
 class Attendance(Base):
     __tablename__ = "attendance"
@@ -37,8 +85,85 @@ class Attendance(Base):
     date = Column(Date, nullable=False)
     status = Column(Integer, nullable=False, default=1)  # 1 = пришёл
     created_at = Column(DateTime, default=datetime.utcnow)
-    ip_address = Column(String, nullable=True)
-    device_uid = Column(String, nullable=True)
-    motivation_text = Column(String, nullable=True)
+    # компактно: IP упакован (pack_ip), устройство — ссылка на devices,
+    # фраза — номер шаблона, язык и число (motivation.py); m008 в migrations.py
+    ip = Column(LargeBinary, nullable=True)
+    device_id = Column(Integer, ForeignKey("devices.id"), nullable=True)
+    motivation_id = Column(Integer, nullable=True)
+    motivation_lang = Column(String(2), nullable=True)
+    motivation_arg = Column(Integer, nullable=True)
+    # где студент был в момент отметки (для повторной проверки геозон, geo_audit.py)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
 
     student = relationship("Student", back_populates="attendance")
+
+    # одна отметка на студента в день; для старых баз — migrations.py
+    __table_args__ = (
+        Index("ux_attendance_student_date", "student_id", "date", unique=True),
+        Index("ix_attendance_date", "date"),
+    )
+
+
+class Device(Base):
+    """device_uid из cookie — одна строка на телефон, attendance ссылается на id."""
+    __tablename__ = "devices"
+
+    id = Column(Integer, primary_key=True)
+    uid = Column(String, nullable=False, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GroupDailyStat(Base):
+    """Счётчики дашборда: сколько студентов в группе и сколько пришло за день."""
+    __tablename__ = "group_daily_stats"
+
+    date = Column(Date, primary_key=True)
+    group_name = Column(String, primary_key=True)  # "" — студенты без группы
+    total = Column(Integer, nullable=False, default=0)
+    present = Column(Integer, nullable=False, default=0)
+
+
+class StudentStat(Base):
+    """
+    Сводка посещений студента для мотивационных сообщений (student_stats.py):
+    последний день, серия дней подряд и битовая маска последних дней.
+    """
+    __tablename__ = "student_stats"
+
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    last_seen = Column(Date, nullable=True)
+    streak = Column(Integer, nullable=False, default=0)
+    recent_mask = Column(Integer, nullable=False, default=0)  # бит i — был ли в день last_seen - i
+
+
+class Campus(Base):
+    """Корпус / площадка колледжа: набор геозон, где можно отмечаться."""
+    __tablename__ = "campuses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    is_active = Column(Boolean, default=True)
+
+    zones = relationship("GeoZone", back_populates="campus")
+
+
+class GeoZone(Base):
+    """
+    Геозона: круг (center_lat, center_lon, radius_m) или многоугольник
+    (points — JSON [[lat, lon], ...]). Читает geofence.py.
+    """
+    __tablename__ = "geo_zones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    campus_id = Column(Integer, ForeignKey("campuses.id"), nullable=False)
+    name = Column(String, nullable=False)
+    kind = Column(String, nullable=False, default="circle")  # circle | polygon
+    center_lat = Column(Float, nullable=True)
+    center_lon = Column(Float, nullable=True)
+    radius_m = Column(Float, nullable=True)
+    points = Column(Text, nullable=True)
+    is_active = Column(Boolean, default=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    campus = relationship("Campus", back_populates="zones")
@@ -0,0 +1,104 @@
+# motivation.py
+# Мотивационные фразы после отметки.
+#
+# Раньше в каждой строке attendance лежало готовое предложение целиком
+# (под сотню байт UTF-8), хотя выбиралось оно из короткого списка шаблонов.
+# Теперь в строке только номер шаблона, язык и число для подстановки
+# (дни, посещения), а текст собирается при показе. Имя студента в шаблон
+# тоже подставляется при показе.
+#
+# Номера шаблонов записаны в БД и в архиве — старые не менять и не
+# переиспользовать, новые только добавлять.
+import random
+import re
+from typing import Dict, Optional, Tuple
+
+from student_stats import NO_PROGRESS, Progress
+
+# номер -> {язык: шаблон}; {n} — число, {name} — ФИО студента
+PHRASES: Dict[int, Dict[str, str]] = {
+    1: {
+        "ru": "Кавоооооо тебя не было {n} дней, больше так не делай пожааалуйста! 😱",
+        "kk": "{n} күн болмадың! Енді бұлай жоғалма, жарай ма? 😱",
+    },
+    2: {
+        "ru": "Ты пропал на {n} дней. Хорошо, что вернулся, так больше не пропадай 🥺",
+        "kk": "{n} күн көрінбедің. Қайта келгенің жақсы, енді жоғалма 🥺",
+    },
+    3: {
+        "ru": "Красавчик! Уже {n} посещений за месяц, дисциплина на высоте 💪",
+        "kk": "Керемет! Бір айда {n} рет келдің, тәртібің мықты 💪",
+    },
+    4: {
+        "ru": "Ты уже {n} дней подряд без прогулов. Вот это настрой! 🔥",
+        "kk": "Қатарынан {n} күн сабақ жіберген жоқсың. Осылай жалғастыр! 🔥",
+    },
+    5: {
+        "ru": "{name}, отличный старт! Пусть день пройдёт продуктивно!",
+        "kk": "{name}, тамаша бастама! Бүгінгі күніңіз сәтті өтсін!",
+    },
+    6: {
+        "ru": "Молодец! Каждый день — новый шанс.",
+        "kk": "Жарайсың! Әр күн — жаңа мүмкіндік.",
+    },
+    7: {
+        "ru": "Здорово, что ты пришёл! Шаг к знаниям никогда не бывает лишним.",
+        "kk": "Келгенің өте жақсы! Білімге жасаған қадамың зая кетпейді.",
+    },
+    8: {
+        "ru": "Верь в себя — именно сейчас ты строишь своё будущее.",
+        "kk": "Өзіңе сен! Қазірден бастап болашағыңды құрып жатырсың.",
+    },
+}
+
+# без повода из student_stats — случайная из этих
+GENERIC = (5, 6, 7, 8)
+
+
+def choose(progress: Progress = NO_PROGRESS) -> Tuple[int, Optional[int]]:
+    """(номер шаблона, число) — сначала про давность и серию, иначе случайная фраза."""
+    absent, streak, present = progress.days_absent, progress.streak, progress.present_30d
+    if absent is not None and absent >= 45:
+        return 1, absent
+    if absent is not None and absent >= 7:
+        return 2, absent
+    if present >= 20:
+        return 3, present
+    if streak >= 5:
+        return 4, streak
+    return random.choice(GENERIC), None
+
+
+def render(phrase_id: Optional[int], lang: Optional[str], arg: Optional[int], full_name: str) -> Optional[str]:
+    templates = PHRASES.get(phrase_id)
+    if templates is None:
+        return None
+    template = templates.get(lang) or templates["ru"]
+    return template.format(n=arg if arg is not None else "", name=full_name)
+
+
+# ---------- разбор готового текста (миграция старых строк) ----------
+
+def _pattern(template: str) -> "re.Pattern":
+    escaped = re.escape(template)
+    escaped = escaped.replace(re.escape("{n}"), r"(?P<n>\d+)").replace(re.escape("{name}"), ".+")
+    return re.compile(escaped, re.S)
+
+
+_PATTERNS = [
+    (phrase_id, lang, _pattern(template))
+    for phrase_id, templates in PHRASES.items()
+    for lang, template in templates.items()
+]
+
+
+def parse(text: Optional[str]) -> Optional[Tuple[int, str, Optional[int]]]:
+    """Готовая фраза -> (номер, язык, число); None — текст не из шаблонов."""
+    if not text:
+        return None
+    for phrase_id, lang, pattern in _PATTERNS:
+        match = pattern.fullmatch(text)
+        if match:
+            n = match.groupdict().get("n")
+            return phrase_id, lang, int(n) if n is not None else None
+    return None
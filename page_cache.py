@@ -0,0 +1,80 @@
+# page_cache.py
+# Готовые HTML-страницы, которые зависят только от языка.
+#
+# only_mobile.html (его видит каждый заход с компьютера на любой роут),
+# login.html без ошибки и admin_login.html раньше рендерились Jinja на каждый
+# запрос. Теперь страница рендерится один раз на (шаблон, язык, mtime
+# шаблона и его родителей), отдаётся с сильным ETag, а повторный заход с
+# If-None-Match получает 304 без тела. Правка шаблона меняет mtime —
+# следующий запрос рендерит заново, рестарт не нужен.
+import hashlib
+import os
+import threading
+from typing import Dict, List, Tuple
+
+from fastapi import Request, Response
+from fastapi.templating import Jinja2Templates
+from jinja2 import meta
+
+# язык берётся из cookie — прокси и браузер должны это учитывать;
+# no-cache: хранить можно, но перед показом спросить сервер (ETag)
+CACHE_HEADERS = {"Cache-Control": "no-cache", "Vary": "Cookie"}
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # для If-None-Match сравнение слабое: W/"x" совпадает с "x"
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in tags
+
+
+class PageCache:
+    def __init__(self, templates: Jinja2Templates):
+        self.templates = templates
+        self.env = templates.env
+        # (шаблон, язык) -> (mtime, тело, etag)
+        self._pages: Dict[Tuple[str, str], Tuple[float, bytes, str]] = {}
+        # шаблон -> (файл, его mtime, родители из extends / include)
+        self._files: Dict[str, Tuple[str, float, List[str]]] = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+
+    def _mtime(self, name: str) -> float:
+        """Самый свежий mtime среди шаблона и всех его родителей."""
+        cached = self._files.get(name)
+        mtime = os.path.getmtime(cached[0]) if cached else None
+        if cached is None or mtime != cached[1]:
+            # файл новый или поменялся — заново узнаём, от чего он зависит
+            source, filename, _ = self.env.loader.get_source(self.env, name)
+            mtime = os.path.getmtime(filename)
+            parents = [p for p in meta.find_referenced_templates(self.env.parse(source)) if p]
+            cached = self._files[name] = (filename, mtime, parents)
+        return max([mtime, *(self._mtime(parent) for parent in cached[2])])
+
+    def page(self, request: Request, name: str, lang: str) -> Tuple[bytes, str]:
+        mtime = self._mtime(name)
+        key = (name, lang)
+        cached = self._pages.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached and cached[0] == mtime:
+                return cached[1], cached[2]
+            body = self.env.get_template(name).render({"request": request, "lang": lang}).encode()
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            self._pages[key] = (mtime, body, etag)
+            self.renders += 1
+            return body, etag
+
+    def response(self, request: Request, name: str, lang: str, status_code: int = 200) -> Response:
+        """Страница из кэша; 304, если у браузера уже есть эта версия."""
+        body, etag = self.page(request, name, lang)
+        headers = {"ETag": etag, **CACHE_HEADERS}
+        if status_code == 200 and etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, status_code=status_code, media_type="text/html", headers=headers)
@@ -0,0 +1,255 @@
+# passwords.py
+# Хэши паролей студентов и админов и их проверка вне потоков запросов.
+#
+# Раньше пароли лежали и сравнивались открытым текстом. Теперь в том же
+# столбце password хранится bcrypt-хэш. Старые открытые пароли переводятся
+# прозрачно: схема plaintext в CryptContext помечена устаревшей, и при
+# первом удачном входе verify_and_update отдаёт новый хэш, который
+# обработчик сохраняет. Всё разом можно перевести `python passwords.py --rehash`.
+#
+# bcrypt — это 100–250 мс CPU на проверку. В потоках Starlette утренний
+# наплыв логинов занял бы и GIL, и весь пул, и /student/mark ждал бы за ними.
+# Поэтому проверка идёт в отдельном пуле процессов (PASSWORD_WORKERS) с
+# ограниченной очередью (PASSWORD_QUEUE): если очередь полна или ответ не
+# пришёл за PASSWORD_TIMEOUT_S, вход получает «попробуйте ещё раз», а не
+# копит ожидающие потоки.
+#
+# Массовое хэширование (импорт списка, --rehash) идёт через тот же пул
+# мелкими кусками по BULK_CHUNK паролей и занимает не больше PASSWORD_WORKERS
+# мест в очереди: вход ждёт за ним не дольше одного куска, а не весь импорт.
+import asyncio
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence, Tuple
+
+from passlib.context import CryptContext
+
+import config
+
+# bcrypt — основная схема; plaintext — пароли, сохранённые до хэшей
+pwd_context = CryptContext(
+    schemes=["bcrypt", "plaintext"],
+    deprecated=["plaintext"],
+    bcrypt__rounds=config.PASSWORD_BCRYPT_ROUNDS,
+)
+
+# (пароль подошёл, новый хэш или None, если менять не нужно)
+Check = Tuple[bool, Optional[str]]
+
+# паролей в одной задаче массового хэширования: ~1 с CPU при 12 раундах
+BULK_CHUNK = 4
+
+
+class PasswordBusy(RuntimeError):
+    """Очередь проверок заполнена или проверка не уложилась в таймаут."""
+
+
+# ---------- то, что выполняется в процессах пула ----------
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def hash_many(passwords: Sequence[str]) -> List[str]:
+    return [pwd_context.hash(p) for p in passwords]
+
+
+def check_many(password: str, stored: Sequence[Optional[str]]) -> List[Check]:
+    """Сверить один введённый пароль с несколькими сохранёнными (тёзки по логину)."""
+    results = []
+    for value in stored:
+        if not value:
+            results.append((False, None))
+            continue
+        # у старых открытых паролей в базе бывают пробелы по краям
+        results.append(pwd_context.verify_and_update(password, value.strip()))
+    return results
+
+
+# ---------- пул ----------
+
+class PasswordPool:
+    """
+    Пул процессов для bcrypt с ограниченной очередью.
+    workers=0 — считать прямо в вызывающем потоке (CLI, отладка).
+    """
+
+    def __init__(self, workers: int, queue: int, timeout_s: float):
+        self.workers = workers
+        self.timeout_s = timeout_s
+        # слот занят, пока задача в очереди или считается
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn, а не fork: воркер uvicorn уже с потоками
+                    self._executor = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    def _submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordBusy("очередь проверок паролей заполнена")
+        return self._submit_acquired(fn, *args)
+
+    def _submit_acquired(self, fn, *args) -> Future:
+        """Отправить задачу под уже занятым слотом."""
+        try:
+            future = self._pool().submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._executor = None
+            raise PasswordBusy("пул проверок паролей перезапускается")
+        except BaseException:
+            self._slots.release()
+            raise
+        # слот освобождается, когда процесс действительно закончил, а не когда
+        # вызывающий перестал ждать — иначе таймауты раздували бы очередь
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """Выполнить fn(*args) в пуле и дождаться (для синхронных обработчиков)."""
+        if self.workers == 0:
+            return fn(*args)
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout_s)
+        except FutureTimeout:
+            future.cancel()
+            self.timeouts += 1
+            raise PasswordBusy("проверка пароля не уложилась в таймаут")
+        except BrokenProcessPool:
+            self._executor = None
+            raise PasswordBusy("пул проверок паролей перезапускается")
+
+    async def run_async(self, fn, *args):
+        """То же для цикла событий: ожидание не блокирует поток."""
+        if self.workers == 0:
+            return await asyncio.to_thread(fn, *args)
+        future = self._submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PasswordBusy("проверка пароля не уложилась в таймаут")
+        except BrokenProcessPool:
+            self._executor = None
+            raise PasswordBusy("пул проверок паролей перезапускается")
+
+    def check(self, password: str, stored: Sequence[Optional[str]]) -> List[Check]:
+        if not stored:
+            return []
+        return self.run(check_many, password, list(stored))
+
+    async def check_async(self, password: str, stored: Sequence[Optional[str]]) -> List[Check]:
+        if not stored:
+            return []
+        return await self.run_async(check_many, password, list(stored))
+
+    def hash(self, password: str) -> str:
+        return self.run(hash_password, password)
+
+    def map_bulk(self, fn, chunks: Sequence) -> list:
+        """
+        fn(chunk) для каждого куска, результаты по порядку. Для фоновых задач:
+        ждёт свободного места без таймаута и держит в пуле не больше workers
+        кусков, остальная очередь остаётся входам.
+        """
+        if self.workers == 0:
+            return [fn(chunk) for chunk in chunks]
+        results: list = []
+        window: "deque[Future]" = deque()
+        try:
+            for chunk in chunks:
+                if len(window) >= self.workers:
+                    results.append(window.popleft().result())
+                self._slots.acquire()
+                window.append(self._submit_acquired(fn, chunk))
+            while window:
+                results.append(window.popleft().result())
+        except BrokenProcessPool:
+            self._executor = None
+            raise PasswordBusy("пул проверок паролей перезапускается")
+        finally:
+            for future in window:
+                future.cancel()
+        return results
+
+    def hash_bulk(self, passwords: Sequence[str]) -> List[str]:
+        """Хэши в том же порядке (импорт списка, --rehash)."""
+        chunks = [passwords[i:i + BULK_CHUNK] for i in range(0, len(passwords), BULK_CHUNK)]
+        return [h for hashed in self.map_bulk(hash_many, chunks) for h in hashed]
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+password_pool = PasswordPool(
+    config.PASSWORD_WORKERS, config.PASSWORD_QUEUE, config.PASSWORD_TIMEOUT_S
+)
+
+
+# ---------- массовое хэширование (--rehash) ----------
+
+def rehash_all(engine, chunk: int = 200) -> int:
+    """Заменить все оставшиеся открытые пароли хэшами. Возвращает число строк."""
+    from sqlalchemy import bindparam, select, update
+
+    from models import Admin, Student
+
+    total = 0
+    for model in (Student, Admin):
+        with engine.connect() as conn:
+            rows = [
+                (row_id, value) for row_id, value in conn.execute(
+                    select(model.id, model.password).where(model.password.is_not(None))
+                )
+                if pwd_context.needs_update(value.strip())
+            ]
+        for start in range(0, len(rows), chunk):
+            part = rows[start:start + chunk]
+            hashed = password_pool.hash_bulk([value.strip() for _, value in part])
+            with engine.begin() as conn:
+                conn.execute(
+                    update(model.__table__).where(model.__table__.c.id == bindparam("row_id")),
+                    [{"row_id": row_id, "password": h} for (row_id, _), h in zip(part, hashed)],
+                )
+            total += len(part)
+            print(f"{model.__tablename__}: {min(start + chunk, len(rows))}/{len(rows)}")
+    return total
+
+
+def main(argv=None):
+    import argparse
+
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Хэши паролей")
+    parser.add_argument("--rehash", action="store_true", help="захэшировать все открытые пароли в БД")
+    args = parser.parse_args(argv)
+    if not args.rehash:
+        parser.print_help()
+        return
+    try:
+        print(f"захэшировано паролей: {rehash_all(engine)}")
+    finally:
+        password_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
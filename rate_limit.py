@@ -0,0 +1,177 @@
+# rate_limit.py
+# Ограничение частоты и сброс нагрузки для студенческих роутов.
+#
+# Пара телефонов с глючным браузером, которые в цикле шлют /login или
+# /student/mark, в утренний наплыв съедают заметную долю пропускной
+# способности БД. Поэтому ASGI-middleware ещё до роутинга и до любой работы
+# с БД делает две вещи:
+#
+# 1) Токен-бакеты на POST /login, /student/mark и /api/checkin: отдельно
+#    на device_uid (cookie) и на IP. Лимит на IP намного выше, чем на
+#    устройство, потому что весь колледж выходит в интернет через один NAT.
+#    Сверх лимита сразу отдаётся 429 с Retry-After. Память ограничена:
+#    LRU на RATE_MAX_KEYS ключей, а бакеты без запросов дольше RATE_IDLE_S
+#    выбрасываются.
+#
+# 2) Глобальный лимит одновременных запросов (SHED_MAX_CONCURRENT). Если
+#    запрос ждёт свободного места дольше SHED_QUEUE_WAIT_S, очередь уже
+#    длиннее, чем сервер успеет разобрать, и запрос получает 503, а не
+#    копится в ней. Админка и статика сюда не входят.
+#
+# Состояние своё в каждом воркере uvicorn: при N воркерах фактический лимит
+# на устройство до N раз выше, но цикл повторов всё равно гасится.
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import config
+
+LIMITED = {("POST", "/login"), ("POST", "/student/mark"), ("POST", "/api/checkin")}
+SHED_EXEMPT_PREFIXES = ("/static/", "/admin/")
+
+TOO_MANY = "Слишком много запросов. Подождите немного. / Тым көп сұраныс. Біраз күтіңіз.".encode()
+OVERLOADED = "Сервер перегружен, попробуйте через минуту. / Сервер бос емес, кейінірек көріңіз.".encode()
+
+
+class TokenBucketLimiter:
+    """Токен-бакет на ключ: rate токенов в секунду, не больше burst подряд."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int, idle_s: float):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max(max_keys, 1)
+        self.idle_s = idle_s
+        self.limited = 0
+
+        # ключ -> (токены, время последнего запроса); в конце — самые свежие
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        # спереди лежат давно молчащие ключи, достаточно смотреть с начала
+        while self._buckets:
+            key, (_, last) = next(iter(self._buckets.items()))
+            if now - last < self.idle_s and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """Списать токен. 0 — можно, иначе через сколько секунд повторить."""
+        if self.rate <= 0:  # лимит выключен
+            return 0.0
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                wait = 0.0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.limited += 1
+            self._buckets[key] = (tokens, now)
+            self._evict(now)
+            return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._buckets), "limited": self.limited}
+
+
+class LoadShedder:
+    """Не больше max_concurrent запросов разом; ждавшие дольше max_wait_s — отказ."""
+
+    def __init__(self, max_concurrent: int, max_wait_s: float):
+        self.max_concurrent = max_concurrent
+        self.max_wait_s = max_wait_s
+        self.shed = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> bool:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait_s)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            return False
+        return True
+
+    def release(self):
+        self._semaphore.release()
+
+
+def client_ip(scope: Scope) -> str:
+    if config.RATE_TRUST_FORWARDED:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+async def _reply(send: Send, status: int, body: bytes, retry_after: float):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, round(retry_after))).encode()),
+            (b"cache-control", b"no-store"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        device_limiter: TokenBucketLimiter,
+        ip_limiter: TokenBucketLimiter,
+        shedder: Optional[LoadShedder],
+    ):
+        self.app = app
+        self.device_limiter = device_limiter
+        self.ip_limiter = ip_limiter
+        self.shedder = shedder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        if (scope["method"], path) in LIMITED:
+            wait = self.ip_limiter.hit(client_ip(scope))
+            device_uid = HTTPConnection(scope).cookies.get("device_uid")
+            if not wait and device_uid:
+                wait = self.device_limiter.hit(device_uid)
+            if wait:
+                return await _reply(send, 429, TOO_MANY, wait)
+
+        if self.shedder is None or path.startswith(SHED_EXEMPT_PREFIXES):
+            return await self.app(scope, receive, send)
+        if not await self.shedder.acquire():
+            return await _reply(send, 503, OVERLOADED, 30)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.shedder.release()
+
+
+device_limiter = TokenBucketLimiter(
+    config.RATE_DEVICE_PER_S, config.RATE_DEVICE_BURST, config.RATE_MAX_KEYS, config.RATE_IDLE_S
+)
+ip_limiter = TokenBucketLimiter(
+    config.RATE_IP_PER_S, config.RATE_IP_BURST, config.RATE_MAX_KEYS, config.RATE_IDLE_S
+)
+shedder = (
+    LoadShedder(config.SHED_MAX_CONCURRENT, config.SHED_QUEUE_WAIT_S)
+    if config.SHED_MAX_CONCURRENT > 0 else None
+)
@@ -0,0 +1,109 @@
+# reports.py
+# Отчёт посещаемости "студент x день" в CSV для кураторов.
+#
+# Семестр по группе или год по всему колледжу — это сотни тысяч отметок.
+# Отчёт не собирается в памяти: строки attendance JOIN students читаются
+# потоком (stream_results + yield_per), группируются по студенту, и каждая
+# готовая строка CSV сразу уходит клиенту. В памяти — одна строка студента
+# и буфер ответа, сколько бы лет ни выгружали.
+#
+# Закрытые месяцы живут в архиве (attendance_archive.py): их отметки
+# подмешиваются к строкам из БД как битовые маски по студенту, так что для
+# отчёта архив и живая таблица — один набор данных.
+import csv
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Iterator, List, Optional
+
+from sqlalchemy import and_, select
+from sqlalchemy.engine import Engine
+
+import config
+from attendance_archive import archived_presence
+from models import Attendance, Student
+
+# сколько байт CSV копим перед отправкой очередного куска ответа
+FLUSH_BYTES = 64 * 1024
+
+
+def day_range(date_from: date, date_to: date) -> List[date]:
+    return [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+
+class _Line:
+    """Псевдо-файл для csv.writer: writerow возвращает готовую строку."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _matrix_select(date_from: date, date_to: date, group: Optional[str]):
+    stmt = (
+        select(Student.id, Student.full_name, Student.group_name, Student.is_active, Attendance.date)
+        .outerjoin(
+            Attendance,
+            and_(
+                Attendance.student_id == Student.id,
+                Attendance.date >= date_from,
+                Attendance.date <= date_to,
+                Attendance.status == 1,
+            ),
+        )
+        .order_by(Student.group_name, Student.full_name, Student.id, Attendance.date)
+    )
+    if group:
+        stmt = stmt.where(Student.group_name == group)
+    return stmt
+
+
+def attendance_matrix_csv(
+    engine: Engine,
+    date_from: date,
+    date_to: date,
+    group: Optional[str] = None,
+    chunk: int = config.REPORT_CHUNK_ROWS,
+    archive_dir: str = config.ATTENDANCE_ARCHIVE_DIR,
+) -> Iterator[str]:
+    """
+    CSV: student_id, ФИО, группа, по колонке на каждый день ("1" — был), итого.
+    Генератор — отдаётся прямо в StreamingResponse.
+    """
+    days = day_range(date_from, date_to)
+    # месяцы периода, которых нет в архиве, даже не открываются
+    archived = archived_presence(archive_dir, date_from, date_to)
+    column = {day: i for i, day in enumerate(days)}
+    writer = csv.writer(_Line())
+
+    # BOM — чтобы Excel открыл кириллицу без мастера импорта
+    buffer = ["\ufeff" + writer.writerow(
+        ["student_id", "full_name", "group", *(d.isoformat() for d in days), "present"]
+    )]
+    size = 0
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk).execute(
+            _matrix_select(date_from, date_to, group)
+        )
+        for _, rows in groupby(result, key=lambda r: r.id):
+            marks = [""] * len(days)
+            for row in rows:
+                if row.date is not None:
+                    marks[column[row.date]] = "1"
+            mask = archived.get(row.id, 0)
+            while mask:
+                low = mask & -mask
+                marks[low.bit_length() - 1] = "1"
+                mask ^= low
+            present = marks.count("1")
+            # отчислённые без отметок за период в отчёт не попадают
+            if not present and not row.is_active:
+                continue
+            line = writer.writerow([row.id, row.full_name, row.group_name or "", *marks, present])
+            buffer.append(line)
+            size += len(line)
+            if size >= FLUSH_BYTES:
+                yield "".join(buffer)
+                buffer, size = [], 0
+
+    if buffer:
+        yield "".join(buffer)
@@ -0,0 +1,328 @@
+# roster_import.py
+# Массовая загрузка студентов из CSV деканата.
+#
+# Каждый сентябрь приходит 3000+ студентов. Файл читается потоком, строка
+# за строкой: проверяем поля, отбрасываем повторы логина внутри файла и
+# тех, кто уже есть в базе (по нормализованному логину, как ищет /login),
+# и пишем пачками по --chunk одним INSERT на пачку — несколько транзакций
+# на весь файл вместо тысяч коммитов через ORM.
+#
+# Пароли пишутся bcrypt-хэшами (passwords.py). Это самая дорогая часть
+# загрузки — 0,1–0,25 с CPU на студента, — поэтому пачка хэшируется в общем
+# пуле паролей (password_pool.hash_bulk), не отнимая его у входов.
+#
+# Из админки загрузка идёт фоновой задачей (RosterImports): запрос только
+# сохраняет файл и отвечает страницей статуса, а список на несколько тысяч
+# студентов считается минуты уже без него. Задачи по одной за раз; статус
+# живёт в памяти процесса, который принял файл.
+#
+# Колонки (заголовок обязателен, порядок любой, разделитель , ; или Tab):
+#   full_name / ФИО, login / Логин, password / Пароль, group_name / Группа
+#
+#   python roster_import.py students.csv
+#   python roster_import.py students.csv --dry-run --report problems.csv
+#
+# В админке то же самое — /admin/students/import.
+import csv
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from group_stats import students_added
+from models import Student, normalize_login
+from passwords import password_pool
+
+DEFAULT_CHUNK = 1000
+# в фоне пачки мельче: хэши сотни паролей — секунды, так чаще видно прогресс
+# и остановка сервера не ждёт минуту до границы пачки
+JOB_CHUNK = 100
+# сколько завершённых задач помнит RosterImports
+KEEP_JOBS = 20
+
+logger = logging.getLogger(__name__)
+
+# заголовок колонки (без регистра) -> поле Student
+COLUMN_ALIASES = {
+    "full_name": "full_name",
+    "фио": "full_name",
+    "login": "login",
+    "логин": "login",
+    "password": "password",
+    "пароль": "password",
+    "group_name": "group_name",
+    "group": "group_name",
+    "группа": "group_name",
+}
+REQUIRED = ("full_name", "login", "password")
+
+
+class RosterFormatError(ValueError):
+    """Файл целиком не подходит (нет заголовка или обязательных колонок)."""
+
+
+class ImportStopped(RuntimeError):
+    """Загрузку прервала остановка сервера; записанные пачки остаются."""
+
+
+@dataclass
+class RowProblem:
+    line: int
+    login: str
+    message: str
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    inserted: int = 0
+    existing: int = 0
+    problems: List[RowProblem] = field(default_factory=list)
+    elapsed_s: float = 0.0
+
+    @property
+    def rejected(self) -> int:
+        return len(self.problems) - self.existing
+
+
+def _read_header(stream: TextIO) -> Tuple[str, Dict[str, int]]:
+    first = stream.readline()
+    if not first.strip():
+        raise RosterFormatError("пустой файл")
+    delimiter = max(",;\t", key=first.count)
+    header = next(csv.reader([first], delimiter=delimiter))
+
+    columns = {}
+    for i, name in enumerate(header):
+        key = COLUMN_ALIASES.get(name.strip().lower())
+        if key and key not in columns:
+            columns[key] = i
+    missing = [name for name in REQUIRED if name not in columns]
+    if missing:
+        raise RosterFormatError("нет колонок: " + ", ".join(missing))
+    return delimiter, columns
+
+
+def _parse_row(row: List[str], columns: Dict[str, int]) -> Tuple[dict, Optional[str]]:
+    def cell(name: str) -> str:
+        i = columns.get(name)
+        return row[i].strip() if i is not None and i < len(row) else ""
+
+    values = {name: cell(name) for name in ("full_name", "login", "password", "group_name")}
+    for name in REQUIRED:
+        if not values[name]:
+            return values, f"пустое поле {name}"
+    values["full_name"] = " ".join(values["full_name"].split())
+    values["group_name"] = values["group_name"] or None
+    return values, None
+
+
+def _flush(engine: Engine, pending: List[Tuple[int, dict]], report: ImportReport, dry_run: bool):
+    if not pending:
+        return
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        keys = [values["login_norm"] for _, values in pending]
+        existing = set(conn.scalars(
+            select(Student.login_norm).where(Student.login_norm.in_(keys))
+        ))
+        fresh = []
+        for line, values in pending:
+            if values["login_norm"] in existing:
+                report.existing += 1
+                report.problems.append(RowProblem(line, values["login"], "уже есть в базе"))
+                continue
+            # Core-вставка мимо ORM: нормализованные поля и created_at — здесь
+            fresh.append({
+                **values,
+                "full_name_norm": normalize_login(values["full_name"]),
+                "is_active": True,
+                "created_at": now,
+            })
+        if fresh and not dry_run:
+            hashed = password_pool.hash_bulk([values["password"] for values in fresh])
+            for values, password in zip(fresh, hashed):
+                values["password"] = password
+            conn.execute(Student.__table__.insert(), fresh)
+            # события маппера на Core-вставку не срабатывают — счётчики дашборда сами
+            students_added(conn, Counter(values["group_name"] for values in fresh))
+        report.inserted += len(fresh)
+
+
+def import_roster(
+    engine: Engine,
+    stream: TextIO,
+    chunk: int = DEFAULT_CHUNK,
+    dry_run: bool = False,
+    report: Optional[ImportReport] = None,
+    stop: Optional[threading.Event] = None,
+) -> ImportReport:
+    """
+    Загрузить студентов из CSV-потока. Строки с ошибками и повторы не
+    прерывают загрузку, а попадают в report.problems.
+    dry_run — всё проверить, но ничего не записывать.
+    report — заполнять этот отчёт (его читает страница статуса);
+    stop — проверяется перед каждой пачкой, ImportStopped.
+    """
+    started = time.perf_counter()
+    report = report if report is not None else ImportReport()
+    delimiter, columns = _read_header(stream)
+
+    try:
+        _import_rows(engine, stream, delimiter, columns, chunk, dry_run, report, stop)
+    finally:
+        report.problems.sort(key=lambda p: p.line)
+        report.elapsed_s = time.perf_counter() - started
+    return report
+
+
+def _import_rows(engine, stream, delimiter, columns, chunk, dry_run, report: ImportReport, stop):
+    seen: Dict[str, int] = {}
+    pending: List[Tuple[int, dict]] = []
+    for line, row in enumerate(csv.reader(stream, delimiter=delimiter), start=2):
+        if not any(c.strip() for c in row):
+            continue
+        report.rows += 1
+        values, error = _parse_row(row, columns)
+        if error:
+            report.problems.append(RowProblem(line, values["login"], error))
+            continue
+
+        key = normalize_login(values["login"])
+        if key in seen:
+            report.problems.append(
+                RowProblem(line, values["login"], f"логин повторяется (строка {seen[key]})")
+            )
+            continue
+        seen[key] = line
+        values["login_norm"] = key
+        pending.append((line, values))
+
+        if len(pending) >= chunk:
+            if stop is not None and stop.is_set():
+                raise ImportStopped()
+            _flush(engine, pending, report, dry_run)
+            pending = []
+
+    _flush(engine, pending, report, dry_run)
+
+
+# ---------- фоновая загрузка из админки ----------
+
+@dataclass
+class ImportJob:
+    id: str
+    filename: str
+    status: str = "queued"  # queued / running / done / failed
+    report: ImportReport = field(default_factory=ImportReport)
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+class RosterImports:
+    """Очередь загрузок списка: один поток, файлы по одному."""
+
+    def __init__(self, keep: int = KEEP_JOBS):
+        self.keep = keep
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="roster-import")
+
+    def submit(self, engine: Engine, path: str, filename: str) -> ImportJob:
+        """Поставить в очередь файл path; после загрузки он удаляется."""
+        job = ImportJob(uuid.uuid4().hex, filename)
+        with self._lock:
+            self._jobs[job.id] = job
+            # забываем самые старые завершённые
+            for old in [j for j in self._jobs.values() if j.finished][:-self.keep or None]:
+                del self._jobs[old.id]
+        self._executor.submit(self._run, job, engine, path)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ImportJob, engine: Engine, path: str):
+        job.status = "running"
+        try:
+            if self._stop.is_set():
+                raise ImportStopped()
+            with open(path, encoding="utf-8-sig", newline="") as stream:
+                import_roster(engine, stream, chunk=JOB_CHUNK, report=job.report, stop=self._stop)
+        except RosterFormatError as exc:
+            job.error = f"Файл не подходит: {exc}"
+        except UnicodeDecodeError:
+            # строки до ошибки могли записаться — при повторной загрузке они
+            # просто окажутся "уже есть в базе"
+            job.error = "Файл не в UTF-8. Сохраните его в Excel как «CSV UTF-8» и загрузите снова."
+        except ImportStopped:
+            job.error = "Загрузку прервал перезапуск сервера. Загрузите файл снова — добавленные не повторятся."
+        except Exception as exc:
+            logger.exception("загрузка списка %s завершилась с ошибкой", job.filename)
+            job.error = f"Ошибка загрузки: {exc}"
+        finally:
+            job.status = "failed" if job.error else "done"
+            os.unlink(path)
+
+    def shutdown(self):
+        """Текущую загрузку остановить на границе пачки, ждущие — сразу."""
+        self._stop.set()
+        self._executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    import argparse
+    import sys
+
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Загрузка студентов из CSV")
+    parser.add_argument("path")
+    parser.add_argument("--encoding", default="utf-8-sig", help="например cp1251 для старого Excel")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--dry-run", action="store_true", help="только проверить файл")
+    parser.add_argument("--report", help="записать проблемные строки в CSV")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.path, encoding=args.encoding, newline="") as stream:
+            report = import_roster(engine, stream, chunk=args.chunk, dry_run=args.dry_run)
+    except RosterFormatError as exc:
+        sys.exit(f"{args.path}: {exc}")
+    finally:
+        password_pool.shutdown()
+
+    verb = "можно добавить" if args.dry_run else "добавлено"
+    print(
+        f"строк {report.rows}: {verb} {report.inserted}, уже были {report.existing}, "
+        f"с ошибками {report.rejected} — за {report.elapsed_s:.2f} с"
+    )
+    if args.report:
+        with open(args.report, "w", encoding="utf-8-sig", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(["line", "login", "problem"])
+            for p in report.problems:
+                writer.writerow([p.line, p.login, p.message])
+    else:
+        for p in report.problems[:50]:
+            print(f"  строка {p.line} ({p.login or '—'}): {p.message}")
+        if len(report.problems) > 50:
+            print(f"  ... ещё {len(report.problems) - 50}, полный список — --report")
+
+
+if __name__ == "__main__":
+    main()
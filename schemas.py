@@ -35,16 +35,19 @@ class UserOut(BaseModel):
 # ---------- Checkin ----------
 
 class CheckinRequest(BaseModel):
-    flow_code: str
-    device_id: str
+    # для /api/checkin устройство берётся из cookie device_uid, а потоков
+    # (flow) пока нет — оба поля необязательны и не проверяются
+    flow_code: Optional[str] = None
+    device_id: Optional[str] = None
     lat: Optional[float] = None
     lon: Optional[float] = None
 
 
 class CheckinResponse(BaseModel):
     ok: bool
-    status: str
+    status: str   # accepted, duplicate, out_of_fence, no_geolocation, ...
     message: str
+    motivation: Optional[str] = None
 
 
 class AttendanceRecord(BaseModel):
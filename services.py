@@ -1,65 +1,21 @@
 # app/services.py
-from datetime import datetime, date, timedelta
-from math import radians, cos, sin, asin, sqrt
+from datetime import date
 
 from sqlalchemy.orm import Session
 
 from . import models
+from .student_stats import read_progress
 
-
-def haversine(lat1, lon1, lat2, lon2):
-    # расстояние между точками в метрах
-    R = 6371000  # Земля, радиус м
-    d_lat = radians(lat2 - lat1)
-    d_lon = radians(lon2 - lon1)
-    a = sin(d_lat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon/2)**2
-    c = 2 * asin(sqrt(a))
-    return R * c
-
-
-def get_or_init_geo_settings(db: Session) -> models.GeoSettings:
-    gs = db.query(models.GeoSettings).first()
-    if not gs:
-        # временно захардкодим центр, потом поправишь на координаты колледжа
-        gs = models.GeoSettings(center_lat=45.0000, center_lon=78.0000, radius_m=300)
-        db.add(gs)
-        db.commit()
-        db.refresh(gs)
-    return gs
+# геозоны и расстояния (бывшие haversine / get_or_init_geo_settings) — geofence.py
 
 
 def build_message_for_student(db: Session, user: models.User, status: str) -> str:
-    today = date.today()
-
-    # последняя отметка до сегодня
-    last = (
-        db.query(models.Checkin)
-        .filter(models.Checkin.user_id == user.id, models.Checkin.checkin_date < today)
-        .order_by(models.Checkin.checkin_date.desc())
-        .first()
-    )
-
-    days_absent = None
-    if last:
-        days_absent = (today - last.checkin_date).days
-
-    # количество пропусков за 30 дней (очень грубо: дни без отметок)
-    since = today - timedelta(days=30)
-    checkins = (
-        db.query(models.Checkin)
-        .filter(models.Checkin.user_id == user.id,
-                models.Checkin.checkin_date >= since)
-        .all()
-    )
-    days_present = len({c.checkin_date for c in checkins})
-
-    # считаем стрик (подряд до вчера)
-    streak = 0
-    d = today - timedelta(days=1)
-    dates_present = {c.checkin_date for c in checkins}
-    while d in dates_present:
-        streak += 1
-        d -= timedelta(days=1)
+    # давность, стрик и посещения за 30 дней — одна строка student_stats,
+    # которую обновляет сама отметка (см. student_stats.py)
+    progress = read_progress(db, user.id, date.today())
+    days_absent = progress.days_absent
+    days_present = progress.present_30d
+    streak = progress.streak
 
     # если подозрительно
     if status == "SUSPICIOUS":
@@ -0,0 +1,78 @@
+// static/js/dashboard.js
+
+// === Живое обновление дашборда (SSE /admin/dashboard/stream) ===
+document.addEventListener("DOMContentLoaded", () => {
+  const dashboard = document.getElementById("dashboard");
+  const totalPresent = document.getElementById("total-present");
+
+  // Не страница дашборда или браузер без EventSource – остаёмся на обычной странице
+  if (!dashboard || !totalPresent || !window.EventSource) {
+    return;
+  }
+
+  const pageDate = dashboard.dataset.date;
+
+  function findRow(groupName) {
+    const rows = document.querySelectorAll("tr[data-group]");
+    for (const row of rows) {
+      if (row.dataset.group === groupName) {
+        return row;
+      }
+    }
+    return null;
+  }
+
+  function setPercent(row, present) {
+    const total = parseInt(row.querySelector(".js-total").textContent, 10) || 0;
+    row.querySelector(".js-percent").textContent =
+      total > 0 ? Math.floor((present * 100) / total) + "%" : "—";
+  }
+
+  function applyDelta(event) {
+    // Отметки за другой день (страница открыта со вчера) – проще перезагрузить
+    if (event.date !== pageDate) {
+      window.location.reload();
+      return;
+    }
+
+    let added = 0;
+    for (const g of event.groups) {
+      const row = findRow(g.group_name);
+      if (!row) {
+        // Новая группа, которой нет в таблице
+        window.location.reload();
+        return;
+      }
+      const cell = row.querySelector(".js-present");
+      const present = (parseInt(cell.textContent, 10) || 0) + g.present;
+      cell.textContent = present.toString();
+      setPercent(row, present);
+      added += g.present;
+    }
+
+    totalPresent.textContent =
+      ((parseInt(totalPresent.textContent, 10) || 0) + added).toString();
+  }
+
+  const source = new EventSource("/admin/dashboard/stream");
+
+  // После обрыва EventSource переподключится сам, но события за это время
+  // потеряны – при повторном открытии перечитываем страницу
+  let opened = false;
+  source.onopen = () => {
+    if (opened) {
+      window.location.reload();
+    }
+    opened = true;
+  };
+
+  source.onmessage = (e) => {
+    const event = JSON.parse(e.data);
+    if (event.type === "delta") {
+      applyDelta(event);
+    } else if (event.type === "reload") {
+      // Мы отстали и часть событий потеряна – берём свежие счётчики целиком
+      window.location.reload();
+    }
+  };
+});
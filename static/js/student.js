@@ -13,7 +13,10 @@ function setLang(code) {
 }
 
 
-// === Геолокация для отметки посещаемости (страница студента) ===
+// === Отметка посещаемости (страница студента) ===
+// Отметка уходит в /api/checkin одним запросом, и страница обновляется на
+// месте – без редиректа и повторной загрузки. Без fetch или при обрыве
+// сети отправляется обычная форма /student/mark.
 document.addEventListener("DOMContentLoaded", () => {
   const form = document.getElementById("mark-form");
   const btn = document.getElementById("mark-btn");
@@ -25,12 +28,97 @@ document.addEventListener("DOMContentLoaded", () => {
     return;
   }
 
-  form.addEventListener("submit", (e) => {
-    // Если координаты уже есть, просто отправляем форму
-    if (latInput.value && lonInput.value) {
+  const originalText = btn.textContent;
+
+  function restoreButton() {
+    btn.disabled = false;
+    btn.textContent = originalText;
+  }
+
+  function showError(message) {
+    let alertBox = form.parentNode.querySelector(".alert-error");
+    if (!alertBox) {
+      alertBox = document.createElement("div");
+      alertBox.className = "alert alert-error animate-pop";
+      form.parentNode.insertBefore(alertBox, form);
+    }
+    alertBox.textContent = message;
+  }
+
+  // Та же разметка, что у уже отметившегося в student_home.html
+  function showMarked(data) {
+    const block = document.createElement("div");
+    block.className = "motivation-block";
+
+    const label = document.createElement("div");
+    label.className = "motivation-label";
+    label.textContent = data.message;
+    block.appendChild(label);
+
+    if (data.motivation) {
+      const text = document.createElement("div");
+      text.className = "motivation-text";
+      text.textContent = data.motivation;
+      block.appendChild(text);
+    }
+
+    const alertBox = form.parentNode.querySelector(".alert-error");
+    if (alertBox) {
+      alertBox.remove();
+    }
+    form.replaceWith(block);
+  }
+
+  function readReply(resp) {
+    const type = resp.headers.get("content-type") || "";
+    if (type.indexOf("application/json") !== -1) {
+      return resp.json();
+    }
+    // 429 / 503 от лимитов (rate_limit.py) приходят простым текстом
+    return resp.text().then((text) => ({ ok: false, status: "http_" + resp.status, message: text }));
+  }
+
+  function sendCheckin() {
+    if (!window.fetch) {
+      form.submit();
       return;
     }
 
+    fetch("/api/checkin", {
+      method: "POST",
+      credentials: "same-origin",
+      headers: { "Content-Type": "application/json", "Accept": "application/json" },
+      body: JSON.stringify({
+        lat: parseFloat(latInput.value),
+        lon: parseFloat(lonInput.value)
+      })
+    })
+      .then(readReply)
+      .then((data) => {
+        if (data.ok) {
+          showMarked(data);
+          return;
+        }
+        if (data.status === "unknown_device") {
+          window.location.href = "/";
+          return;
+        }
+        if (data.status === "not_mobile" || !data.message) {
+          // Непонятный ответ – пусть страницу соберёт сервер
+          form.submit();
+          return;
+        }
+        showError(data.message);
+        restoreButton();
+      })
+      .catch((err) => {
+        // Сеть оборвалась – повтор через обычную форму (вторая отметка за день ничего не запишет)
+        console.error(err);
+        form.submit();
+      });
+  }
+
+  form.addEventListener("submit", (e) => {
     e.preventDefault();
 
     if (!navigator.geolocation) {
@@ -38,7 +126,6 @@ document.addEventListener("DOMContentLoaded", () => {
       return;
     }
 
-    const originalText = btn.textContent;
     btn.disabled = true;
     btn.textContent = "Получение геолокации...";
 
@@ -46,13 +133,12 @@ document.addEventListener("DOMContentLoaded", () => {
       (pos) => {
         latInput.value = pos.coords.latitude.toString();
         lonInput.value = pos.coords.longitude.toString();
-        form.submit();
+        sendCheckin();
       },
       (err) => {
         console.error(err);
         alert("Не удалось получить геолокацию. Разрешите доступ и попробуйте ещё раз.");
-        btn.disabled = false;
-        btn.textContent = originalText;
+        restoreButton();
       },
       {
         enableHighAccuracy: true,
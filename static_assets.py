@@ -0,0 +1,224 @@
+# static_assets.py
+# Статика с отпечатком содержимого и заранее сжатыми копиями.
+#
+# styles.css и student.js раньше отдавались как есть, без сжатия и без
+# долгого кэша, и каждый телефон в Wi-Fi колледжа каждое утро заново их
+# перепроверял. Шаг сборки пишет в STATIC_BUILD_DIR копии с хэшем в имени
+# (css/styles.3f2a9c1b04de.css) и рядом .gz / .br, плюс manifest.json.
+# Шаблоны берут адрес через {{ static_url("css/styles.css") }}; пока сборки
+# нет, это просто /static/css/styles.css, как раньше.
+#
+# Файлы с хэшем никогда не меняются, поэтому отдаются с
+# "Cache-Control: immutable" на год — браузер их больше не спрашивает,
+# а новая версия получит новое имя. Вариант .br / .gz выбирается по
+# Accept-Encoding. Из сборки отдаётся любой файл с хэшем в имени, а не только
+# из текущего манифеста: страница, закэшированная до деплоя, ещё просит
+# прошлую версию.
+#
+#   python static_assets.py          — собрать (старые версии остаются
+#                                      для страниц, закэшированных до деплоя)
+#   python static_assets.py --clean  — собрать с нуля
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import stat
+from typing import Dict, Optional
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # без brotli собираем только .gz
+    brotli = None
+
+MANIFEST = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# что имеет смысл сжимать; картинки и шрифты уже сжаты
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".html", ".txt", ".map"}
+# (кодировка, расширение) в порядке предпочтения
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# имя, которое даёт _hashed_name: styles.3f2a9c1b04de.css
+HASHED_NAME = re.compile(r"[^/]+\.[0-9a-f]{12}\.[^./]+")
+
+
+def _hashed_name(rel_path: str, digest: str) -> str:
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:12]}{ext}"
+
+
+def _write_compressed(path: str, data: bytes):
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    for suffix, packed in variants.items():
+        # сжатая копия, которая не меньше оригинала, только мешает
+        if len(packed) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(packed)
+
+
+def build(source_dir: str, build_dir: str, clean: bool = False) -> Dict[str, str]:
+    """Собрать статику. Возвращает манифест {исходный путь: путь с хэшем}."""
+    if clean and os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+
+    manifest = {}
+    for root, _, files in os.walk(source_dir):
+        for name in sorted(files):
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, source_dir).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+            hashed = _hashed_name(rel, hashlib.sha256(data).hexdigest())
+            dst = os.path.join(build_dir, *hashed.split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if not os.path.exists(dst):
+                with open(dst, "wb") as f:
+                    f.write(data)
+                if os.path.splitext(rel)[1].lower() in COMPRESSIBLE:
+                    _write_compressed(dst, data)
+            manifest[rel] = hashed
+
+    # манифест пишем последним и атомарно — воркеры не увидят половину
+    tmp = os.path.join(build_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(build_dir, MANIFEST))
+    return manifest
+
+
+def load_manifest(build_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(build_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _is_hashed(rel: str) -> bool:
+    parts = rel.split("/")
+    return ".." not in parts and HASHED_NAME.fullmatch(parts[-1]) is not None
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() != coding:
+            continue
+        # "br;q=0" — клиент явно отказывается
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, который файлы с хэшем в имени отдаёт из сборки (и текущие,
+    и прошлых сборок): сжатый вариант по Accept-Encoding и кэш на год.
+    Остальное — как обычный StaticFiles.
+    """
+
+    def __init__(self, directory: str, build_dir: str):
+        super().__init__(directory=directory)
+        self.build_dir = build_dir
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        rel = path.replace(os.sep, "/")
+        response = None
+        if _is_hashed(rel) and scope["method"] in ("GET", "HEAD"):
+            response = await anyio.to_thread.run_sync(self._hashed_response, rel, scope)
+        if response is None:
+            return await super().get_response(path, scope)
+        return response
+
+    def _hashed_response(self, rel: str, scope: Scope) -> Optional[Response]:
+        """None — такого файла в сборке нет."""
+        request_headers = Headers(scope=scope)
+        accept = request_headers.get("accept-encoding", "")
+        full_path = os.path.join(self.build_dir, *rel.split("/"))
+
+        encoding: Optional[str] = None
+        stat_result = None
+        for coding, suffix in ENCODINGS:
+            if _accepts(accept, coding):
+                try:
+                    stat_result = os.stat(full_path + suffix)
+                except FileNotFoundError:
+                    continue
+                encoding, full_path = coding, full_path + suffix
+                break
+        if stat_result is None:
+            try:
+                stat_result = os.stat(full_path)
+            except (FileNotFoundError, NotADirectoryError):
+                return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        media_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        response = FileResponse(full_path, stat_result=stat_result, media_type=media_type, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class StaticAssets:
+    """Манифест сборки + адреса для шаблонов + обработчик /static."""
+
+    def __init__(self, source_dir: str, build_dir: str, prefix: str = "/static"):
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self.prefix = prefix
+        self.manifest = load_manifest(build_dir)
+
+    def url(self, path: str) -> str:
+        """Адрес файла для шаблона: с хэшем, если он собран, иначе исходный."""
+        return f"{self.prefix}/{self.manifest.get(path, path)}"
+
+    def files(self) -> StaticFiles:
+        return PrecompressedStaticFiles(self.source_dir, self.build_dir)
+
+
+def main(argv=None):
+    import argparse
+
+    import config
+
+    parser = argparse.ArgumentParser(description="Сборка статики с хэшами и сжатием")
+    parser.add_argument("--source", default="static")
+    parser.add_argument("--out", default=config.STATIC_BUILD_DIR)
+    parser.add_argument("--clean", action="store_true", help="удалить прошлые сборки")
+    args = parser.parse_args(argv)
+
+    manifest = build(args.source, args.out, clean=args.clean)
+    for rel, hashed in sorted(manifest.items()):
+        sizes = []
+        full = os.path.join(args.out, *hashed.split("/"))
+        for suffix in ("", ".gz", ".br"):
+            if os.path.exists(full + suffix):
+                sizes.append(f"{suffix or 'raw'} {os.path.getsize(full + suffix)}")
+        print(f"{rel} -> {hashed}  ({', '.join(sizes)})")
+    if brotli is None:
+        print("brotli не установлен — собраны только .gz (pip install brotli)")
+
+
+if __name__ == "__main__":
+    main()
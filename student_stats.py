@@ -0,0 +1,199 @@
+# student_stats.py
+# Серия посещений и "давно не был" для мотивационных сообщений.
+#
+# Раньше сообщение на каждую отметку строилось двумя запросами (последняя
+# отметка до сегодня и все отметки за 30 дней) и проходом по датам назад.
+# Теперь у каждого студента одна строка student_stats: последний день,
+# текущая серия дней подряд и маска последних дней (бит i — был ли
+# студент в день last_seen - i). Отметка обновляет её за O(1) в той же
+# транзакции, где пишется Attendance. Сообщение выбирается там же, по уже
+# прочитанной для обновления строке (load_states), — отдельного запроса
+# на отметку нет.
+#
+# Если отметки правили мимо CheckinWriter (ручной SQL, импорт), сводку
+# пересчитывает:
+#
+#   python student_stats.py --rebuild
+from dataclasses import dataclass
+from datetime import date
+from itertools import groupby
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+
+from database import dialect_insert
+from models import Attendance, StudentStat
+
+WINDOW_DAYS = 30
+# last_seen и ещё WINDOW_DAYS дней до него
+_MASK_BITS = WINDOW_DAYS + 1
+_WINDOW_MASK = (1 << _MASK_BITS) - 1
+
+_table = StudentStat.__table__
+
+
+@dataclass(frozen=True)
+class Progress:
+    """Что известно о студенте на момент отметки (без сегодняшнего дня)."""
+    days_absent: Optional[int]  # дней с последнего визита; None — раньше не был
+    streak: int                 # дней подряд до вчера включительно
+    present_30d: int            # дней с отметкой за последние 30 дней
+
+
+NO_PROGRESS = Progress(days_absent=None, streak=0, present_30d=0)
+
+
+def apply_checkin(state: Optional[dict], day: date) -> dict:
+    """Новое состояние после отметки за day. O(1), без обращения к БД."""
+    if not state or state["last_seen"] is None:
+        return {"last_seen": day, "streak": 1, "recent_mask": 1}
+
+    last_seen = state["last_seen"]
+    gap = (day - last_seen).days
+    if gap <= 0:
+        # отметка задним числом: обновляем только маску, серию поправит --rebuild
+        mask = state["recent_mask"]
+        if -gap < _MASK_BITS:
+            mask |= 1 << -gap
+        return {"last_seen": last_seen, "streak": state["streak"], "recent_mask": mask}
+
+    mask = (state["recent_mask"] << gap | 1) & _WINDOW_MASK if gap < _MASK_BITS else 1
+    streak = state["streak"] + 1 if gap == 1 else 1
+    return {"last_seen": day, "streak": streak, "recent_mask": mask}
+
+
+def progress(state: Optional[dict], today: date) -> Progress:
+    if not state or state["last_seen"] is None:
+        return NO_PROGRESS
+
+    gap = (today - state["last_seen"]).days
+    mask = state["recent_mask"]
+    if gap <= 0:
+        # сегодня уже отмечался — смотрим на дни до сегодняшнего; прошлый
+        # визит виден только в окне, раньше него days_absent = None
+        mask >>= 1 - gap
+        streak = state["streak"] - 1 if gap == 0 else 0
+        prev = (mask & -mask).bit_length()  # ближайший прошлый визит в окне
+        return Progress(
+            days_absent=prev or None,
+            streak=streak,
+            present_30d=bin(mask).count("1"),
+        )
+
+    # в окно [today - 30, today) попадают биты 0 .. WINDOW_DAYS - gap
+    visible = mask & ((1 << max(_MASK_BITS - gap, 0)) - 1)
+    return Progress(
+        days_absent=gap,
+        streak=state["streak"] if gap == 1 else 0,
+        present_30d=bin(visible).count("1"),
+    )
+
+
+def _state(stat) -> dict:
+    return {"last_seen": stat.last_seen, "streak": stat.streak, "recent_mask": stat.recent_mask}
+
+
+def read_progress(db, student_id: int, today: date) -> Progress:
+    """Один запрос по первичному ключу."""
+    stat = db.get(StudentStat, student_id)
+    return progress(_state(stat) if stat is not None else None, today)
+
+
+def _dialect_name(conn) -> str:
+    dialect = getattr(conn, "dialect", None) or conn.get_bind().dialect
+    return dialect.name
+
+
+def _upsert(conn, states: Dict[int, dict]):
+    if not states:
+        return
+    stmt = dialect_insert(_dialect_name(conn), _table)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[_table.c.student_id],
+            set_={
+                "last_seen": stmt.excluded.last_seen,
+                "streak": stmt.excluded.streak,
+                "recent_mask": stmt.excluded.recent_mask,
+            },
+        ),
+        [{"student_id": student_id, **state} for student_id, state in states.items()],
+    )
+
+
+# -------------------------------------------------
+# ОБНОВЛЕНИЕ
+# -------------------------------------------------
+
+def load_states(db, ids) -> Dict[int, dict]:
+    """Сводки студентов пачки (под блокировку до конца транзакции)."""
+    return {
+        s.student_id: _state(s)
+        for s in db.execute(
+            select(_table).where(_table.c.student_id.in_(set(ids))).with_for_update()
+        )
+    }
+
+
+def record_checkins(db, rows: list, states: Optional[Dict[int, dict]] = None):
+    """
+    Хук CheckinWriter: обновить сводку студентов только что добавленных
+    отметок. states — уже прочитанные в этой транзакции load_states.
+    """
+    rows = sorted(
+        (r for r in rows if r.get("status", 1) == 1),
+        key=lambda r: (r["student_id"], r["date"]),
+    )
+    if not rows:
+        return
+
+    ids = {r["student_id"] for r in rows}
+    if states is None:
+        states = load_states(db, ids)
+    for row in rows:
+        states[row["student_id"]] = apply_checkin(states.get(row["student_id"]), row["date"])
+    _upsert(db, {student_id: states[student_id] for student_id in ids})
+
+
+def rebuild(conn, chunk: int = 1000) -> int:
+    """Пересчитать сводку всех студентов по attendance. Возвращает число студентов."""
+    conn.execute(delete(_table))
+    result = conn.execute(
+        select(Attendance.student_id, Attendance.date)
+        .where(Attendance.status == 1)
+        .order_by(Attendance.student_id, Attendance.date)
+    )
+    total = 0
+    batch = {}
+    for student_id, visits in groupby(result, key=lambda r: r.student_id):
+        state = None
+        for visit in visits:
+            state = apply_checkin(state, visit.date)
+        batch[student_id] = state
+        if len(batch) >= chunk:
+            _upsert(conn, batch)
+            total += len(batch)
+            batch = {}
+    _upsert(conn, batch)
+    return total + len(batch)
+
+
+def main(argv=None):
+    import argparse
+
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Сводка посещений студентов")
+    parser.add_argument("--rebuild", action="store_true", help="пересчитать по attendance")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    with engine.begin() as conn:
+        total = rebuild(conn)
+    print(f"пересчитано студентов: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# tests/conftest.py
+# Общие фикстуры: у каждого теста своя пустая база SQLite во временной папке.
+#
+#   python -m pytest -q
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# до импорта модулей приложения: глобальный движок database.py не должен
+# смотреть в рабочую attendance.db, а пул паролей — поднимать процессы
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"))
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+os.environ.setdefault("ADMIN_SESSION_SECRET", "test-secret")
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401  (таблицы в Base.metadata)
+from database import Base, make_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'attendance.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def add_student(db):
+    """Студент в базе: add_student("Иванов", "П-21") -> id."""
+    def add(full_name: str, group_name: str = "П-21", is_active: bool = True) -> int:
+        student = models.Student(
+            full_name=full_name, login=full_name, password="x",
+            group_name=group_name, is_active=is_active,
+        )
+        db.add(student)
+        db.commit()
+        return student.id
+    return add
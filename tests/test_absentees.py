@@ -0,0 +1,111 @@
+# tests/test_absentees.py
+# Список отсутствующих по ключу (absentees.py): порядок, границы страниц, устойчивость, курсор.
+from datetime import date
+
+import pytest
+
+from absentees import BadCursor, GroupCount, absent_page, decode_cursor, encode_cursor, group_count
+from models import Attendance, StudentStat
+
+DAY = date(2024, 9, 2)
+
+
+def mark(db, student_id: int, day: date = DAY, status: int = 1):
+    db.add(Attendance(student_id=student_id, date=day, status=status))
+    db.commit()
+
+
+def all_pages(db, group: str, page_size: int) -> list:
+    pages, cursor = [], None
+    while True:
+        page = absent_page(db, group, DAY, cursor, page_size)
+        pages.append([s.full_name for s in page.students])
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def group(db, add_student):
+    """П-21: 7 студентов (двое тёзок), двое пришли, один отчислен; рядом другая группа."""
+    ids = {name: add_student(name, "П-21") for name in ["Борисов", "Ахметов", "Ященко", "Жуков", "Ким"]}
+    ids["Ахметов 2"] = add_student("Ахметов", "П-21")
+    ids["Ли"] = add_student("Ли", "П-21")
+    add_student("Отчисленный", "П-21", is_active=False)
+    add_student("Чужой", "ИС-22")
+    mark(db, ids["Жуков"])
+    mark(db, ids["Ли"])
+    mark(db, ids["Ким"], date(2024, 9, 1))  # вчера не считается
+    mark(db, ids["Ященко"], status=0)       # не "пришёл"
+    return ids
+
+
+def test_pages_cover_every_absentee_once(db, group):
+    assert all_pages(db, "П-21", page_size=2) == [
+        ["Ахметов", "Ахметов"], ["Борисов", "Ким"], ["Ященко"],
+    ]
+    assert all_pages(db, "П-21", page_size=5) == [["Ахметов", "Ахметов", "Борисов", "Ким", "Ященко"]]
+
+
+def test_same_name_ordered_by_id(db, group):
+    page = absent_page(db, "П-21", DAY, None, 1)
+    assert [s.id for s in page.students] == [group["Ахметов"]]
+
+    page = absent_page(db, "П-21", DAY, page.next_cursor, 1)
+    assert [s.id for s in page.students] == [group["Ахметов 2"]]
+
+
+def test_exact_last_page_has_no_cursor(db, group):
+    page = absent_page(db, "П-21", DAY, None, 5)
+
+    assert len(page.students) == 5
+    assert page.next_cursor is None
+
+
+def test_checkin_between_pages_shifts_nothing(db, group):
+    first = absent_page(db, "П-21", DAY, None, 2)
+
+    # пока куратор смотрит первую страницу, двое отмечаются
+    mark(db, group["Ахметов"])
+    mark(db, group["Ким"])
+
+    second = absent_page(db, "П-21", DAY, first.next_cursor, 2)
+    assert [s.full_name for s in second.students] == ["Борисов", "Ященко"]
+    assert second.next_cursor is None
+
+
+def test_last_seen_from_student_stats(db, group):
+    db.add(StudentStat(student_id=group["Борисов"], last_seen=date(2024, 8, 30), streak=1, recent_mask=1))
+    db.commit()
+
+    seen = {s.id: s.last_seen for s in absent_page(db, "П-21", DAY, None, 10).students}
+
+    assert seen[group["Борисов"]] == date(2024, 8, 30)
+    assert seen[group["Ким"]] is None
+
+
+def test_unknown_group_is_empty(db, group):
+    page = absent_page(db, "Нет такой", DAY, None, 10)
+
+    assert (page.students, page.next_cursor) == ([], None)
+    assert group_count(db, "Нет такой", DAY) == GroupCount(0, 0)
+
+
+def test_group_count_matches_the_list(db, group):
+    count = group_count(db, "П-21", DAY)
+
+    assert count == GroupCount(total=7, present=2)
+    assert count.total - count.present == sum(len(p) for p in all_pages(db, "П-21", 3))
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("Әлихан Өмірзақ", 42)
+
+    assert cursor.isascii() and "=" not in cursor
+    assert decode_cursor(cursor) == ("Әлихан Өмірзақ", 42)
+
+
+@pytest.mark.parametrize("cursor", ["%%%", "bm90IGpzb24", encode_cursor("x", 1)[:-3], "WzEsMiwzXQ", "WyJ4IiwieSJd"])
+def test_bad_cursor(cursor):
+    with pytest.raises(BadCursor):
+        decode_cursor(cursor)
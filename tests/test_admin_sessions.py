@@ -0,0 +1,130 @@
+# tests/test_admin_sessions.py
+# Подписанные сессии админки (admin_sessions.py): подпись, срок, подделки, отзыв между воркерами.
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import admin_sessions
+import config
+from admin_sessions import AdminSessions, _b64
+from models import Admin, RevokedAdminToken
+
+SECRET = b"0123456789abcdef" * 4
+
+
+@pytest.fixture
+def admin():
+    return Admin(id=7, username="curator")
+
+
+def sessions(ttl_s: int = 3600, reload_s: float = 60, secret: bytes = SECRET) -> AdminSessions:
+    return AdminSessions(ttl_s, reload_s, secret)
+
+
+def test_issue_and_decode(admin):
+    signer = sessions(ttl_s=600)
+
+    session = signer.decode(signer.issue(admin))
+
+    assert (session.admin_id, session.username) == (7, "curator")
+    assert session.expires_at == pytest.approx(time.time() + 600, abs=5)
+
+
+def test_each_login_is_a_separate_session(admin):
+    signer = sessions()
+
+    first, second = signer.decode(signer.issue(admin)), signer.decode(signer.issue(admin))
+
+    assert first.jti != second.jti
+
+
+def test_expired_token(admin):
+    assert sessions(ttl_s=-1).decode(sessions(ttl_s=-1).issue(admin)) is None
+
+
+def test_other_secret(admin):
+    assert sessions(secret=b"other").decode(sessions().issue(admin)) is None
+
+
+def test_tampered_payload(admin):
+    signer = sessions()
+    header, body, signature = signer.issue(admin).split(".")
+    payload = json.loads(admin_sessions._unb64(body))
+    payload["sub"] = 1
+
+    forged = ".".join([header, _b64(json.dumps(payload).encode()), signature])
+
+    assert signer.decode(forged) is None
+
+
+def test_alg_none_is_rejected(admin):
+    signer = sessions()
+    _, body, _ = signer.issue(admin).split(".")
+    header = _b64(b'{"alg":"none","typ":"JWT"}')
+
+    assert signer.decode(f"{header}.{body}.") is None
+
+
+@pytest.mark.parametrize("token", [
+    "", "garbage", "a.b", "a.b.c.d",
+    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.тело.подпись",
+    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.e30.%%%",
+])
+def test_garbage_tokens(token):
+    assert sessions().decode(token) is None
+
+
+def test_valid_signature_bad_payload():
+    signer = sessions()
+    signing_input = f"{admin_sessions._HEADER}.{_b64(b'[1, 2]')}"
+
+    assert signer.decode(f"{signing_input}.{signer._sign(signing_input)}") is None
+
+
+def test_verify_does_not_hit_the_db_between_reloads(admin, db):
+    signer = sessions(reload_s=3600)
+    token = signer.issue(admin)
+    assert signer.verify(token, db) is not None  # первое чтение списка отзыва
+
+    db.close()
+    # БД больше не нужна: подпись и срок проверяются в памяти
+    assert signer.verify(token, None).admin_id == 7
+    assert signer.verify(None, None) is None
+
+
+def test_logout_revokes_in_every_worker(admin, db):
+    worker_a, worker_b = sessions(reload_s=0), sessions(reload_s=0)
+    token = worker_a.issue(admin)
+    session = worker_b.verify(token, db)
+    assert session is not None
+
+    worker_a.revoke(worker_a.decode(token), db)
+
+    assert worker_a.verify(token, db) is None
+    assert worker_b.verify(token, db) is None  # перечитал список из БД
+    assert worker_b.verify(worker_a.issue(admin), db) is not None
+
+
+def test_revoke_purges_expired_rows(admin, db):
+    signer = sessions()
+    db.add(RevokedAdminToken(jti="old", expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+
+    session = signer.decode(signer.issue(admin))
+    signer.revoke(session, db)
+
+    assert db.scalars(select(RevokedAdminToken.jti)).all() == [session.jti]
+
+
+def test_secret_file_is_shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_SESSION_SECRET", "")
+    monkeypatch.setattr(config, "ADMIN_SESSION_SECRET_FILE", str(tmp_path / "secret"))
+
+    first = admin_sessions.load_secret()
+
+    assert len(first) == 64
+    assert admin_sessions.load_secret() == first
+    assert list(tmp_path.iterdir()) == [tmp_path / "secret"]
@@ -0,0 +1,153 @@
+# tests/test_checkin_writer.py
+# Групповой коммит (checkin_writer.py): пачки, ответы после коммита, откат к записи по одной.
+import threading
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from checkin_writer import CheckinWriter
+from models import Attendance
+
+DAY = date(2024, 9, 2)
+
+
+def checkin(student_id: int, day: date = DAY) -> dict:
+    return {"student_id": student_id, "date": day, "status": 1}
+
+
+def count_rows(db) -> int:
+    return db.scalar(select(func.count(Attendance.id)))
+
+
+@pytest.fixture
+def batches():
+    return []
+
+
+@pytest.fixture
+def writer(session_factory, batches):
+    # окно большое, чтобы все submit теста гарантированно попали в одну пачку
+    writer = CheckinWriter(
+        session_factory, window_ms=300, max_batch=100,
+        on_inserted=lambda db, rows: batches.append(list(rows)),
+    )
+    yield writer
+    writer.stop(timeout=5)
+
+
+def test_one_transaction_per_window(writer, batches, db, add_student):
+    ids = [add_student(f"Студент {i}") for i in range(10)]
+
+    futures = [writer.submit(checkin(student_id)) for student_id in ids]
+
+    assert [f.result(timeout=5) for f in futures] == [True] * 10
+    assert len(batches) == 1
+    assert sorted(r["student_id"] for r in batches[0]) == ids
+    assert count_rows(db) == 10
+
+
+def test_max_batch_splits_the_queue(session_factory, db, add_student):
+    sizes = []
+    writer = CheckinWriter(
+        session_factory, window_ms=300, max_batch=3,
+        on_inserted=lambda db, rows: sizes.append(len(rows)),
+    )
+    try:
+        futures = [writer.submit(checkin(add_student(f"Студент {i}"))) for i in range(7)]
+        assert all(f.result(timeout=5) for f in futures)
+    finally:
+        writer.stop(timeout=5)
+
+    assert max(sizes) <= 3
+    assert sum(sizes) == 7
+    assert count_rows(db) == 7
+
+
+def test_result_only_after_commit(writer, session_factory, add_student):
+    student_id = add_student("Иванов")
+
+    assert writer.write(checkin(student_id), timeout=5) is True
+
+    # ответ получен — значит, отметку уже видит любое другое соединение
+    other = session_factory()
+    try:
+        assert count_rows(other) == 1
+    finally:
+        other.close()
+
+
+def test_bad_row_does_not_fail_the_batch(writer, batches, db, add_student):
+    good = [add_student("Иванов"), add_student("Петров")]
+
+    futures = [
+        writer.submit(checkin(good[0])),
+        writer.submit({"student_id": None, "date": DAY, "status": 1}),  # NOT NULL
+        writer.submit(checkin(good[1])),
+    ]
+
+    assert futures[0].result(timeout=5) is True
+    assert futures[2].result(timeout=5) is True
+    with pytest.raises(Exception):
+        futures[1].result(timeout=5)
+    # пачка откатилась целиком, затем каждая запись — своей транзакцией
+    assert [[r["student_id"] for r in batch] for batch in batches] == [[good[0]], [good[1]]]
+    assert count_rows(db) == 2
+
+
+def test_on_committed_gets_hook_result(session_factory, add_student):
+    committed = []
+    done = threading.Event()
+
+    def on_committed(result):
+        committed.append(result)
+        done.set()
+
+    writer = CheckinWriter(
+        session_factory, window_ms=0,
+        on_inserted=lambda db, rows: len(rows),
+        on_committed=on_committed,
+    )
+
+    assert writer.write(checkin(add_student("Иванов"))) is True
+    assert done.wait(5)
+    assert committed == [1]
+
+
+def test_on_committed_error_keeps_the_write(session_factory, db, add_student):
+    def on_committed(result):
+        raise RuntimeError("дашборд недоступен")
+
+    writer = CheckinWriter(session_factory, window_ms=0, on_committed=on_committed, on_inserted=lambda db, rows: None)
+
+    assert writer.write(checkin(add_student("Иванов"))) is True
+    assert count_rows(db) == 1
+
+
+def test_prepare_result_goes_to_on_inserted(session_factory, add_student):
+    seen = []
+
+    def prepare(db, values_list):
+        for values in values_list:
+            values["motivation_id"] = 7
+        return {"prepared": len(values_list)}
+
+    writer = CheckinWriter(
+        session_factory, window_ms=0, prepare=prepare,
+        on_inserted=lambda db, rows, prepared: seen.append((rows, prepared)),
+    )
+
+    assert writer.write(checkin(add_student("Иванов"))) is True
+    (rows, prepared), = seen
+    assert prepared == {"prepared": 1}
+    assert rows[0]["motivation_id"] == 7
+
+
+def test_stop_flushes_the_queue(session_factory, db, add_student):
+    writer = CheckinWriter(session_factory, window_ms=1000)
+    futures = [writer.submit(checkin(add_student(f"Студент {i}"))) for i in range(3)]
+
+    writer.stop(timeout=5)
+
+    assert all(f.done() and f.result() for f in futures)
+    assert count_rows(db) == 3
@@ -0,0 +1,145 @@
+# tests/test_geofence.py
+# Геозоны (geofence.py): круги и многоугольники, индекс по сетке против полного перебора, загрузка из БД.
+import json
+import math
+import random
+
+import pytest
+
+from geofence import (
+    EARTH_RADIUS_M, M_PER_DEG, Geofence, GeofenceIndex, circle_zone, geofence, haversine_distance_m, load_zones, polygon_zone,
+)
+from models import Campus, GeoZone
+
+LAT, LON = 43.2567, 76.9286  # Алматы
+
+
+def destination(lat: float, lon: float, bearing_deg: float, meters: float):
+    """Точка в meters от (lat, lon) по азимуту bearing_deg (на сфере haversine)."""
+    phi, lam, theta = math.radians(lat), math.radians(lon), math.radians(bearing_deg)
+    delta = meters / EARTH_RADIUS_M
+    phi2 = math.asin(math.sin(phi) * math.cos(delta) + math.cos(phi) * math.sin(delta) * math.cos(theta))
+    lam2 = lam + math.atan2(
+        math.sin(theta) * math.sin(delta) * math.cos(phi),
+        math.cos(delta) - math.sin(phi) * math.sin(phi2),
+    )
+    return math.degrees(phi2), math.degrees(lam2)
+
+
+def test_circle_contains_by_distance():
+    zone = circle_zone(1, "Главный", "Двор", LAT, LON, 300)
+
+    assert zone.contains(LAT, LON)
+    assert zone.contains(*destination(LAT, LON, 90, 299))
+    assert not zone.contains(*destination(LAT, LON, 90, 301))
+    assert not zone.contains(LAT + 301 / M_PER_DEG, LON)
+
+
+@pytest.mark.parametrize("lat", [0.0, 43.25, 69.0, 80.0, -75.0])
+def test_circle_bbox_covers_the_whole_circle(lat):
+    # по cos центра крайняя долгота круга занижена — BBOX_PAD этого не допускает
+    radius = 20000
+    zone = circle_zone(1, "Северный", "Двор", lat, 10.0, radius)
+
+    for tenth in range(3600):
+        assert zone.contains(*destination(lat, 10.0, tenth / 10, radius * 0.99999)), tenth / 10
+
+
+def test_concave_polygon():
+    # "П": нижняя перекладина пустая
+    points = [(0, 0), (0, 3), (3, 3), (3, 2), (1, 2), (1, 1), (3, 1), (3, 0)]
+    zone = polygon_zone(1, "Корпус Б", "Здание", [(LAT + a / 1000, LON + b / 1000) for a, b in points])
+
+    assert zone.contains(LAT + 0.0005, LON + 0.0015)
+    assert zone.contains(LAT + 0.0025, LON + 0.0025)
+    assert not zone.contains(LAT + 0.0015, LON + 0.0015)  # внутри выемки
+    assert not zone.contains(LAT + 0.0040, LON + 0.0010)
+
+
+def test_polygon_needs_three_points():
+    with pytest.raises(ValueError):
+        polygon_zone(1, "Корпус Б", "Здание", [(LAT, LON), (LAT + 0.001, LON)])
+
+
+def test_index_matches_linear_scan():
+    rnd = random.Random(10)
+    zones = []
+    for i in range(60):
+        lat, lon = LAT + rnd.uniform(-0.1, 0.1), LON + rnd.uniform(-0.1, 0.1)
+        if i % 2:
+            zones.append(circle_zone(i, "Кампус", f"Круг {i}", lat, lon, rnd.uniform(50, 3000)))
+        else:
+            d = rnd.uniform(0.001, 0.03)
+            zones.append(polygon_zone(i, "Кампус", f"Здание {i}", [(lat, lon), (lat + d, lon), (lat + d, lon + d), (lat, lon + d * 2)]))
+    index = GeofenceIndex(zones, cell_deg=0.01)
+
+    hits = 0
+    for _ in range(5000):
+        lat, lon = LAT + rnd.uniform(-0.13, 0.13), LON + rnd.uniform(-0.13, 0.13)
+        expected = {z.id for z in zones if z.contains(lat, lon)}
+        candidates = {z.id for z in index.candidates(lat, lon)}
+        assert expected <= candidates
+        zone = index.locate(lat, lon)
+        assert (zone.id if zone else None) in (expected or {None})
+        hits += bool(expected)
+    assert hits > 100  # проверка не вырожденная
+
+
+def test_index_cells_are_local():
+    near = circle_zone(1, "Главный", "Двор", LAT, LON, 200)
+    far = circle_zone(2, "Дальний", "Двор", LAT + 1, LON + 1, 200)
+    index = GeofenceIndex([near, far], cell_deg=0.01)
+
+    assert index.candidates(LAT, LON) == [near]
+    assert index.candidates(LAT + 0.5, LON + 0.5) == []
+    assert index.locate(LAT + 1, LON + 1) is far
+
+
+def add_zone(db, campus: Campus, **fields) -> GeoZone:
+    zone = GeoZone(campus=campus, **fields)
+    db.add(zone)
+    db.commit()
+    return zone
+
+
+def test_load_zones_skips_inactive_and_broken(db):
+    main, closed = Campus(name="Главный"), Campus(name="Закрытый", is_active=False)
+    db.add_all([main, closed])
+    add_zone(db, main, name="Двор", kind="circle", center_lat=LAT, center_lon=LON, radius_m=300)
+    add_zone(db, main, name="Здание", kind="polygon", points=json.dumps([[LAT, LON], [LAT + 0.001, LON], [LAT, LON + 0.001]]))
+    add_zone(db, main, name="Кривая", kind="polygon", points="[[1, 2]]")
+    add_zone(db, main, name="Старая", kind="circle", center_lat=LAT, center_lon=LON, radius_m=300, is_active=False)
+    add_zone(db, closed, name="Двор", kind="circle", center_lat=LAT, center_lon=LON, radius_m=300)
+
+    zones = load_zones(db)
+
+    assert [(z.campus, z.name, z.kind) for z in zones] == [("Главный", "Двор", "circle"), ("Главный", "Здание", "polygon")]
+
+
+def test_orm_changes_reset_the_index(db):
+    fence = geofence  # события маппера сбрасывают именно его
+    fence.invalidate()
+    campus = Campus(name="Главный")
+    zone = add_zone(db, campus, name="Двор", kind="circle", center_lat=LAT, center_lon=LON, radius_m=300)
+    far = (LAT + 0.05, LON)
+
+    assert fence.locate(db, LAT, LON).name == "Двор"
+    assert fence.locate(db, *far) is None
+
+    # правка через ORM сбрасывает индекс сразу, без ожидания reload_s
+    zone.center_lat = far[0]
+    db.commit()
+    assert fence.locate(db, *far).name == "Двор"
+    assert fence.locate(db, LAT, LON) is None
+
+
+def test_geofence_reloads_on_fingerprint(db):
+    fence = Geofence(cell_deg=0.01, reload_s=0)
+    campus = Campus(name="Главный")
+    add_zone(db, campus, name="Двор", kind="circle", center_lat=LAT, center_lon=LON, radius_m=300)
+    first = fence.index(db)
+
+    assert fence.index(db) is first  # ничего не менялось — тот же индекс
+
+    add_zone(db, campus, name="Стадион", kind="circle", center_lat=LAT + 0.05, center_lon=LON, radius_m=300)
+    assert fence.locate(db, LAT + 0.05, LON).name == "Стадион"
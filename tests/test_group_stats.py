@@ -0,0 +1,126 @@
+# tests/test_group_stats.py
+# Счётчики дашборда (group_stats.py): первая отметка дня, приращения, состав групп, сверка.
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+
+import group_stats
+from checkin_writer import CheckinWriter
+from models import GroupDailyStat, Student
+
+TODAY = date.today()
+
+
+def counters(db, day: date = TODAY) -> dict:
+    db.expire_all()
+    return {r.group_name: (r.total, r.present) for r in group_stats.read_day(db, day)}
+
+
+def stored_rows(db) -> int:
+    return db.scalar(select(func.count()).select_from(GroupDailyStat))
+
+
+@pytest.fixture
+def writer(session_factory):
+    return CheckinWriter(session_factory, window_ms=0, on_inserted=group_stats.record_checkins)
+
+
+def checkin(student_id: int, day: date = TODAY) -> dict:
+    return {"student_id": student_id, "date": day, "status": 1}
+
+
+def test_read_day_recounts_without_writing(db, add_student):
+    add_student("Иванов", "П-21")
+    add_student("Петров", "П-21")
+    add_student("Сидоров", None)
+    add_student("Отчисленный", "П-21", is_active=False)
+
+    assert counters(db) == {"": (1, 0), "П-21": (2, 0)}
+    assert stored_rows(db) == 0
+
+
+def test_first_checkin_starts_from_recount(writer, db, add_student):
+    a = add_student("Иванов", "П-21")
+    b = add_student("Петров", "П-21")
+    c = add_student("Ахметов", "ИС-22")
+
+    writer.write(checkin(a))
+    assert counters(db) == {"ИС-22": (1, 0), "П-21": (2, 1)}
+    assert stored_rows(db) == 2
+
+    writer.write(checkin(b))
+    writer.write(checkin(b))  # повтор не считается
+    writer.write(checkin(c))
+    assert counters(db) == {"ИС-22": (1, 1), "П-21": (2, 2)}
+
+
+def test_ensure_day_creates_rows_once(db, add_student):
+    add_student("Иванов")
+
+    assert group_stats.ensure_day(db, TODAY) is True
+    assert group_stats.ensure_day(db, TODAY) is False
+    db.commit()
+    assert counters(db) == {"П-21": (1, 0)}
+
+
+def test_inactive_checkin_is_not_counted(writer, db, add_student):
+    add_student("Иванов", "П-21")
+    gone = add_student("Отчисленный", "П-21", is_active=False)
+    writer.write(checkin(add_student("Петров", "П-21")))
+
+    writer.write(checkin(gone))
+
+    assert counters(db) == {"П-21": (2, 1)}
+
+
+def test_roster_changes_follow_orm(writer, db, add_student):
+    a = add_student("Иванов", "П-21")
+    add_student("Петров", "П-21")
+    writer.write(checkin(a))
+    assert counters(db) == {"П-21": (2, 1)}
+
+    add_student("Новенький", "П-21")
+    assert counters(db) == {"П-21": (3, 1)}
+
+    # перевод вместе с сегодняшней отметкой
+    db.get(Student, a).group_name = "ИС-22"
+    db.commit()
+    assert counters(db) == {"ИС-22": (1, 1), "П-21": (2, 0)}
+
+    db.get(Student, a).is_active = False
+    db.commit()
+    assert counters(db) == {"ИС-22": (0, 0), "П-21": (2, 0)}
+
+    db.get(Student, a).is_active = True
+    db.commit()
+    assert counters(db) == {"ИС-22": (1, 1), "П-21": (2, 0)}
+
+    db.delete(db.scalars(select(Student).where(Student.full_name == "Новенький")).one())
+    db.commit()
+    assert counters(db) == {"ИС-22": (1, 1), "П-21": (1, 0)}
+
+
+def test_other_days_are_left_alone(writer, db, add_student):
+    yesterday = TODAY - timedelta(days=1)
+    a = add_student("Иванов", "П-21")
+    writer.write(checkin(a, yesterday))
+
+    add_student("Новенький", "П-21")
+
+    # вчерашние строки заведены раньше и составом групп сегодня не трогаются
+    assert counters(db, yesterday) == {"П-21": (1, 1)}
+
+
+def test_reconcile_fixes_drift(writer, db, add_student):
+    a = add_student("Иванов", "П-21")
+    writer.write(checkin(a))
+    # правка мимо ORM: студент переведён ручным SQL
+    db.execute(update(Student).where(Student.id == a).values(group_name="ИС-22"))
+    db.commit()
+    assert counters(db) == {"П-21": (1, 1)}
+
+    diff = group_stats.reconcile(db, TODAY)
+
+    assert diff == {"П-21": ((1, 1), None), "ИС-22": (None, (1, 1))}
+    assert counters(db) == {"ИС-22": (1, 1)}
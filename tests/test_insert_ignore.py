@@ -0,0 +1,87 @@
+# tests/test_insert_ignore.py
+# Одна отметка на студента в день: уникальный индекс, INSERT ... ON CONFLICT DO NOTHING и m001.
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.exc import IntegrityError
+
+from checkin_writer import CheckinWriter, insert_ignore_attendance, intern_devices
+from migrations import m001_attendance_unique_day
+from models import Attendance, Device
+
+DAY = date(2024, 9, 2)
+
+
+def checkin(student_id: int, day: date = DAY, **extra) -> dict:
+    return {"student_id": student_id, "date": day, "status": 1, **extra}
+
+
+def test_second_checkin_same_day_is_ignored(session_factory, db, add_student):
+    writer = CheckinWriter(session_factory, window_ms=0)
+    student_id = add_student("Иванов")
+
+    assert writer.write(checkin(student_id)) is True
+    assert writer.write(checkin(student_id)) is False
+    assert writer.write(checkin(student_id, DAY + timedelta(days=1))) is True
+
+    days = db.scalars(select(Attendance.date).where(Attendance.student_id == student_id).order_by(Attendance.date))
+    assert list(days) == [DAY, DAY + timedelta(days=1)]
+
+
+def test_duplicates_inside_one_batch(session_factory, db, add_student):
+    writer = CheckinWriter(session_factory, window_ms=300)
+    student_id = add_student("Иванов")
+    try:
+        first, second = writer.submit(checkin(student_id)), writer.submit(checkin(student_id))
+        assert (first.result(timeout=5), second.result(timeout=5)) == (True, False)
+    finally:
+        writer.stop(timeout=5)
+
+    assert db.scalar(select(func.count(Attendance.id))) == 1
+
+
+def test_ignored_checkin_keeps_the_first_row(db, add_student):
+    student_id = add_student("Иванов")
+    stmt = insert_ignore_attendance(db.get_bind().dialect.name)
+
+    assert db.execute(stmt, checkin(student_id, motivation_id=1)).rowcount == 1
+    assert db.execute(stmt, checkin(student_id, motivation_id=2)).rowcount == 0
+    db.commit()
+
+    assert db.scalars(select(Attendance.motivation_id)).all() == [1]
+
+
+def test_devices_are_interned_once(session_factory, db, add_student):
+    writer = CheckinWriter(session_factory, window_ms=0)
+    a, b = add_student("Иванов"), add_student("Петров")
+
+    writer.write(checkin(a, device_uid="phone-1"))
+    writer.write(checkin(b, device_uid="phone-1"))
+    writer.write(checkin(a, DAY + timedelta(days=1), device_uid="phone-2"))
+
+    ids = intern_devices(db, ["phone-1", "phone-2", "phone-1"])
+    assert set(ids) == {"phone-1", "phone-2"}
+    assert db.scalar(select(func.count(Device.id))) == 2
+    rows = db.execute(select(Attendance.student_id, Attendance.device_id).order_by(Attendance.id)).all()
+    assert rows == [(a, ids["phone-1"]), (b, ids["phone-1"]), (a, ids["phone-2"])]
+
+
+def test_m001_removes_old_duplicates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # схема до индекса: двойные нажатия успели записаться
+        conn.execute(text(
+            "CREATE TABLE attendance (id INTEGER PRIMARY KEY, student_id INTEGER, date DATE, status INTEGER)"
+        ))
+        conn.execute(text(
+            "INSERT INTO attendance (id, student_id, date, status) VALUES "
+            "(1, 1, '2024-09-02', 1), (2, 1, '2024-09-02', 1), (3, 2, '2024-09-02', 1), (4, 1, '2024-09-03', 1)"
+        ))
+        m001_attendance_unique_day(conn)
+
+    with engine.connect() as conn:
+        assert conn.scalars(text("SELECT id FROM attendance ORDER BY id")).all() == [1, 3, 4]
+        with pytest.raises(IntegrityError):
+            conn.execute(text("INSERT INTO attendance (student_id, date, status) VALUES (1, '2024-09-02', 1)"))
+    engine.dispose()
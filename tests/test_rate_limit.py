@@ -0,0 +1,117 @@
+# tests/test_rate_limit.py
+# Токен-бакеты и сброс нагрузки (rate_limit.py): сам бакет, вытеснение ключей, middleware.
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from rate_limit import LoadShedder, RateLimitMiddleware, TokenBucketLimiter
+
+
+def limiter(rate=1.0, burst=3, max_keys=100, idle_s=600) -> TokenBucketLimiter:
+    return TokenBucketLimiter(rate, burst, max_keys, idle_s)
+
+
+def test_burst_then_wait():
+    bucket = limiter(rate=0.5, burst=3)
+
+    assert [bucket.hit("phone", now=100.0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.hit("phone", now=100.0) == pytest.approx(2.0)  # один токен за 2 с
+    assert bucket.stats() == {"keys": 1, "limited": 1}
+
+
+def test_tokens_refill_up_to_burst():
+    bucket = limiter(rate=1.0, burst=3)
+    for _ in range(3):
+        bucket.hit("phone", now=0.0)
+
+    assert bucket.hit("phone", now=0.5) == pytest.approx(0.5)
+    assert bucket.hit("phone", now=1.0) == 0
+    # за час простоя копится не больше burst
+    assert [bucket.hit("phone", now=3600.0) for _ in range(4)][-1] > 0
+
+
+def test_keys_are_independent():
+    bucket = limiter(rate=1.0, burst=1)
+
+    assert bucket.hit("a", now=0.0) == 0
+    assert bucket.hit("a", now=0.0) > 0
+    assert bucket.hit("b", now=0.0) == 0
+
+
+def test_zero_rate_disables_the_limit():
+    bucket = limiter(rate=0, burst=0)
+
+    assert all(bucket.hit("phone") == 0 for _ in range(100))
+    assert bucket.stats() == {"keys": 0, "limited": 0}
+
+
+def test_idle_and_extra_keys_are_evicted():
+    bucket = limiter(rate=1.0, burst=1, max_keys=3, idle_s=60)
+    for i, key in enumerate("abcd"):
+        bucket.hit(key, now=float(i))
+    assert bucket.stats()["keys"] == 3  # LRU: "a" вытеснен
+
+    assert bucket.hit("a", now=4.0) == 0  # вытесненный ключ начинает с полного бакета
+    bucket.hit("e", now=100.0)
+    assert bucket.stats()["keys"] == 1  # остальные молчали дольше idle_s
+
+
+def test_shedder_refuses_after_wait():
+    async def scenario():
+        shedder = LoadShedder(max_concurrent=1, max_wait_s=0.05)
+        assert await shedder.acquire() is True
+        assert await shedder.acquire() is False
+        shedder.release()
+        assert await shedder.acquire() is True
+        return shedder.shed
+
+    assert asyncio.run(scenario()) == 1
+
+
+def make_client(device: TokenBucketLimiter, ip: TokenBucketLimiter, shedder=None) -> TestClient:
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[
+        Route("/login", ok, methods=["GET", "POST"]),
+        Route("/student/mark", ok, methods=["POST"]),
+        Route("/admin/dashboard", ok),
+    ])
+    return TestClient(RateLimitMiddleware(app, device, ip, shedder))
+
+
+def test_middleware_limits_per_device():
+    client = make_client(limiter(rate=0.01, burst=2), limiter(rate=100, burst=100))
+    phone = {"cookie": "device_uid=phone-1"}
+
+    assert [client.post("/student/mark", headers=phone).status_code for _ in range(2)] == [200, 200]
+    refused = client.post("/student/mark", headers=phone)
+    assert refused.status_code == 429
+    assert int(refused.headers["retry-after"]) >= 1
+    # другой телефон за тем же NAT и GET-страницы не задеты
+    assert client.post("/student/mark", headers={"cookie": "device_uid=phone-2"}).status_code == 200
+    assert client.get("/login", headers=phone).status_code == 200
+
+
+def test_middleware_limits_per_ip():
+    client = make_client(limiter(rate=100, burst=100), limiter(rate=0.01, burst=3))
+
+    codes = [client.post("/login", headers={"cookie": f"device_uid=phone-{i}"}).status_code for i in range(4)]
+
+    assert codes == [200, 200, 200, 429]
+
+
+def test_middleware_sheds_but_not_admin():
+    # свободных мест нет: всякий запрос ждёт дольше max_wait_s
+    shedder = LoadShedder(max_concurrent=0, max_wait_s=0.05)
+    client = make_client(limiter(rate=0), limiter(rate=0), shedder)
+
+    refused = client.post("/login")
+    assert refused.status_code == 503
+    assert refused.headers["retry-after"] == "30"
+    assert client.get("/admin/dashboard").status_code == 200
+    assert shedder.shed == 1
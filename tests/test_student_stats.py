@@ -0,0 +1,131 @@
+# tests/test_student_stats.py
+# Серия и маска посещений (student_stats.py) против наивного подсчёта по списку дат.
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import student_stats
+from checkin_writer import CheckinWriter
+from models import Attendance, StudentStat
+from student_stats import NO_PROGRESS, WINDOW_DAYS, Progress, apply_checkin, progress
+
+START = date(2024, 9, 2)
+
+
+def naive_progress(days: set, today: date, checked_in: bool = False) -> Progress:
+    """То, что раньше считали два запроса и проход по датам назад."""
+    before = [d for d in days if d < today]
+    if checked_in:
+        # после сегодняшней отметки маска помнит только окно
+        before = [d for d in before if (today - d).days <= WINDOW_DAYS]
+    if not before:
+        return NO_PROGRESS
+    streak = 0
+    day = today - timedelta(days=1)
+    while day in days:
+        streak += 1
+        day -= timedelta(days=1)
+    return Progress(
+        days_absent=(today - max(before)).days,
+        streak=streak,
+        present_30d=sum(1 for d in before if (today - d).days <= WINDOW_DAYS),
+    )
+
+
+def replay(days) -> dict:
+    state = None
+    for day in sorted(days):
+        state = apply_checkin(state, day)
+    return state
+
+
+def test_first_checkin():
+    assert apply_checkin(None, START) == {"last_seen": START, "streak": 1, "recent_mask": 1}
+    assert progress(None, START) == NO_PROGRESS
+
+
+def test_streak_and_gap():
+    state = replay([START, START + timedelta(days=1), START + timedelta(days=2)])
+    assert state == {"last_seen": START + timedelta(days=2), "streak": 3, "recent_mask": 0b111}
+
+    state = apply_checkin(state, START + timedelta(days=5))
+    assert state == {"last_seen": START + timedelta(days=5), "streak": 1, "recent_mask": 0b111001}
+
+
+def test_long_absence_resets_the_mask():
+    state = apply_checkin(replay([START, START + timedelta(days=1)]), START + timedelta(days=WINDOW_DAYS + 5))
+
+    assert state["recent_mask"] == 1
+    assert progress(state, START + timedelta(days=WINDOW_DAYS + 6)) == Progress(days_absent=1, streak=1, present_30d=1)
+
+
+def test_mask_keeps_only_the_window():
+    state = replay(START + timedelta(days=i) for i in range(100))
+
+    assert state["recent_mask"] == (1 << (WINDOW_DAYS + 1)) - 1
+    assert state["streak"] == 100
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_naive_history(seed):
+    rnd = random.Random(seed)
+    density = rnd.choice([0.1, 0.5, 0.9])
+    days = {START + timedelta(days=i) for i in range(90) if rnd.random() < density}
+    state = None
+    for offset in range(90):
+        today = START + timedelta(days=offset)
+        # перед отметкой: студент ещё не отмечался сегодня
+        assert progress(state, today) == naive_progress(days, today), today
+        if today in days:
+            state = apply_checkin(state, today)
+            # после отметки сегодняшний день не считается
+            assert progress(state, today) == naive_progress(days, today, checked_in=True), today
+    # и через несколько дней без отметок
+    for later in range(1, 40, 3):
+        today = START + timedelta(days=89 + later)
+        assert progress(state, today) == naive_progress(days, today), today
+
+
+def test_backdated_checkin_updates_the_mask_only():
+    state = replay([START, START + timedelta(days=2)])
+
+    state = apply_checkin(state, START + timedelta(days=1))
+
+    assert state == {"last_seen": START + timedelta(days=2), "streak": 1, "recent_mask": 0b111}
+    # present_30d уже верный, серию поправит rebuild
+    assert progress(state, START + timedelta(days=3)).present_30d == 3
+
+
+def test_writer_hook_and_rebuild_agree(engine, session_factory, db, add_student):
+    def prepare(db, rows):
+        return student_stats.load_states(db, [r["student_id"] for r in rows])
+
+    writer = CheckinWriter(
+        session_factory, window_ms=0, prepare=prepare,
+        on_inserted=lambda db, rows, states: student_stats.record_checkins(db, rows, states),
+    )
+    a, b = add_student("Иванов"), add_student("Петров")
+    visits = {a: [0, 1, 2, 4, 5], b: [3, 40]}
+    for student_id, offsets in visits.items():
+        for offset in offsets:
+            writer.write({"student_id": student_id, "date": START + timedelta(days=offset), "status": 1})
+    writer.write({"student_id": a, "date": START + timedelta(days=5), "status": 1})  # повтор не считается
+
+    stored = {s.student_id: student_stats._state(s) for s in db.scalars(select(StudentStat))}
+    assert stored == {
+        a: replay(START + timedelta(days=o) for o in visits[a]),
+        b: replay(START + timedelta(days=o) for o in visits[b]),
+    }
+    assert student_stats.read_progress(db, a, START + timedelta(days=6)) == Progress(1, 2, 5)
+
+    # отметка мимо CheckinWriter — сводку пересчитывает rebuild
+    db.add(Attendance(student_id=b, date=START + timedelta(days=41), status=1))
+    db.commit()
+    with engine.begin() as conn:
+        assert student_stats.rebuild(conn, chunk=1) == 2
+    db.expire_all()
+    assert student_stats._state(db.get(StudentStat, b)) == replay(
+        START + timedelta(days=o) for o in visits[b] + [41]
+    )